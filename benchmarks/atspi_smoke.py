@@ -0,0 +1,234 @@
+"""
+AT-SPI element lookup smoke test on a private Xvfb display and D-Bus session.
+
+    python -m benchmarks.atspi_smoke
+
+A sample GTK 3 window with buttons, a check box and an entry is started on
+the virtual display. Each element description is resolved with
+services/atspi_backend.py, clicked through the XTest input backend, and
+the app reports which widget received the click. "Add row" adds a button
+while the test runs, so the lookup after it goes through the event-driven
+partial refresh. Before that, description matching is checked offline on
+MATCH_CASES, which needs no display. Reported: lookup results, the time of the first (full)
+and later (incremental) lookups, and the planner summary.
+
+Needs Xvfb, dbus-daemon, at-spi2-core (the accessibility bus), PyGObject
+with GTK 3 and pyatspi (apt install xvfb dbus at-spi2-core python3-gi
+gir1.2-gtk-3.0 python3-pyatspi). Exits 0 with a note when one is missing.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import ROOT_DIR, summarize, write_results, print_results
+
+WINDOW_POSITION = (80, 60)
+
+# (description, widget name the click must reach)
+CHECKS = [
+    ("'Save' button", 'Save'),
+    ("the 'Save as' button", 'Save as'),
+    ("Cancel button", 'Cancel'),
+    ("'Enable sync' checkbox", 'Enable sync'),
+    ("'Add row' button", 'Add row'),
+    ("'Row 1' button", 'Row 1'),
+]
+
+# Elements (role, name, extents) and (description, name of the element it must match, None to decline);
+# checked with atspi_backend.match before the live run
+MATCH_ELEMENTS = [('push button', 'Search', (0, 0, 80, 24)), ('entry', 'Query', (0, 30, 200, 24)),
+                  ('push button', 'Close', (0, 60, 80, 24)), ('push button', 'Save', (0, 90, 80, 24)),
+                  ('push button', 'Save as', (0, 120, 80, 24)), ('push button', "Don't save", (0, 150, 80, 24)),
+                  ('check box', 'Enable sync', (0, 180, 80, 24))]
+MATCH_CASES = [
+    ("Save button", 'Save'),
+    ("the Save as button", 'Save as'),
+    ("the 'Don't save' button", "Don't save"),
+    ("user's profile 'Save' button", 'Save'),
+    ("Enable sync checkbox", 'Enable sync'),
+    ("search field", None),
+    ("close the dialog and click Save", None),
+    ("'Enable sync' button", None),
+]
+
+
+def run_app(state_path):
+    """Sample GTK window; writes the name of the last clicked widget to `state_path`"""
+    import gi
+    gi.require_version('Gtk', '3.0')
+    from gi.repository import Gtk
+
+    def clicked(widget):
+        name = widget.get_label()
+        with open(state_path, 'w', encoding='utf8') as f:
+            json.dump({'clicked': name, 'time': time.time()}, f)
+        if name == 'Add row':
+            rows[0] += 1
+            row = Gtk.Button(label=f'Row {rows[0]}')
+            row.connect('clicked', clicked)
+            box.pack_start(row, False, False, 0)
+            row.show()
+
+    rows = [0]
+    window = Gtk.Window(title='AT-SPI smoke')
+    window.move(*WINDOW_POSITION)
+    window.set_default_size(420, 360)
+    box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8)
+    box.set_border_width(12)
+    window.add(box)
+    for label in ('Save', 'Save as', 'Cancel', 'Add row'):
+        button = Gtk.Button(label=label)
+        button.connect('clicked', clicked)
+        box.pack_start(button, False, False, 0)
+    check = Gtk.CheckButton(label='Enable sync')
+    check.connect('toggled', clicked)
+    box.pack_start(check, False, False, 0)
+    entry = Gtk.Entry()
+    entry.set_placeholder_text('Name')
+    box.pack_start(entry, False, False, 0)
+    window.connect('destroy', Gtk.main_quit)
+    window.show_all()
+    with open(state_path, 'w', encoding='utf8') as f:
+        json.dump({'clicked': None, 'time': time.time()}, f)
+    Gtk.main()
+
+
+def run_checks(state_path):
+    """Child side: resolve, click and verify every check on the current $DISPLAY, print JSON"""
+    from services import atspi_backend
+    from services.input_backends import create_backend
+
+    backend = create_backend('xtest', 'fast')
+    # Without a window manager the window under the cursor counts as focused
+    backend.move_to(WINDOW_POSITION[0] + 40, WINDOW_POSITION[1] + 20)
+
+    outcomes = []
+    timings = []
+    for description, expected in CHECKS:
+        start = time.perf_counter()
+        coordinates = atspi_backend.locate(description)
+        timings.append((time.perf_counter() - start) * 1000.0)
+        clicked = None
+        if coordinates is not None:
+            backend.move_to(*coordinates)
+            backend.click('left')
+            deadline = time.time() + 2.0
+            while time.time() < deadline:
+                time.sleep(0.05)
+                with open(state_path, encoding='utf8') as f:
+                    clicked = json.load(f)['clicked']
+                if clicked == expected:
+                    break
+        outcomes.append({'description': description, 'expected': expected,
+                         'coordinates': coordinates, 'clicked': clicked, 'ok': clicked == expected})
+    print(json.dumps({'outcomes': outcomes, 'timings_ms': timings, 'summary': atspi_backend.summary()}))
+
+
+def check_matching():
+    """Offline atspi_backend.match checks; returns the failed cases"""
+    from services.atspi_backend import match
+
+    elements = [element + (index,) for index, element in enumerate(MATCH_ELEMENTS)]
+    failed = []
+    for description, expected in MATCH_CASES:
+        found = match(description, elements)
+        name = found[1] if found else None
+        if name != expected:
+            failed.append((description, expected, name))
+    return failed
+
+
+def start_session_bus():
+    """Private D-Bus session daemon; returns (process, address)"""
+    process = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address=1'],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    address = process.stdout.readline().strip()
+    if not address:
+        process.terminate()
+        raise RuntimeError("dbus-daemon did not report a bus address")
+    return process, address
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AT-SPI element lookup smoke test on Xvfb")
+    parser.add_argument('--output', default='benchmarks/results/atspi_smoke.json')
+    parser.add_argument('--app', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--checks', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.app is not None:
+        run_app(args.app)
+        return 0
+    if args.checks is not None:
+        run_checks(args.checks)
+        return 0
+
+    failed = check_matching()
+    for description, expected, name in failed:
+        print(f"FAIL match({description!r}) -> {name}, expected {expected}")
+    if failed:
+        return 1
+    print(f"Description matching: {len(MATCH_CASES)} cases ok")
+
+    missing = [tool for tool in ('Xvfb', 'dbus-daemon') if shutil.which(tool) is None]
+    try:
+        import gi
+        gi.require_version('Gtk', '3.0')
+        import pyatspi  # noqa: F401
+    except Exception as e:
+        missing.append(f"PyGObject/GTK 3/pyatspi ({e})")
+    if missing:
+        print(f"Skipped: missing {', '.join(missing)}")
+        return 0
+
+    from services.virtual_display import VirtualDisplay
+
+    display = VirtualDisplay()
+    display.start()
+    bus, address = start_session_bus()
+    env = display.env()
+    env.update({'DBUS_SESSION_BUS_ADDRESS': address, 'NO_AT_BRIDGE': '0', 'GTK_A11Y': 'atspi'})
+    state_path = os.path.join(tempfile.mkdtemp(prefix='atspi-smoke-'), 'state.json')
+    app = subprocess.Popen([sys.executable, '-m', 'benchmarks.atspi_smoke', '--app', state_path],
+                           cwd=ROOT_DIR, env=env)
+    try:
+        deadline = time.time() + 10.0
+        while not os.path.exists(state_path):
+            if time.time() > deadline or app.poll() is not None:
+                print("The sample GTK app did not start")
+                return 1
+            time.sleep(0.1)
+        # The accessibility bridge registers the app shortly after the window maps
+        time.sleep(1.0)
+
+        completed = subprocess.run([sys.executable, '-m', 'benchmarks.atspi_smoke', '--checks', state_path],
+                                   cwd=ROOT_DIR, env=env, capture_output=True, text=True, timeout=120)
+        if completed.returncode != 0:
+            print(completed.stderr)
+            return 1
+        child = json.loads(completed.stdout.strip().splitlines()[-1])
+    finally:
+        app.terminate()
+        app.wait()
+        bus.terminate()
+        bus.wait()
+        display.stop()
+
+    for outcome in child['outcomes']:
+        status = 'ok' if outcome['ok'] else 'FAIL'
+        print(f"{status:<5} {outcome['description']:<28} -> {outcome['coordinates']} clicked {outcome['clicked']}")
+    timings = child['timings_ms']
+    results = {'lookup_first': summarize(timings[:1]), 'lookup_incremental': summarize(timings[1:])}
+    print_results(results)
+    print(f"\n{child['summary']}")
+    write_results(args.output, 'atspi_smoke', results, extra={'outcomes': child['outcomes']})
+    return 0 if all(outcome['ok'] for outcome in child['outcomes']) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+import glob
+import json
+import os
+
+import numpy as np
+
+from services.audio_files import load_wav
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio')
+
+
+def load_fixtures(directory=AUDIO_DIR, sample_rate=16000):
+    """
+    Load recorded fixtures: every *.wav in `directory` plus labels.json.
+
+    labels.json maps a file name to
+        {"speech": [[start_s, end_s], ...], "text": "reference transcript", "keyword": "стоп"}
+    (all keys optional; a file without speech intervals is a pure noise recording).
+    Returns a list of dicts with 'name', 'audio' and the label keys.
+    """
+    labels_path = os.path.join(directory, 'labels.json')
+    labels = {}
+    if os.path.exists(labels_path):
+        with open(labels_path, encoding='utf8') as f:
+            labels = json.load(f)
+
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.wav'))):
+        name = os.path.basename(path)
+        fixture = {'name': name, 'audio': load_wav(path, sample_rate), 'speech': [], 'text': None, 'keyword': None}
+        fixture.update(labels.get(name, {}))
+        fixtures.append(fixture)
+    return fixtures
+
+
+def normalize_text(text):
+    """Lowercase, drop punctuation and collapse whitespace for transcript comparison"""
+    cleaned = ''.join(ch if ch.isalnum() or ch.isspace() else ' ' for ch in (text or '').lower())
+    return ' '.join(cleaned.replace('ё', 'е').split())
+
+
+def char_error_rate(reference, hypothesis):
+    """Levenshtein distance between normalized transcripts divided by the reference length"""
+    ref = normalize_text(reference)
+    hyp = normalize_text(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def synthetic_fixtures(sample_rate=16000, seed=0):
+    """
+    Generated stand-ins for recordings: vowel-like harmonic bursts over fan
+    noise, plus noise-only clips with keyboard clicks. Good enough to smoke
+    test detectors; real recordings belong in benchmarks/audio/.
+    """
+    rng = np.random.default_rng(seed)
+
+    def fan_noise(seconds, level):
+        white = rng.normal(0, 1, int(seconds * sample_rate)).astype(np.float32)
+        # Low-passed noise with a mains hum component
+        kernel = np.ones(8, dtype=np.float32) / 8
+        noise = np.convolve(white, kernel, mode='same')
+        t = np.arange(noise.shape[0]) / sample_rate
+        noise += 0.3 * np.sin(2 * np.pi * 50 * t)
+        return (level * noise / (np.abs(noise).max() + 1e-9)).astype(np.float32)
+
+    def vowel(seconds, pitch):
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        signal = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 12))
+        envelope = np.minimum(1.0, np.minimum(t, t[-1] - t) / 0.03)
+        syllables = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+        return (0.3 * signal * envelope * syllables / 3).astype(np.float32)
+
+    def clicks(audio, count):
+        for _ in range(count):
+            pos = int(rng.integers(0, audio.shape[0] - 400))
+            audio[pos:pos + 400] += rng.normal(0, 0.25, 400).astype(np.float32) * np.exp(-np.arange(400) / 60)
+        return audio
+
+    fixtures = []
+    for index in range(4):
+        audio = fan_noise(6.0, 0.02)
+        speech = []
+        for start in (1.0 + index * 0.2, 3.5):
+            length = 0.6 + 0.3 * index
+            burst = vowel(length, 110 + 30 * index)
+            begin = int(start * sample_rate)
+            audio[begin:begin + burst.shape[0]] += burst
+            speech.append([start, start + length])
+        fixtures.append({'name': f'synthetic-speech-{index}', 'audio': audio, 'speech': speech,
+                         'text': None, 'keyword': None})
+    for index in range(3):
+        audio = clicks(fan_noise(10.0, 0.03 + 0.02 * index), 20)
+        fixtures.append({'name': f'synthetic-noise-{index}', 'audio': audio, 'speech': [],
+                         'text': None, 'keyword': None})
+    return fixtures
+
+
+# Formant pairs (F1, F2) of the vowels and noise bands of the consonants used by the synthetic keywords
+_VOWELS = {'a': (750, 1250), 'o': (500, 900), 'u': (320, 800), 'e': (500, 1800), 'i': (300, 2300)}
+_NOISES = {'s': (4000, 7000), 'sh': (2000, 4500), 'z': (3500, 6000), 'p': (500, 3000), 't': (2500, 6000)}
+
+SYNTHETIC_WORDS = {
+    'stop': ['s', 't', 'o', 'p'],
+    'pause': ['p', 'a', 'u', 'z', 'a'],
+    'continue': ['p', 'o', 'e', 'o', 'sh', 'a', 'i'],
+}
+SYNTHETIC_DISTRACTORS = [['e', 't', 'o'], ['a', 'e', 'i'], ['s', 'u', 'p', 'e'], ['t', 'a', 'sh', 'o']]
+
+
+def synthetic_word(phones, sample_rate=16000, rng=None, speed=1.0, pitch=130.0, level=0.3):
+    """Crude formant/noise-band rendering of a phone sequence, enough to exercise keyword matching"""
+    rng = rng or np.random.default_rng()
+    pieces = []
+    for phone in phones:
+        if phone in _VOWELS:
+            seconds = 0.12 / speed
+            t = np.arange(int(seconds * sample_rate)) / sample_rate
+            f1, f2 = _VOWELS[phone]
+            signal = np.zeros_like(t)
+            for k in range(1, int(4000 / pitch)):
+                freq = pitch * k
+                gain = np.exp(-((freq - f1) / 150.0) ** 2) + 0.7 * np.exp(-((freq - f2) / 200.0) ** 2) + 0.02
+                signal += gain * np.sin(2 * np.pi * freq * t + rng.uniform(0, 2 * np.pi))
+        else:
+            seconds = (0.04 if phone in ('p', 't') else 0.09) / speed
+            low, high = _NOISES[phone]
+            noise = rng.normal(0, 1, int(seconds * sample_rate))
+            spectrum = np.fft.rfft(noise)
+            freqs = np.fft.rfftfreq(noise.shape[0], 1.0 / sample_rate)
+            spectrum[(freqs < low) | (freqs > high)] = 0
+            signal = 0.5 * np.fft.irfft(spectrum, n=noise.shape[0])
+        envelope = np.minimum(1.0, np.minimum(np.arange(signal.shape[0]), signal.shape[0] - np.arange(signal.shape[0]))
+                              / (0.01 * sample_rate))
+        pieces.append(signal * envelope)
+    word = np.concatenate(pieces)
+    return (level * word / (np.abs(word).max() + 1e-9)).astype(np.float32)
+
+
+def synthetic_keyword_fixtures(sample_rate=16000, seed=0, takes=3, clips_per_word=6):
+    """
+    Generated keyword data: (templates, fixtures).
+
+    templates maps an action to `takes` enrollment recordings; fixtures are
+    clips with one keyword ('keyword' = action) or with distractor words /
+    noise only ('keyword' = None), spoken at varying speed, pitch and level
+    over fan noise.
+    """
+    rng = np.random.default_rng(seed)
+
+    def vary():
+        return {'speed': rng.uniform(0.85, 1.15), 'pitch': rng.uniform(100, 200), 'level': rng.uniform(0.15, 0.4)}
+
+    def clip(words, seconds=4.0):
+        white = rng.normal(0, 1, int(seconds * sample_rate))
+        audio = (0.01 * np.convolve(white, np.ones(8) / 8, mode='same')).astype(np.float32)
+        speech = []
+        position = rng.uniform(0.5, 1.0)
+        for phones in words:
+            word = synthetic_word(phones, sample_rate, rng, **vary())
+            begin = int(position * sample_rate)
+            audio[begin:begin + word.shape[0]] += word
+            speech.append([round(position, 3), round(position + word.shape[0] / sample_rate, 3)])
+            position += word.shape[0] / sample_rate + rng.uniform(0.6, 1.0)
+        return audio, speech
+
+    templates = {action: [synthetic_word(phones, sample_rate, rng, **vary()) for _ in range(takes)]
+                 for action, phones in SYNTHETIC_WORDS.items()}
+
+    fixtures = []
+    for action, phones in SYNTHETIC_WORDS.items():
+        for index in range(clips_per_word):
+            audio, speech = clip([phones])
+            fixtures.append({'name': f'synthetic-{action}-{index}', 'audio': audio, 'speech': speech,
+                             'text': None, 'keyword': action})
+    for index, phones in enumerate(SYNTHETIC_DISTRACTORS * 2):
+        audio, speech = clip([phones, SYNTHETIC_DISTRACTORS[(index + 1) % len(SYNTHETIC_DISTRACTORS)]])
+        fixtures.append({'name': f'synthetic-other-{index}', 'audio': audio, 'speech': speech,
+                         'text': None, 'keyword': None})
+    return templates, fixtures
+
+
+def synthetic_utterances(sample_rate=16000, seed=0, seconds=(1.0, 1.5, 2.0, 3.0, 5.0)):
+    """
+    Generated command-length clips for decoder latency and RTF: one to
+    several synthetic words over fan noise per duration in `seconds`. They
+    carry no transcript ('text' = None), so transcription accuracy needs
+    recordings in benchmarks/audio/; outputs of two decoders can still be
+    compared with each other.
+    """
+    rng = np.random.default_rng(seed)
+    words = list(SYNTHETIC_WORDS.values()) + SYNTHETIC_DISTRACTORS
+    fixtures = []
+    for index, length in enumerate(seconds):
+        white = rng.normal(0, 1, int(length * sample_rate))
+        audio = (0.01 * np.convolve(white, np.ones(8) / 8, mode='same')).astype(np.float32)
+        speech = []
+        position = 0.2
+        while True:
+            word = synthetic_word(words[int(rng.integers(len(words)))], sample_rate, rng,
+                                  speed=rng.uniform(0.85, 1.15), pitch=rng.uniform(100, 200), level=0.3)
+            if position + word.shape[0] / sample_rate > length - 0.2 and speech:
+                break
+            begin = int(position * sample_rate)
+            audio[begin:begin + word.shape[0]] += word[:audio.shape[0] - begin]
+            speech.append([round(position, 3), round(min(length, position + word.shape[0] / sample_rate), 3)])
+            position += word.shape[0] / sample_rate + rng.uniform(0.1, 0.3)
+        fixtures.append({'name': f'synthetic-utterance-{index}-{length:g}s', 'audio': audio, 'speech': speech,
+                         'text': None, 'keyword': None})
+    return fixtures
@@ -0,0 +1,111 @@
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# Benchmarks are modules: run them from the repository root as
+# `python -m benchmarks.<name>` (`python benchmarks/<name>.py` cannot import
+# the benchmarks package). The root is added to sys.path for child
+# processes started with another working directory.
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def measure(fn, repeat=20, warmup=2, setup=None):
+    """
+    Time fn() `repeat` times after `warmup` untimed calls.
+
+    setup() (if given) runs before every call and is not timed.
+    Returns a dict of timings in milliseconds.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+
+    return summarize(samples)
+
+
+def summarize(samples):
+    """Summary statistics (ms) for a list of samples in milliseconds"""
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 4),
+        'median_ms': round(statistics.median(ordered), 4),
+        'mean_ms': round(statistics.fmean(ordered), 4),
+        'p95_ms': round(ordered[p95_index], 4),
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def write_results(path, suite, results, extra=None):
+    """Write results as {'suite', 'environment', 'results': {name: stats}}"""
+    payload = {'suite': suite, 'environment': environment(), 'results': results}
+    if extra:
+        payload.update(extra)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {path}")
+
+
+def compare_to_baseline(results, baseline_path, threshold=0.10, metric='median_ms'):
+    """
+    Print a comparison against a previous results file.
+
+    Returns the list of benchmark names that got slower than `threshold`
+    (relative change of `metric`).
+    """
+    with open(baseline_path, encoding='utf8') as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    print(f"\n{'benchmark':<48} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name, stats in results.items():
+        if name not in baseline or metric not in stats:
+            print(f"{name:<48} {'-':>11} {stats.get(metric, 0):>11.3f} {'new':>8}")
+            continue
+        old = baseline[name][metric]
+        new = stats[metric]
+        change = (new - old) / old if old else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<48} {old:>11.3f} {new:>11.3f} {change:>+7.1%}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {threshold:.0%}")
+    else:
+        print("\nNo regressions against baseline")
+    return regressions
+
+
+def print_results(results, metric='median_ms'):
+    print(f"\n{'benchmark':<48} {'median ms':>11} {'p95 ms':>11} {'runs':>6}")
+    for name, stats in results.items():
+        print(f"{name:<48} {stats[metric]:>11.3f} {stats['p95_ms']:>11.3f} {stats['runs']:>6}")
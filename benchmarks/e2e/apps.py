@@ -0,0 +1,173 @@
+"""
+Scripted Tk test windows for the end-to-end benchmark.
+
+Every app is placed at a fixed position (there is no window manager on the
+Xvfb display, so there are no decorations) and writes its observable state
+as JSON to --state whenever it changes, which lets the harness check whether
+the agent actually completed the task.
+
+    python -m benchmarks.e2e.apps form --state /tmp/form.json
+"""
+import argparse
+import json
+import os
+import tkinter as tk
+
+# Top-left corner of every app window on the virtual screen
+WINDOW_X = 100
+WINDOW_Y = 100
+WINDOW_SIZE = (600, 420)
+
+# Widget rectangles (x, y, width, height) relative to the window. tasks.py
+# turns them into absolute click targets.
+FORM_LAYOUT = {
+    'name_entry': (150, 40, 300, 28),
+    'email_entry': (150, 90, 300, 28),
+    'submit_button': (150, 150, 100, 32),
+}
+DIALOG_LAYOUT = {
+    'open_button': (40, 40, 160, 32),
+}
+DIALOG_WINDOW = (300, 250, 260, 140)
+DIALOG_CHILD_LAYOUT = {
+    'enable_check': (20, 20, 200, 28),
+    'ok_button': (80, 80, 100, 32),
+}
+LIST_LAYOUT = {
+    'listbox': (40, 40, 300, 340),
+}
+LIST_ITEMS = 300
+ENTRY_LAYOUT = {
+    'entry': (40, 40, 520, 28),
+}
+
+
+def absolute_center(layout, name, window=(WINDOW_X, WINDOW_Y)):
+    """Screen coordinates of the center of a widget rectangle"""
+    x, y, width, height = layout[name]
+    return window[0] + x + width // 2, window[1] + y + height // 2
+
+
+class StateWriter:
+    """Polls a state function and rewrites the state file when the value changes"""
+
+    def __init__(self, root, path, state_fn, interval_ms=100):
+        self.root = root
+        self.path = path
+        self.state_fn = state_fn
+        self.interval_ms = interval_ms
+        self.last = None
+        self.root.after(0, self.poll)
+
+    def poll(self):
+        state = self.state_fn()
+        if state != self.last:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+            self.last = state
+        self.root.after(self.interval_ms, self.poll)
+
+
+def _place(widget, rect):
+    x, y, width, height = rect
+    widget.place(x=x, y=y, width=width, height=height)
+
+
+def form_app(root):
+    state = {'submitted': False, 'name': '', 'email': ''}
+    tk.Label(root, text="Name").place(x=60, y=44)
+    tk.Label(root, text="Email").place(x=60, y=94)
+    name = tk.Entry(root)
+    email = tk.Entry(root)
+    _place(name, FORM_LAYOUT['name_entry'])
+    _place(email, FORM_LAYOUT['email_entry'])
+
+    def submit():
+        state.update(submitted=True, name=name.get(), email=email.get())
+
+    _place(tk.Button(root, text="Submit", command=submit), FORM_LAYOUT['submit_button'])
+    return lambda: dict(state)
+
+
+def dialog_app(root):
+    state = {'dialog_open': False, 'enabled': False, 'confirmed': False}
+    enabled = tk.BooleanVar(value=False)
+
+    def open_dialog():
+        dialog = tk.Toplevel(root)
+        dialog.overrideredirect(True)
+        x, y, width, height = DIALOG_WINDOW
+        dialog.geometry(f"{width}x{height}+{x}+{y}")
+        _place(tk.Checkbutton(dialog, text="Enable feature", variable=enabled, anchor='w'),
+               DIALOG_CHILD_LAYOUT['enable_check'])
+
+        def confirm():
+            state.update(confirmed=True, dialog_open=False)
+            dialog.destroy()
+
+        _place(tk.Button(dialog, text="OK", command=confirm), DIALOG_CHILD_LAYOUT['ok_button'])
+        state['dialog_open'] = True
+
+    _place(tk.Button(root, text="Open settings", command=open_dialog), DIALOG_LAYOUT['open_button'])
+    return lambda: dict(state, enabled=enabled.get())
+
+
+def list_app(root):
+    listbox = tk.Listbox(root, exportselection=False)
+    for index in range(LIST_ITEMS):
+        listbox.insert(tk.END, f"Item {index:03d}")
+    _place(listbox, LIST_LAYOUT['listbox'])
+
+    def state():
+        selection = listbox.curselection()
+        return {
+            'first_visible': listbox.nearest(0),
+            'selected': listbox.get(selection[0]) if selection else None,
+        }
+
+    return state
+
+
+def entry_app(root):
+    """A focused entry; Return appends its text to 'submitted' and clears it"""
+    state = {'submitted': []}
+    entry = tk.Entry(root)
+    _place(entry, ENTRY_LAYOUT['entry'])
+
+    def submit(event):
+        state['submitted'] = state['submitted'] + [entry.get()]
+        entry.delete(0, tk.END)
+
+    entry.bind('<Return>', submit)
+    root.after(200, entry.focus_force)
+    return lambda: {'submitted': list(state['submitted'])}
+
+
+APPS = {
+    'form': form_app,
+    'dialog': dialog_app,
+    'list': list_app,
+    'entry': entry_app,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scripted test windows for the e2e benchmark")
+    parser.add_argument('app', choices=sorted(APPS))
+    parser.add_argument('--state', required=True, help="Path of the JSON state file")
+    args = parser.parse_args(argv)
+
+    root = tk.Tk()
+    root.overrideredirect(True)
+    width, height = WINDOW_SIZE
+    root.geometry(f"{width}x{height}+{WINDOW_X}+{WINDOW_Y}")
+    root.title(f"e2e-{args.app}")
+    state_fn = APPS[args.app](root)
+    StateWriter(root, args.state, state_fn)
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    main()
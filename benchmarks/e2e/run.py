@@ -0,0 +1,241 @@
+"""
+Headless end-to-end benchmark: the real agent loop and command executor on
+an Xvfb display, driven by a deterministic stub model against scripted Tk
+windows.
+
+    python -m benchmarks.e2e.run
+    python -m benchmarks.e2e.run --tasks form,list --llm-latency 1.5
+    python -m benchmarks.e2e.run --baseline benchmarks/results/e2e-baseline.json
+    python -m benchmarks.e2e.run --modes sequential,pipeline
+
+Needs Xvfb (and xclip or xsel when INPUT_BACKEND = 'pyautogui' pastes
+non-ASCII text for enter_text). Each task
+runs in its own agent process so module state does not leak between tasks.
+"""
+import argparse
+import json
+import statistics
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.common import ROOT_DIR, write_results, compare_to_baseline
+from benchmarks.e2e.tasks import TASKS
+from config import SYSTEM_PROMPT
+
+MODES = {'pipeline': True, 'sequential': False}
+
+
+def summarize_spans(spans):
+    """Per-stage totals, sleep breakdown and iteration count from trace records"""
+    stages = defaultdict(lambda: {'count': 0, 'total_ms': 0.0})
+    sleeps = defaultdict(float)
+    iterations = 0
+    for record in spans:
+        duration_ms = record['dur_us'] / 1000.0
+        stage = stages[record['name']]
+        stage['count'] += 1
+        stage['total_ms'] += duration_ms
+        if record['name'] == 'sleep':
+            sleeps[str(record['attrs'].get('reason'))] += duration_ms
+        elif record['name'] == 'iteration':
+            iterations += 1
+    summary = {
+        'iterations': iterations,
+        'stages': {name: {'count': s['count'], 'total_ms': round(s['total_ms'], 2)} for name, s in stages.items()},
+        'sleep_ms': {reason: round(total, 2) for reason, total in sleeps.items()},
+        'sleep_total_ms': round(sum(sleeps.values()), 2),
+    }
+    summary.update(critical_path(spans))
+    return summary
+
+
+def critical_path(spans):
+    """
+    Per-iteration critical path: the time from the end of one step's last
+    action to the end of the next step's last action (consecutive 'execute'
+    spans). The agent overhead on that path is the period minus the planning
+    LLM call and the execution of the step itself.
+    """
+    executes = sorted((r for r in spans if r['name'] == 'execute'), key=lambda r: r['ts_us'])
+    plans = [r for r in spans if r['name'] == 'llm' and r['attrs'].get('prompt') == SYSTEM_PROMPT]
+    periods = []
+    overheads = []
+    for previous, current in zip(executes, executes[1:]):
+        start = previous['ts_us'] + previous['dur_us']
+        end = current['ts_us'] + current['dur_us']
+        llm_us = sum(r['dur_us'] for r in plans if start <= r['ts_us'] < end)
+        periods.append((end - start) / 1000.0)
+        overheads.append((end - start - llm_us - current['dur_us']) / 1000.0)
+    if not periods:
+        return {'critical_path_ms': None, 'overhead_ms': None}
+    return {
+        'critical_path_ms': round(statistics.median(periods), 2),
+        'overhead_ms': round(statistics.median(overheads), 2),
+    }
+
+
+def run_worker(task_name, result_path, latency, trace_dir, pipeline=True):
+    """Agent side: runs inside the Xvfb display with the stub model installed"""
+    import_start = time.perf_counter()
+    import main as agent
+    from services import tracing
+    from services.openrouter_api import set_completion_backend
+    from benchmarks.e2e.stub_llm import StubLLM
+    import_ms = (time.perf_counter() - import_start) * 1000.0
+
+    task = TASKS[task_name]
+    stub = StubLLM(task['steps'], task['targets'], latency)
+    set_completion_backend(stub)
+
+    spans = []
+    if trace_dir:
+        tracing.enable(trace_dir)
+    else:
+        tracing.enable(write_files=False)
+    tracing.add_listener(spans.append)
+
+    start = time.perf_counter()
+    agent.run_desktop_agent(task['task'], max_iterations=len(task['steps']), use_voice=False, pipeline=pipeline)
+    wall_ms = (time.perf_counter() - start) * 1000.0
+    tracing.disable()
+
+    result = {'wall_ms': round(wall_ms, 2), 'import_ms': round(import_ms, 2), 'llm_calls': stub.calls,
+              'pipeline': pipeline}
+    result.update(summarize_spans(spans))
+    with open(result_path, 'w', encoding='utf8') as f:
+        json.dump(result, f, indent=2)
+
+
+def _wait_for_file(path, timeout):
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if time.time() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def run_task(name, display, work_dir, latency, trace_dir, timeout, mode='pipeline'):
+    """Harness side: start the app, run the agent process, check the app state"""
+    task = TASKS[name]
+    state_path = os.path.join(work_dir, f'{name}-{mode}-state.json')
+    result_path = os.path.join(work_dir, f'{name}-{mode}-result.json')
+    env = display.env()
+
+    app = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.e2e.apps', task['app'], '--state', state_path],
+        cwd=ROOT_DIR, env=env,
+    )
+    try:
+        if not _wait_for_file(state_path, 15):
+            raise RuntimeError(f"App '{task['app']}' did not start")
+
+        command = [sys.executable, '-m', 'benchmarks.e2e.run', '--worker', name,
+                   '--result', result_path, '--llm-latency', str(latency)]
+        if trace_dir:
+            command += ['--trace-dir', trace_dir]
+        if not MODES[mode]:
+            command.append('--no-pipeline')
+        process_start = time.perf_counter()
+        completed = subprocess.run(command, cwd=ROOT_DIR, env=env, timeout=timeout)
+        process_ms = (time.perf_counter() - process_start) * 1000.0
+        if completed.returncode != 0 or not os.path.exists(result_path):
+            return {'success': False, 'error': f'agent process exited with {completed.returncode}'}
+
+        # Give the app one state poll to record the final action
+        time.sleep(0.3)
+        with open(state_path, encoding='utf8') as f:
+            state = json.load(f)
+        with open(result_path, encoding='utf8') as f:
+            result = json.load(f)
+        result['process_ms'] = round(process_ms, 2)
+        result['success'] = bool(task['check'](state))
+        result['final_state'] = state
+        return result
+    finally:
+        app.terminate()
+        app.wait(timeout=5)
+
+
+def print_report(results):
+    print(f"\n{'task':<20} {'ok':<4} {'wall s':>8} {'iters':>6} {'sleep s':>8} {'llm s':>8} {'capture s':>10} "
+          f"{'exec s':>8} {'path ms':>8} {'overhead ms':>12}")
+    for name, result in results.items():
+        if 'wall_ms' not in result:
+            print(f"{name:<20} {'no':<4} {result.get('error', '')}")
+            continue
+        stages = result['stages']
+        stage_s = lambda stage: stages.get(stage, {}).get('total_ms', 0.0) / 1000.0
+        fmt = lambda v: '-' if v is None else f"{v:.0f}"
+        print(f"{name:<20} {'yes' if result['success'] else 'no':<4} {result['wall_ms'] / 1000:>8.2f} "
+              f"{result['iterations']:>6} {result['sleep_total_ms'] / 1000:>8.2f} {stage_s('llm'):>8.2f} "
+              f"{stage_s('capture'):>10.2f} {stage_s('execute'):>8.2f} "
+              f"{fmt(result.get('critical_path_ms')):>8} {fmt(result.get('overhead_ms')):>12}")
+    for name, result in results.items():
+        if 'sleep_ms' in result:
+            breakdown = ', '.join(f"{reason}={ms / 1000:.2f}s" for reason, ms in sorted(result['sleep_ms'].items()))
+            print(f"  {name} sleeps: {breakdown}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless end-to-end agent benchmark on Xvfb")
+    parser.add_argument('--tasks', default=','.join(TASKS), help=f"Comma separated subset of {', '.join(TASKS)}")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Seconds the stub model sleeps per call")
+    parser.add_argument('--modes', default='pipeline',
+                        help="Comma separated agent loop modes to run each task in: pipeline, sequential")
+    parser.add_argument('--screen', default='1280x720', help="Virtual screen size")
+    parser.add_argument('--timeout', type=float, default=300.0, help="Per-task timeout in seconds")
+    parser.add_argument('--trace-dir', default=None, help="Also write Chrome traces of each task here")
+    parser.add_argument('--output', default='benchmarks/results/e2e.json', help="Where to write JSON results")
+    parser.add_argument('--baseline', default=None, help="Results file to compare wall times against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown counted as a regression")
+    # Internal: agent side of a single task
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--result', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--no-pipeline', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker, args.result, args.llm_latency, args.trace_dir, pipeline=not args.no_pipeline)
+        return 0
+
+    from services.virtual_display import VirtualDisplay
+
+    names = [name.strip() for name in args.tasks.split(',') if name.strip()]
+    for name in names:
+        if name not in TASKS:
+            parser.error(f"Unknown task: {name}")
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"Unknown mode: {mode}")
+    width, height = (int(v) for v in args.screen.lower().split('x'))
+
+    results = {}
+    with VirtualDisplay(width, height) as display, tempfile.TemporaryDirectory(prefix='agent-e2e-') as work_dir:
+        print(f"Xvfb running on {display.display} ({width}x{height})")
+        for name in names:
+            for mode in modes:
+                # Results keep the plain task name for the default single mode so baselines stay comparable
+                key = name if modes == ['pipeline'] else f'{name}[{mode}]'
+                print(f"\n=== Task: {key} ===")
+                results[key] = run_task(name, display, work_dir, args.llm_latency, args.trace_dir, args.timeout, mode)
+
+    print_report(results)
+    write_results(args.output, 'e2e', results,
+                  extra={'screen': args.screen, 'llm_latency': args.llm_latency, 'modes': modes})
+
+    failed = [name for name, result in results.items() if not result.get('success')]
+    if args.baseline:
+        timed = {name: result for name, result in results.items() if 'wall_ms' in result}
+        if compare_to_baseline(timed, args.baseline, args.threshold, metric='wall_ms'):
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import json
+import re
+import time
+
+
+class StubLLM:
+    """
+    Deterministic stand-in for the vision model.
+
+    Planner calls (prompt 'default') return the next scripted step as a
+    response in the format of prompts/default.md; locate calls (prompt
+    'locate_ui_element') answer with the grid cell covering the known
+    coordinates of the requested element. `latency` seconds are slept per
+    call to emulate a model round trip.
+    """
+
+    def __init__(self, steps, targets=None, latency=0.0):
+        self.steps = list(steps)
+        self.targets = dict(targets or {})
+        self.latency = latency
+        self.step_index = 0
+        self.calls = {'plan': 0, 'locate': 0}
+
+    def __call__(self, messages, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        if prompt == 'locate_ui_element':
+            self.calls['locate'] += 1
+            return self._locate(messages)
+        self.calls['plan'] += 1
+        return self._plan()
+
+    def _plan(self):
+        if self.step_index >= len(self.steps):
+            return "[Analysis] Script finished, nothing left to do.\n[Progress] 100%"
+        commands = self.steps[self.step_index]
+        self.step_index += 1
+        lines = [
+            f"[What I see on screenshot] Scripted step {self.step_index} of {len(self.steps)}.",
+            "[Analysis] Following the benchmark script.",
+            f"[Progress] {int(100 * self.step_index / len(self.steps))}%",
+            "[Commands]",
+        ]
+        lines.extend(json.dumps(command) for command in commands)
+        return "\n".join(lines)
+
+    def _locate(self, messages):
+        from services.find_ui import get_grid_cells_from_cache
+
+        text = " ".join(
+            part.get('text', '')
+            for message in messages
+            for part in (message['content'] if isinstance(message['content'], list) else [])
+            if isinstance(part, dict)
+        )
+        match = re.search(r'Find grid cell with element "(.*)"', text)
+        target = self.targets.get(match.group(1)) if match else None
+        if target is None:
+            return "ELEMENT_NOT_FOUND"
+
+        x, y = target
+        for cell in get_grid_cells_from_cache():
+            if cell['x'] <= x < cell['x'] + cell['width'] and cell['y'] <= y < cell['y'] + cell['height']:
+                return f"<thinking>Scripted locate.</thinking>\nGRID_CELL: #{cell['index']}"
+        return "ELEMENT_NOT_FOUND"
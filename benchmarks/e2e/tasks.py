@@ -0,0 +1,78 @@
+"""
+Scripted end-to-end tasks: which app to start, what the stub model answers
+each iteration, where named elements are for locate calls, and how to
+decide from the app state whether the task succeeded.
+"""
+from benchmarks.e2e.apps import (
+    FORM_LAYOUT,
+    DIALOG_LAYOUT,
+    DIALOG_WINDOW,
+    DIALOG_CHILD_LAYOUT,
+    LIST_LAYOUT,
+    absolute_center,
+)
+
+
+def _move(point):
+    return {"command": "move_cursor_absolute", "params": {"x": point[0], "y": point[1]}}
+
+
+def _click(button="left"):
+    return {"command": "mouse_button", "params": {"button": button}}
+
+
+def _type(text):
+    return {"command": "enter_text", "params": {"text": text}}
+
+
+def _locate(name):
+    return {"command": "move_cursor_to_element", "params": {"name": name}}
+
+
+_dialog_origin = DIALOG_WINDOW[:2]
+
+TASKS = {
+    'form': {
+        'app': 'form',
+        'task': "Fill the form with name Alice and email alice@example.com and submit it",
+        'steps': [
+            [_move(absolute_center(FORM_LAYOUT, 'name_entry')), _click(), _type("Alice")],
+            [_move(absolute_center(FORM_LAYOUT, 'email_entry')), _click(), _type("alice@example.com")],
+            [_locate("Submit button"), _click()],
+            [],
+        ],
+        'targets': {
+            "Submit button": absolute_center(FORM_LAYOUT, 'submit_button'),
+        },
+        'check': lambda state: (state.get('submitted') and state.get('name') == "Alice"
+                                and state.get('email') == "alice@example.com"),
+    },
+    'dialog': {
+        'app': 'dialog',
+        'task': "Open the settings dialog, enable the feature and confirm with OK",
+        'steps': [
+            [_locate("Open settings button"), _click()],
+            [{"command": "wait", "params": {"seconds": 0.5}},
+             _move(absolute_center(DIALOG_CHILD_LAYOUT, 'enable_check', _dialog_origin)), _click()],
+            [_move(absolute_center(DIALOG_CHILD_LAYOUT, 'ok_button', _dialog_origin)), _click()],
+            [],
+        ],
+        'targets': {
+            "Open settings button": absolute_center(DIALOG_LAYOUT, 'open_button'),
+        },
+        'check': lambda state: state.get('confirmed') and state.get('enabled'),
+    },
+    'list': {
+        'app': 'list',
+        'task': "Scroll down the list and select an item further down",
+        'steps': [
+            [_move(absolute_center(LIST_LAYOUT, 'listbox')),
+             {"command": "scroll", "params": {"clicks": -5}},
+             {"command": "scroll", "params": {"clicks": -5}}],
+            [{"command": "scroll", "params": {"clicks": -5}}, _click()],
+            [],
+        ],
+        'targets': {},
+        'check': lambda state: state.get('first_visible', 0) >= 10 and state.get('selected') is not None,
+    },
+}
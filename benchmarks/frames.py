@@ -0,0 +1,70 @@
+import glob
+import os
+
+import numpy as np
+from PIL import Image
+
+SCREENS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'screens')
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+
+
+def load_frame(resolution, seed=0):
+    """
+    Return an RGB uint8 frame of the given resolution name.
+
+    Recorded screenshots dropped into benchmarks/screens/ are used when
+    present (a file whose size matches exactly is preferred, otherwise the
+    first recording is resized); without recordings a deterministic
+    synthetic desktop is generated so the suite still runs anywhere.
+    """
+    width, height = RESOLUTIONS[resolution]
+    recordings = sorted(
+        glob.glob(os.path.join(SCREENS_DIR, '*.png')) + glob.glob(os.path.join(SCREENS_DIR, '*.jpg'))
+    )
+    for path in recordings:
+        with Image.open(path) as img:
+            if img.size == (width, height):
+                return np.array(img.convert('RGB'))
+    if recordings:
+        with Image.open(recordings[0]) as img:
+            return np.array(img.convert('RGB').resize((width, height), Image.Resampling.LANCZOS))
+    return synthetic_desktop(width, height, seed)
+
+
+def synthetic_desktop(width, height, seed=0):
+    """Wallpaper gradient, a taskbar, a few windows with toolbars and text-like noise"""
+    rng = np.random.default_rng(seed)
+    ys = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    xs = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = (40 + 60 * ys + 20 * xs).astype(np.uint8)
+    frame[..., 1] = (70 + 40 * xs).astype(np.uint8)
+    frame[..., 2] = (120 + 80 * ys).astype(np.uint8)
+
+    # Taskbar with icons
+    bar = max(24, height // 27)
+    frame[height - bar:, :] = (30, 30, 35)
+    for i in range(12):
+        x = 8 + i * (bar + 8)
+        frame[height - bar + 4:height - 4, x:x + bar - 8] = rng.integers(60, 255, 3)
+
+    # Windows with title bars, toolbars and rows of "text"
+    for _ in range(4):
+        w = int(width * rng.uniform(0.25, 0.55))
+        h = int(height * rng.uniform(0.25, 0.6))
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - bar - h))
+        frame[y:y + h, x:x + w] = (245, 245, 245)
+        frame[y:y + 28, x:x + w] = (60, 90, 160)
+        frame[y + 28:y + 56, x:x + w] = (225, 225, 230)
+        for b in range(min(20, w // 30)):
+            frame[y + 32:y + 52, x + 6 + b * 30:x + 26 + b * 30] = rng.integers(80, 200, 3)
+        for row in range(y + 64, y + h - 12, 18):
+            line = rng.random((10, w - 24)) > 0.55
+            frame[row:row + 10, x + 12:x + w - 12][line] = (20, 20, 20)
+    return frame
@@ -0,0 +1,181 @@
+"""
+Offline microbenchmarks for the agent's per-iteration hot paths.
+
+Runs on recorded (benchmarks/screens/) or synthetic frames; needs neither a
+display nor network access.
+
+    python -m benchmarks.hot_paths
+    python -m benchmarks.hot_paths --resolutions 1080p,4k --repeat 30
+    python -m benchmarks.hot_paths --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks.common import measure, write_results, compare_to_baseline, print_results
+from benchmarks.frames import RESOLUTIONS, load_frame
+
+from PIL import Image
+
+from services.cache_module import _screenshot_cache, _cache_lock
+from services.screenshot_utils import annotate_screenshot
+from services.foveation import build_observation
+from services.frame_diff import changed_regions
+from services.screenshot_module import render_grid
+from services import image_utils
+from services.find_ui import encode_image_to_base64, get_cell_center_coordinates
+from services.execute_funcs import extract_json
+from config import NUM_CELLS, GRID_CELL_BUDGET
+
+
+def _jpeg_bytes(pil_image):
+    buffer = io.BytesIO()
+    pil_image.save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def llm_outputs():
+    """Representative and pathological LLM responses for extract_json"""
+    command = {"command": "move_cursor_to_element", "params": {"name": "Download button, blue button with text 'Download'"}}
+    prose = (
+        "[What I see on screenshot] A browser window with a download page is open. "
+        "The cursor is in the middle of the screen.\n[Analysis] Need to click the button.\n"
+    )
+    typical = prose + "[Commands]\n```json\n" + ",\n".join(json.dumps(command) for _ in range(3)) + "\n```\n"
+
+    large = (prose * 200) + "[Commands]\n" + "\n".join(json.dumps(command) for _ in range(100))
+
+    # A brace that never closes: the scanner accumulates the whole rest of the text
+    unclosed = prose + "{" + ("x" * 50000)
+
+    # Thousands of small brace pairs that are not valid JSON
+    many_invalid = "text {not json} " * 5000
+
+    # Deeply nested but valid object
+    nested = prose + ('{"a": ' * 500) + '1' + ('}' * 500)
+
+    return {
+        'typical': typical,
+        'large': large,
+        'unclosed_brace': unclosed,
+        'many_invalid_objects': many_invalid,
+        'deeply_nested': nested,
+    }
+
+
+def run(resolutions, repeat, name_filter=None):
+    results = {}
+
+    def bench(name, fn, **kwargs):
+        if name_filter and name_filter not in name:
+            return
+        results[name] = measure(fn, repeat=repeat, **kwargs)
+        print(f"{name:<48} {results[name]['median_ms']:>10.3f} ms")
+
+    tmp_dir = tempfile.mkdtemp(prefix='agent-bench-')
+    rng = random.Random(0)
+
+    for resolution in resolutions:
+        frame = load_frame(resolution)
+        height, width = frame.shape[:2]
+        cursor = (width // 3, height // 2)
+        full_pil = Image.fromarray(frame)
+
+        # save_screenshot: LANCZOS downscale + cursor dot, then JPEG encode
+        bench(f'save_screenshot.resize_annotate[{resolution}]',
+              lambda: annotate_screenshot(frame, cursor))
+        resized = annotate_screenshot(frame, cursor)
+        bench(f'save_screenshot.jpeg[{resolution}]', lambda: _jpeg_bytes(resized))
+
+        # frame_diff: an action redraws a dialog and a status bar line
+        after = full_pil.copy()
+        after.paste((230, 230, 230), (width // 3, height // 3, width // 3 + 400, height // 3 + 250))
+        after.paste((20, 20, 20), (0, height - 30, width // 4, height - 10))
+        bench(f'frame_diff[{resolution}]', lambda: changed_regions(full_pil, after))
+        changed = changed_regions(full_pil, after)
+
+        # capture_observation with foveation: global view, changed-region and cursor/window crops, encoded
+        focused = (width // 4, height // 4, width // 2, height // 2)
+        bench(f'foveated_observation[{resolution}]',
+              lambda: build_observation(after, cursor, focused=focused, changed=changed))
+
+        # save_screenshot_with_grid: grid overlay, then the two full-size JPEGs
+        bench(f'save_screenshot_with_grid.render[{resolution}]',
+              lambda: render_grid(frame, cursor, NUM_CELLS))
+        # Adaptive grid: edge integral, quadtree split and labels
+        bench(f'save_screenshot_with_grid.render_adaptive[{resolution}]',
+              lambda: render_grid(frame, cursor, GRID_CELL_BUDGET, adaptive=True))
+        grid = render_grid(frame, cursor, NUM_CELLS)
+        annotated_pil = Image.fromarray(grid['annotated'])
+        bench(f'save_screenshot_with_grid.jpeg[{resolution}]',
+              lambda: (_jpeg_bytes(full_pil), _jpeg_bytes(annotated_pil)))
+
+        # convert_to_base64 on the saved fullscreen screenshot, cache cleared every run
+        path = os.path.join(tmp_dir, f'fullscreen-{resolution}.jpg')
+        resized.save(path, 'JPEG')
+
+        def clear_base64_cache():
+            with image_utils._cache_lock:
+                image_utils._base64_cache.clear()
+
+        bench(f'convert_to_base64[{resolution}]',
+              lambda: image_utils.convert_to_base64(path), setup=clear_base64_cache)
+
+        # find_ui.encode_image_to_base64 on a full-resolution PIL image
+        bench(f'find_ui.encode_image_to_base64[{resolution}]',
+              lambda: encode_image_to_base64(pil_image=full_pil))
+
+        # Grid cell lookups: 100 random cells per run
+        cells = grid['cells']
+        lookups = [rng.randint(1, len(cells)) for _ in range(100)]
+
+        def install_grid():
+            with _cache_lock:
+                _screenshot_cache['grid_cells'] = cells
+
+        def lookup_cells():
+            for cell_number in lookups:
+                get_cell_center_coordinates(cell_number)
+
+        install_grid()
+        bench(f'grid.cell_lookup_x100[{resolution}]', lookup_cells)
+
+    for name, text in llm_outputs().items():
+        bench(f'extract_json.{name}', lambda text=text: extract_json(text))
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline microbenchmarks for the agent hot paths")
+    parser.add_argument('--resolutions', default=','.join(RESOLUTIONS),
+                        help=f"Comma separated list out of {', '.join(RESOLUTIONS)}")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per benchmark")
+    parser.add_argument('--filter', default=None, help="Only run benchmarks whose name contains this text")
+    parser.add_argument('--output', default='benchmarks/results/hot_paths.json', help="Where to write JSON results")
+    parser.add_argument('--baseline', default=None, help="Results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Relative slowdown of the median counted as a regression")
+    args = parser.parse_args(argv)
+
+    resolutions = [r.strip().lower() for r in args.resolutions.split(',') if r.strip()]
+    for resolution in resolutions:
+        if resolution not in RESOLUTIONS:
+            parser.error(f"Unknown resolution: {resolution}")
+
+    results = run(resolutions, args.repeat, args.filter)
+    print_results(results)
+    write_results(args.output, 'hot_paths', results)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Speedup of the shared-memory image worker pool over in-process processing.
+
+    python -m benchmarks.image_pool
+    python -m benchmarks.image_pool --resolutions 4k --workers 2,4 --repeat 10
+
+For every resolution, measured in-process and on a pool of each size:
+- observation: LANCZOS downscale to 512 px high (save_screenshot, the
+  global view of the foveated observation),
+- grid: adaptive grid rendering plus the full-resolution and grid JPEGs
+  (save_screenshot_with_grid).
+Also reported is the longest stall of a thread that wakes up every
+millisecond while the work runs - how long the work holds the GIL away from
+the voice input thread - and the largest per-channel difference between the
+banded pool resize and the in-process one (up to 1 at non-integer scales). Runs on recorded or synthetic
+frames; needs no display. The speedup is bounded by the number of cores.
+"""
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import measure, write_results, compare_to_baseline, print_results
+from benchmarks.frames import load_frame
+
+from services.image_pool import ImagePool
+from services.screenshot_module import render_grid
+from config import GRID_CELL_BUDGET
+
+
+def _jpeg(image):
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def in_process_grid(frame):
+    grid = render_grid(frame, (200, 200), GRID_CELL_BUDGET, adaptive=True)
+    return _jpeg(Image.fromarray(frame)), _jpeg(Image.fromarray(grid['annotated']))
+
+
+def longest_stall(fn, repeat):
+    """Longest gap (ms) between wake-ups of a 1 ms ticker thread while fn() runs `repeat` times"""
+    stop = threading.Event()
+    gaps = [0.0]
+
+    def ticker():
+        last = time.perf_counter()
+        while not stop.is_set():
+            time.sleep(0.001)
+            now = time.perf_counter()
+            gaps[0] = max(gaps[0], now - last)
+            last = now
+
+    thread = threading.Thread(target=ticker, daemon=True)
+    thread.start()
+    for _ in range(repeat):
+        fn()
+    stop.set()
+    thread.join()
+    return round(gaps[0] * 1000.0, 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Image worker pool speedup over in-process processing")
+    parser.add_argument('--resolutions', default='1080p,4k')
+    parser.add_argument('--workers', default='2,4')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', default='benchmarks/results/image_pool.json')
+    parser.add_argument('--baseline', default=None, help="Results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    results = {}
+    stalls = {}
+    speedups = {}
+    differences = {}
+    pools = {int(n): ImagePool(int(n)) for n in args.workers.split(',')}
+    try:
+        for pool in pools.values():
+            pool.warm_up()
+        for resolution in args.resolutions.split(','):
+            frame = load_frame(resolution)
+            height, width = frame.shape[:2]
+            size = (int(width * 512 / height), 512)
+            image = Image.fromarray(frame)
+
+            variants = {
+                'observation': {'in_process': lambda: image.resize(size, Image.Resampling.LANCZOS)},
+                'grid': {'in_process': lambda: in_process_grid(frame)},
+            }
+            reference = np.asarray(image.resize(size, Image.Resampling.LANCZOS), dtype=np.int16)
+            for workers, pool in pools.items():
+                variants['observation'][f'pool{workers}'] = lambda pool=pool: pool.resize(image, size)
+                banded = np.asarray(pool.resize(image, size), dtype=np.int16)
+                differences[f'observation.pool{workers}[{resolution}]'] = int(np.abs(banded - reference).max())
+                variants['grid'][f'pool{workers}'] = (
+                    lambda pool=pool: pool.grid_jpegs(frame, (200, 200), GRID_CELL_BUDGET, True))
+
+            for job, runners in variants.items():
+                for runner, fn in runners.items():
+                    name = f'{job}.{runner}[{resolution}]'
+                    results[name] = measure(fn, repeat=args.repeat, warmup=2)
+                    stalls[name] = longest_stall(fn, max(1, args.repeat // 2))
+                    if runner != 'in_process':
+                        base = results[f'{job}.in_process[{resolution}]']['median_ms']
+                        speedups[name] = round(base / results[name]['median_ms'], 2)
+    finally:
+        for pool in pools.values():
+            pool.close()
+
+    print_results(results)
+    print(f"\n{'benchmark':<48} {'speedup':>8} {'stall ms':>9} {'max diff':>9}   (cores: {os.cpu_count()})")
+    for name in results:
+        speedup = f"{speedups[name]:.2f}x" if name in speedups else '-'
+        print(f"{name:<48} {speedup:>8} {stalls[name]:>9.2f} {differences.get(name, '-'):>9}")
+    write_results(args.output, 'image_pool', results,
+                  extra={'speedup': speedups, 'longest_stall_ms': stalls, 'max_pixel_difference': differences})
+    if args.baseline and compare_to_baseline(results, args.baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Per-action overhead and keystroke throughput of the input backends.
+
+    python -m benchmarks.input_throughput
+    python -m benchmarks.input_throughput --backends xtest,pyautogui --profiles fast --repeat 50
+
+Every backend/profile pair runs in its own process on a private Xvfb
+display (pyautogui binds to $DISPLAY when imported). Measured: one cursor
+move, click, key press and hotkey, and typing a 200-character ASCII string
+and a 50-character Cyrillic one (characters per second). Nothing on the
+virtual display has focus while timing, so those events are delivered
+nowhere. Afterwards the backend types ASCII, Cyrillic and mixed text into
+the Tk entry app (benchmarks/e2e/apps.py) and the text the entry received
+is compared with what was sent; a mismatch makes the run fail. Without
+Xvfb only the recording backend runs, which shows the dispatch overhead of
+the abstraction itself.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import ROOT_DIR, measure, summarize, write_results, compare_to_baseline, print_results
+
+ASCII_TEXT = ("The quick brown fox jumps over the lazy dog 0123456789. " * 4)[:200]
+CYRILLIC_TEXT = ("Съешь же ещё этих мягких французских булок. " * 2)[:50]
+MIXED_TEXT = "Hello, Мир! ёЁ №5 (x+y)=z; \"ok\" ÄÖÜ ß € 100%"
+# How long the entry app gets to report what it received
+TYPED_TEXT_TIMEOUT = 10.0
+
+
+def _read_state(path):
+    try:
+        with open(path, encoding='utf8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def check_typed_text(backend):
+    """Type into the Tk entry app on $DISPLAY and compare what arrived"""
+    from benchmarks.e2e.apps import ENTRY_LAYOUT, absolute_center
+
+    texts = [ASCII_TEXT, CYRILLIC_TEXT, MIXED_TEXT]
+    state_path = os.path.join(tempfile.mkdtemp(prefix='input-check-'), 'entry.json')
+    app = subprocess.Popen([sys.executable, '-m', 'benchmarks.e2e.apps', 'entry', '--state', state_path],
+                           cwd=ROOT_DIR)
+    try:
+        deadline = time.monotonic() + TYPED_TEXT_TIMEOUT
+        while _read_state(state_path) is None:
+            if app.poll() is not None or time.monotonic() > deadline:
+                return {'ok': False, 'error': "entry app did not start"}
+            time.sleep(0.1)
+        backend.move_to(*absolute_center(ENTRY_LAYOUT, 'entry'))
+        backend.click('left')
+        for text in texts:
+            backend.type_text(text)
+            backend.press('enter')
+        deadline = time.monotonic() + TYPED_TEXT_TIMEOUT
+        submitted = []
+        while time.monotonic() < deadline:
+            submitted = (_read_state(state_path) or {}).get('submitted', [])
+            if len(submitted) >= len(texts):
+                break
+            time.sleep(0.1)
+    except Exception as e:
+        return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+    finally:
+        app.terminate()
+        app.wait()
+    mismatches = [{'sent': sent, 'received': received}
+                  for sent, received in zip(texts, submitted + [None] * len(texts)) if sent != received]
+    return {'ok': not mismatches, 'mismatches': mismatches}
+
+
+def run_child(backend_name, profile, repeat):
+    """Child side: measure one backend on the current $DISPLAY, print JSON"""
+    from services.input_backends import create_backend
+
+    backend = create_backend(backend_name, profile)
+    results = {}
+    positions = [(100, 100), (400, 300)]
+    step = [0]
+
+    def move():
+        step[0] += 1
+        backend.move_to(*positions[step[0] % 2])
+
+    results['move_to'] = measure(move, repeat=repeat)
+    results['click'] = measure(lambda: backend.click('left'), repeat=repeat)
+    results['press'] = measure(lambda: backend.press('shift'), repeat=repeat)
+    results['hotkey'] = measure(lambda: backend.hotkey('ctrl', 'shift'), repeat=repeat)
+
+    throughput = {}
+    for label, text in (('ascii', ASCII_TEXT), ('cyrillic', CYRILLIC_TEXT)):
+        samples = []
+        try:
+            for _ in range(max(1, repeat // 10)):
+                start = time.perf_counter()
+                backend.type_text(text)
+                samples.append((time.perf_counter() - start) * 1000.0)
+        except Exception as e:
+            throughput[label] = {'error': f"{type(e).__name__}: {e}"}
+            continue
+        stats = summarize(samples)
+        results[f'type_{label}_{len(text)}'] = stats
+        throughput[label] = {'chars_per_second': round(len(text) / (stats['median_ms'] / 1000.0), 1)}
+    typed = check_typed_text(backend) if backend_name != 'recording' else None
+    print(json.dumps({'results': results, 'throughput': throughput, 'typed': typed}))
+
+
+def run_on_display(backend_name, profile, repeat, env):
+    command = [sys.executable, '-m', 'benchmarks.input_throughput', '--child', backend_name,
+               '--profiles', profile, '--repeat', str(repeat)]
+    completed = subprocess.run(command, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Input backend latency and typing throughput on Xvfb")
+    parser.add_argument('--backends', default='xtest,pyautogui,recording')
+    parser.add_argument('--profiles', default='fast,smooth')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--output', default='benchmarks/results/input_throughput.json')
+    parser.add_argument('--baseline', default=None, help="Results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown counted as a regression")
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        run_child(args.child, args.profiles, args.repeat)
+        return 0
+
+    from services.virtual_display import VirtualDisplay
+
+    results = {}
+    throughput = {}
+    typed = {}
+    display = VirtualDisplay()
+    try:
+        display.start()
+    except RuntimeError as e:
+        print(f"{e}\nOnly the recording backend is measured.")
+        display = None
+
+    try:
+        for backend_name in args.backends.split(','):
+            if backend_name != 'recording' and display is None:
+                continue
+            for profile in args.profiles.split(','):
+                label = f'{backend_name}[{profile}]'
+                env = display.env() if display is not None else None
+                try:
+                    child = run_on_display(backend_name, profile, args.repeat, env)
+                except RuntimeError as e:
+                    print(f"{label}: {e}")
+                    continue
+                for name, stats in child['results'].items():
+                    results[f'{label}.{name}'] = stats
+                throughput[label] = child['throughput']
+                if child['typed'] is not None:
+                    typed[label] = child['typed']
+    finally:
+        if display is not None:
+            display.stop()
+
+    print_results(results)
+    print("\nTyping throughput (characters per second):")
+    for label, by_text in throughput.items():
+        cells = [f"{text}: {value.get('chars_per_second', value.get('error'))}" for text, value in by_text.items()]
+        print(f"{label:<28} {'   '.join(cells)}")
+    if typed:
+        print("\nTyped text check (Tk entry):")
+    for label, check in typed.items():
+        print(f"{label:<28} {'ok' if check['ok'] else 'FAILED'}")
+        if check.get('error'):
+            print(f"    {check['error']}")
+        for mismatch in check.get('mismatches', []):
+            print(f"    sent     {mismatch['sent']!r}\n    received {mismatch['received']!r}")
+    write_results(args.output, 'input_throughput', results, extra={'throughput': throughput, 'typed': typed})
+    if not all(check['ok'] for check in typed.values()):
+        return 1
+    if args.baseline and compare_to_baseline(results, args.baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Keyword spotter accuracy and latency on audio fixtures.
+
+Clips in benchmarks/audio/ whose labels carry "keyword" (an action from
+KWS_KEYWORDS or one of its spoken forms) must contain that command and are
+scored for detection; all other clips count towards false triggers.
+Templates come from the enrolled KWS_TEMPLATE_DIR, or leave-one-out from
+the other keyword clips when nothing is enrolled. Audio is fed in blocks of
+--block-ms like the input stream delivers it; latency is measured from the
+end of the spoken command to the end of the block whose processing fired,
+plus that processing time.
+
+    python -m benchmarks.kws_eval --thresholds 0.15,0.2,0.25
+    python -m benchmarks.kws_eval --synthetic
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import write_results
+from benchmarks.audio import AUDIO_DIR, load_fixtures, synthetic_keyword_fixtures
+from config import KWS_KEYWORDS, KWS_TEMPLATE_DIR, KWS_THRESHOLD
+from services.keyword_spotter import KeywordSpotter, load_templates, utterance_features
+
+SAMPLE_RATE = 16000
+
+
+def keyword_action(label):
+    if label is None or label in KWS_KEYWORDS:
+        return label
+    for action, words in KWS_KEYWORDS.items():
+        if label.lower() in words:
+            return action
+    raise ValueError(f"Keyword label '{label}' is not in KWS_KEYWORDS")
+
+
+def run_spotter(spotter, audio, block):
+    """Returns detections as (action, score, end_pos, latency_pos) and the processing time"""
+    detections = []
+    busy = 0.0
+    for pos in range(0, audio.shape[0], block):
+        start = time.perf_counter()
+        found = spotter.feed(audio[pos:pos + block], pos)
+        elapsed = time.perf_counter() - start
+        busy += elapsed
+        for action, score, end_pos in found:
+            available = min(pos + block, audio.shape[0])
+            detections.append((action, score, end_pos, available + elapsed * SAMPLE_RATE))
+    return detections, busy
+
+
+def keyword_segment(fixture):
+    """Sample range of the command in a keyword clip (the whole clip without labels)"""
+    if fixture['speech']:
+        start, end = fixture['speech'][-1]
+        return int(start * SAMPLE_RATE), int(end * SAMPLE_RATE)
+    return 0, fixture['audio'].shape[0]
+
+
+def evaluate(fixtures, templates_for, threshold, block):
+    audio_seconds = 0.0
+    busy_seconds = 0.0
+    false_triggers = 0
+    keyword_clips = detected = confused = 0
+    latencies = []
+    per_action = {}
+    for fixture in fixtures:
+        audio = fixture['audio']
+        audio_seconds += audio.shape[0] / SAMPLE_RATE
+        spotter = KeywordSpotter(templates_for(fixture), sample_rate=SAMPLE_RATE, threshold=threshold)
+        detections, busy = run_spotter(spotter, audio, block)
+        busy_seconds += busy
+
+        action = fixture['action']
+        if action is None:
+            false_triggers += len(detections)
+            continue
+
+        keyword_clips += 1
+        stats = per_action.setdefault(action, {'clips': 0, 'detected': 0})
+        stats['clips'] += 1
+        start, end = keyword_segment(fixture)
+        slack = int(0.5 * SAMPLE_RATE)
+        inside = [d for d in detections if start <= d[2] <= end + slack]
+        false_triggers += len(detections) - len(inside)
+        hits = [d for d in inside if d[0] == action]
+        if hits:
+            detected += 1
+            stats['detected'] += 1
+            latencies.append((hits[0][3] - end) * 1000.0 / SAMPLE_RATE)
+        elif inside:
+            confused += 1
+
+    minutes = audio_seconds / 60.0
+    return {
+        'threshold': threshold,
+        'keyword_clips': keyword_clips,
+        'recall': round(detected / keyword_clips, 3) if keyword_clips else None,
+        'confused': confused,
+        'false_triggers': false_triggers,
+        'false_triggers_per_minute': round(false_triggers / minutes, 3) if minutes else 0.0,
+        'latency_median_ms': round(float(np.median(latencies)), 1) if latencies else None,
+        'latency_p95_ms': round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+        'rtf': round(busy_seconds / audio_seconds, 4) if audio_seconds else None,
+        'per_action': per_action,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the keyword spotter on audio fixtures")
+    parser.add_argument('--audio-dir', default=AUDIO_DIR, help="Directory with *.wav and labels.json")
+    parser.add_argument('--templates', default=KWS_TEMPLATE_DIR, help="Enrolled template directory")
+    parser.add_argument('--synthetic', action='store_true', help="Use generated keywords instead of recordings")
+    parser.add_argument('--thresholds', default=str(KWS_THRESHOLD), help="Comma separated thresholds to compare")
+    parser.add_argument('--block-ms', type=float, default=50, help="Audio block size fed per call")
+    parser.add_argument('--output', default='benchmarks/results/kws.json', help="Where to write JSON results")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        enrolled, fixtures = synthetic_keyword_fixtures(SAMPLE_RATE)
+        enrolled = {action: [utterance_features(take) for take in takes] for action, takes in enrolled.items()}
+    else:
+        fixtures = load_fixtures(args.audio_dir, SAMPLE_RATE)
+        enrolled = load_templates(args.templates)
+    if not fixtures:
+        print(f"No WAV fixtures in {args.audio_dir}; record some or pass --synthetic")
+        return 1
+    for fixture in fixtures:
+        fixture['action'] = keyword_action(fixture.get('keyword'))
+
+    if enrolled:
+        templates_for = lambda fixture: enrolled
+        source = 'enrolled'
+    else:
+        # Leave-one-out: every keyword clip is matched against the other clips of the same action
+        clips = {}
+        for fixture in fixtures:
+            if fixture['action']:
+                start, end = keyword_segment(fixture)
+                clips.setdefault(fixture['action'], []).append(
+                    (fixture['name'], utterance_features(fixture['audio'][start:end], SAMPLE_RATE)))
+        templates_for = lambda fixture: {action: [features for name, features in takes if name != fixture['name']]
+                                         for action, takes in clips.items()}
+        source = 'leave-one-out'
+        if not clips:
+            print(f"No enrolled templates in {args.templates} and no keyword clips to build them from")
+            return 1
+
+    block = int(SAMPLE_RATE * args.block_ms / 1000)
+    thresholds = [float(t) for t in args.thresholds.split(',') if t.strip()]
+    results = {f"threshold={t}": evaluate(fixtures, templates_for, t, block) for t in thresholds}
+
+    print(f"\ntemplates: {source}, block {args.block_ms:.0f} ms")
+    print(f"{'threshold':>9} {'recall':>7} {'confused':>9} {'false/min':>10} {'lat p50':>8} {'lat p95':>8} {'RTF':>7}")
+    for r in results.values():
+        fmt = lambda v: '-' if v is None else f"{v}"
+        print(f"{r['threshold']:>9} {fmt(r['recall']):>7} {r['confused']:>9} {r['false_triggers_per_minute']:>10} "
+              f"{fmt(r['latency_median_ms']):>8} {fmt(r['latency_p95_ms']):>8} {fmt(r['rtf']):>7}")
+
+    write_results(args.output, 'kws', results,
+                  extra={'templates': source, 'block_ms': args.block_ms, 'fixtures': [f['name'] for f in fixtures]})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
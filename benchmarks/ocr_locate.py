@@ -0,0 +1,174 @@
+"""
+Hit rate and latency of the local OCR index for quoted labels.
+
+    python -m benchmarks.ocr_locate
+    python -m benchmarks.ocr_locate --resolutions 1080p --repeat 5
+
+Quoted label extraction is checked first on QUOTE_CASES (apostrophes
+inside words are not quotes); a wrong result fails the run. Then a
+synthetic screen with text buttons at known boxes is drawn on the
+benchmark desktop. Measured: a full index build, an incremental refresh
+after one button is relabelled, and a lookup per label. A lookup is a hit
+when the returned point is inside the button, wrong when it is outside,
+and a miss when OCR declines (the agent then asks the grid LLM). Some
+labels are drawn twice on purpose; declining those is the correct answer.
+The grid LLM path for comparison is agent_locate_llm_seconds in the agent
+metrics (--metrics-port) - typically seconds, against milliseconds here.
+
+Needs pytesseract and the tesseract binary; without them the suite is
+skipped.
+"""
+import argparse
+import random
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from benchmarks.common import measure, summarize, write_results, compare_to_baseline, print_results
+from benchmarks.frames import RESOLUTIONS, synthetic_desktop
+
+LABELS = ['Download', 'Cancel', 'Save as', 'Open file', 'Settings', 'Sign in', 'Next', 'Back', 'Apply',
+          'Close', 'Export PDF', 'New folder', 'Search', 'Delete', 'Rename', 'Share link', 'Print',
+          'Help', 'Refresh', 'Upload']
+# Drawn twice, so a correct lookup declines them
+DUPLICATED = ['Cancel', 'Next']
+
+# (element description, quoted labels expected from it); checked before the OCR run
+QUOTE_CASES = [
+    ("the 'Save' button", ['Save']),
+    ("the 'Don't save' button", ["Don't save"]),
+    ("user's profile 'Save' button", ['Save']),
+    ("Click on John's avatar and Mary's name", []),
+    ("'Save' and 'Cancel' buttons", ['Save', 'Cancel']),
+    ('the "Save as" menu item', ['Save as']),
+    ("the ‘Don’t save’ button", ['Don’t save']),
+    ("кнопка «Сохранить»", ['Сохранить']),
+]
+
+
+def _font(size):
+    for name in ('DejaVuSans.ttf', 'Arial.ttf', 'LiberationSans-Regular.ttf'):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def draw_buttons(width, height, seed=0):
+    """Desktop frame with labelled buttons; returns (image, [(label, box)], font)"""
+    rng = random.Random(seed)
+    image = Image.fromarray(synthetic_desktop(width, height, seed))
+    draw = ImageDraw.Draw(image)
+    font = _font(max(12, height // 72))
+
+    labels = LABELS + DUPLICATED
+    cols = 5
+    cell_w, cell_h = width // (cols + 1), height // (len(labels) // cols + 2)
+    buttons = []
+    for i, label in enumerate(labels):
+        left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+        w, h = right - left + 24, bottom - top + 14
+        x = (i % cols) * cell_w + cell_w // 2 + rng.randint(0, max(1, cell_w - w) // 2)
+        y = (i // cols) * cell_h + cell_h // 2 + rng.randint(0, max(1, cell_h - h) // 2)
+        draw.rectangle((x, y, x + w, y + h), fill=(235, 235, 240), outline=(90, 90, 100))
+        draw.text((x + 12 - left, y + 7 - top), label, fill=(15, 15, 20), font=font)
+        buttons.append((label, (x, y, w, h)))
+    return image, buttons, font
+
+
+def relabel(image, box, label, font):
+    """Copy of `image` with the button at `box` showing `label`"""
+    image = image.copy()
+    draw = ImageDraw.Draw(image)
+    x, y, w, h = box
+    left, top, _, _ = draw.textbbox((0, 0), label, font=font)
+    draw.rectangle((x, y, x + w, y + h), fill=(235, 235, 240), outline=(90, 90, 100))
+    draw.text((x + 12 - left, y + 7 - top), label, fill=(15, 15, 20), font=font)
+    return image
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OCR index hit rate and latency")
+    parser.add_argument('--resolutions', default='1080p,4k')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmarks/results/ocr_locate.json')
+    parser.add_argument('--baseline', default=None, help="Results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    from services.ocr_index import OcrIndex, quoted_labels
+    failed = [(description, expected, quoted_labels(description)) for description, expected in QUOTE_CASES
+              if quoted_labels(description) != expected]
+    for description, expected, found in failed:
+        print(f"FAIL quoted_labels({description!r}) = {found}, expected {expected}")
+    if failed:
+        return 1
+    print(f"Quoted labels: {len(QUOTE_CASES)} cases ok")
+
+    try:
+        probe = OcrIndex()
+        probe.pytesseract.get_tesseract_version()
+    except Exception as e:
+        print(f"Skipped: OCR unavailable ({e})")
+        return 0
+
+    results = {}
+    accuracy = {}
+    for resolution in args.resolutions.split(','):
+        width, height = RESOLUTIONS[resolution]
+        image, buttons, font = draw_buttons(width, height)
+
+        def build():
+            index = OcrIndex()
+            index.refresh(image)
+            return index
+
+        results[f'full_build[{resolution}]'] = measure(build, repeat=args.repeat, warmup=1)
+
+        index = build()
+        changed = relabel(image, buttons[0][1], 'Uploaded', font)
+        state = {}
+
+        def setup():
+            state['index'] = OcrIndex()
+            state['index'].words = list(index.words)
+            state['index'].frame = image
+
+        results[f'incremental_refresh[{resolution}]'] = measure(
+            lambda: state['index'].refresh(changed), repeat=args.repeat, warmup=1, setup=setup)
+
+        counts = {'hit': 0, 'wrong': 0, 'miss': 0, 'declined_duplicate': 0, 'located_duplicate': 0}
+        samples = []
+        for label in dict.fromkeys(label for label, _ in buttons):
+            description = f"button with text '{label}'"
+            start = time.perf_counter()
+            found = index.find(quoted_labels(description)[0])
+            samples.append((time.perf_counter() - start) * 1000.0)
+            if label in DUPLICATED:
+                counts['declined_duplicate' if found is None else 'located_duplicate'] += 1
+                continue
+            if found is None:
+                counts['miss'] += 1
+                continue
+            cx, cy = found[0] + found[2] // 2, found[1] + found[3] // 2
+            x, y, w, h = next(box for name, box in buttons if name == label)
+            counts['hit' if x <= cx <= x + w and y <= cy <= y + h else 'wrong'] += 1
+        results[f'lookup[{resolution}]'] = summarize(samples)
+        unique = len(LABELS) - len(DUPLICATED)
+        counts['hit_rate'] = round(counts['hit'] / unique, 3)
+        accuracy[resolution] = counts
+
+    print_results(results)
+    print("\nLabel lookups (duplicated labels should be declined):")
+    for resolution, counts in accuracy.items():
+        print(f"{resolution:<8} " + '   '.join(f"{key}: {value}" for key, value in counts.items()))
+    write_results(args.output, 'ocr_locate', results, extra={'accuracy': accuracy})
+    if args.baseline and compare_to_baseline(results, args.baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
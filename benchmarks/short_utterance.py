@@ -0,0 +1,114 @@
+"""
+Short-utterance decoding against the padded 30 s path of openai-whisper.
+
+Every speech clip is transcribed by the same loaded model twice: with
+WhisperBackend.transcribe_full() (model.transcribe, mel padded to 30 s)
+and with transcribe_short() (mel of the real audio only, trimmed encoder
+context, one decode pass). Reports latency of both paths, CER against the
+"text" label where present and CER of the short path against the full one.
+
+    python -m benchmarks.short_utterance --model tiny
+    python -m benchmarks.short_utterance --synthetic
+
+--synthetic replaces recordings with generated 1-5 s utterances: latency
+and the short path's CER against the full path are reported, CER against
+a reference transcript is not.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import summarize, write_results
+from benchmarks.audio import AUDIO_DIR, load_fixtures, synthetic_utterances, char_error_rate
+from services.speech_backends import WhisperBackend, parse_model_spec
+
+SAMPLE_RATE = 16000
+
+
+def timed(fn, audio, language, repeat):
+    latencies = []
+    text = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = fn(audio, language)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return text, latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare short-utterance and padded Whisper decoding")
+    parser.add_argument('--model', default='tiny', help="openai-whisper model size")
+    parser.add_argument('--language', default='ru')
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--repeat', type=int, default=3, help="Transcriptions per clip and path")
+    parser.add_argument('--audio-dir', default=AUDIO_DIR, help="Directory with *.wav and labels.json")
+    parser.add_argument('--synthetic', action='store_true',
+                        help="Use generated utterances instead of recordings (latency and RTF only, no CER)")
+    parser.add_argument('--output', default='benchmarks/results/short_utterance.json', help="Where to write JSON results")
+    args = parser.parse_args(argv)
+
+    try:
+        backend, model_name = parse_model_spec(args.model)
+    except ValueError as e:
+        parser.error(str(e))
+    if backend != WhisperBackend.name:
+        parser.error("the short-utterance path is implemented for openai-whisper models only")
+
+    if args.synthetic:
+        fixtures = synthetic_utterances(SAMPLE_RATE)
+    else:
+        fixtures = [f for f in load_fixtures(args.audio_dir, SAMPLE_RATE) if f['speech'] or f.get('text')]
+    if not fixtures:
+        print(f"No speech fixtures in {args.audio_dir}; record some or pass --synthetic")
+        return 1
+
+    try:
+        model = WhisperBackend(model_name, device=args.device)
+    except ImportError as e:
+        print(f"Skipped: openai-whisper is not installed ({e})")
+        return 0
+    warmup = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    model.transcribe_full(warmup, args.language)
+    model.transcribe_short(warmup, args.language)
+
+    full_latencies, short_latencies = [], []
+    full_errors, short_errors, agreement = [], [], []
+    clips = []
+    for fixture in fixtures:
+        audio = fixture['audio']
+        full_text, full_ms = timed(model.transcribe_full, audio, args.language, args.repeat)
+        short_text, short_ms = timed(model.transcribe_short, audio, args.language, args.repeat)
+        full_latencies += full_ms
+        short_latencies += short_ms
+        agreement.append(char_error_rate(full_text, short_text))
+        if fixture.get('text'):
+            full_errors.append(char_error_rate(fixture['text'], full_text))
+            short_errors.append(char_error_rate(fixture['text'], short_text))
+        clips.append({'name': fixture['name'], 'seconds': round(audio.shape[0] / SAMPLE_RATE, 2),
+                      'full': full_text, 'short': short_text})
+        print(f"  {fixture['name']:<32} full {np.median(full_ms):>8.1f} ms  short {np.median(short_ms):>8.1f} ms"
+              f"  '{full_text}' / '{short_text}'")
+
+    mean = lambda values: round(float(np.mean(values)), 4) if values else None
+    results = {
+        'full': dict(summarize(full_latencies), cer=mean(full_errors)),
+        'short': dict(summarize(short_latencies), cer=mean(short_errors), cer_vs_full=mean(agreement)),
+    }
+    speedup = results['full']['median_ms'] / max(results['short']['median_ms'], 1e-9)
+
+    print(f"\n{'path':<8} {'p50 ms':>9} {'p95 ms':>9} {'CER':>6}")
+    for name, r in results.items():
+        cer = '-' if r['cer'] is None else f"{r['cer']:.3f}"
+        print(f"{name:<8} {r['median_ms']:>9.1f} {r['p95_ms']:>9.1f} {cer:>6}")
+    print(f"speedup x{speedup:.2f}, short vs full CER {results['short']['cer_vs_full']:.3f}")
+
+    write_results(args.output, 'short_utterance', results,
+                  extra={'model': model.describe(), 'language': args.language,
+                         'speedup': round(speedup, 2), 'clips': clips})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Speech backend comparison: load time, latency, real-time factor and
+character error rate per backend on the WAV fixtures.
+
+    python -m benchmarks.speech_rtf --models tiny,ct2:tiny,ct2:base
+    python -m benchmarks.speech_rtf --synthetic
+
+Clips come from benchmarks/audio/ (see benchmarks/audio.py); the "text"
+label of a clip is used as the reference transcript. Without recordings,
+--synthetic uses generated 1-5 s utterances: load time, latency and RTF
+are measured, CER is not. RTF is processing
+time divided by audio duration (below 1.0 is faster than real time).
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import summarize, write_results
+from benchmarks.audio import AUDIO_DIR, load_fixtures, synthetic_utterances, char_error_rate
+from services.speech_backends import create_backend, parse_model_spec
+
+SAMPLE_RATE = 16000
+
+
+def benchmark_backend(spec, fixtures, language, repeat, device=None):
+    load_start = time.perf_counter()
+    backend = create_backend(spec, device=device)
+    load_ms = (time.perf_counter() - load_start) * 1000.0
+
+    # One untimed call so lazy initialisation does not count against the first clip
+    backend.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language)
+
+    latencies = []
+    rtfs = []
+    errors = []
+    for fixture in fixtures:
+        audio = fixture['audio']
+        duration = audio.shape[0] / SAMPLE_RATE
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text = backend.transcribe(audio, language)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed * 1000.0)
+            rtfs.append(elapsed / duration)
+        if fixture.get('text'):
+            errors.append(char_error_rate(fixture['text'], text))
+        print(f"  {fixture['name']:<32} {elapsed * 1000:>8.1f} ms  '{text}'")
+
+    result = summarize(latencies)
+    result.update({
+        'backend': backend.describe(),
+        'load_ms': round(load_ms, 1),
+        'rtf_median': round(float(np.median(rtfs)), 4),
+        'rtf_p95': round(float(np.percentile(rtfs, 95)), 4),
+        'cer': round(float(np.mean(errors)), 4) if errors else None,
+    })
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare speech backends on WAV fixtures")
+    parser.add_argument('--models', default='tiny,ct2:tiny', help="Comma separated --voice-model values")
+    parser.add_argument('--language', default='ru')
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--repeat', type=int, default=3, help="Transcriptions per clip")
+    parser.add_argument('--audio-dir', default=AUDIO_DIR, help="Directory with *.wav and labels.json")
+    parser.add_argument('--synthetic', action='store_true',
+                        help="Use generated utterances instead of recordings (latency and RTF only, no CER)")
+    parser.add_argument('--output', default='benchmarks/results/speech.json', help="Where to write JSON results")
+    args = parser.parse_args(argv)
+
+    specs = [spec.strip() for spec in args.models.split(',') if spec.strip()]
+    for spec in specs:
+        try:
+            parse_model_spec(spec)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.synthetic:
+        fixtures = synthetic_utterances(SAMPLE_RATE)
+    else:
+        # Only clips that contain speech are meaningful for latency and accuracy
+        fixtures = [f for f in load_fixtures(args.audio_dir, SAMPLE_RATE) if f['speech'] or f.get('text')]
+    if not fixtures:
+        print(f"No speech fixtures in {args.audio_dir}; record some or pass --synthetic")
+        return 1
+
+    results = {}
+    for spec in specs:
+        print(f"\n=== {spec} ===")
+        try:
+            results[spec] = benchmark_backend(spec, fixtures, args.language, args.repeat, args.device)
+        except ImportError as e:
+            print(f"Skipped: {spec} is not installed ({e})")
+    if not results:
+        return 0
+
+    print(f"\n{'model':<16} {'load ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'RTF p50':>8} {'CER':>6}")
+    for spec, r in results.items():
+        cer = '-' if r['cer'] is None else f"{r['cer']:.3f}"
+        print(f"{spec:<16} {r['load_ms']:>9.0f} {r['median_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['rtf_median']:>8.3f} {cer:>6}")
+
+    write_results(args.output, 'speech', results, extra={'language': args.language})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Cold start: how long `import main` takes in a fresh interpreter, and which
+heavy packages the no-voice path pulls in.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 10 --baseline benchmarks/results/startup-baseline.json
+
+The check imports main plus every module an agent step can reach without
+voice input (command execution, element location, grid rendering) and
+fails if any speech stack module was loaded; `import main` on its own must
+not load OpenCV, the OpenAI client or pynput either, since those are only
+needed once the agent actually runs. The exit status is non-zero when a
+check fails or, with --baseline, when startup got slower than --threshold.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.common import ROOT_DIR, summarize, write_results, compare_to_baseline, print_results
+
+# Packages that must never be loaded on the --no-voice path
+SPEECH_MODULES = ['torch', 'whisper', 'faster_whisper', 'ctranslate2', 'sounddevice', 'services.voice_input']
+# Packages that `import main` must leave to first use
+DEFERRED_MODULES = ['cv2', 'openai', 'pynput', 'services.find_ui']
+
+NO_VOICE_PATH = "import main, services.execute_funcs, services.find_ui, services.screenshot_module"
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = (time.perf_counter() - start) * 1000.0
+print(json.dumps({{'ms': elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def probe(statement):
+    """Run `statement` in a fresh interpreter; returns (ms, loaded module names)"""
+    completed = subprocess.run([sys.executable, '-c', _PROBE.format(statement=statement)],
+                               cwd=ROOT_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"'{statement}' failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result['ms'], set(result['modules'])
+
+
+def loaded(modules, names):
+    """Names from `names` present in `modules` (a package counts if any submodule is loaded)"""
+    return [name for name in names if name in modules or any(m.startswith(name + '.') for m in modules)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agent cold start time and import hygiene checks")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument('--output', default='benchmarks/results/startup.json', help="Where to write JSON results")
+    parser.add_argument('--baseline', default=None, help="Results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    failures = []
+
+    _, modules = probe(NO_VOICE_PATH)
+    speech = loaded(modules, SPEECH_MODULES)
+    if speech:
+        failures.append(f"--no-voice path imports the speech stack: {', '.join(speech)}")
+
+    samples = []
+    for _ in range(args.repeat):
+        ms, modules = probe("import main")
+        samples.append(ms)
+    deferred = loaded(modules, DEFERRED_MODULES)
+    if deferred:
+        failures.append(f"import main loads modules that should be imported on first use: {', '.join(deferred)}")
+
+    client_samples = [probe("from services.openrouter_api import get_client; get_client()")[0]
+                      for _ in range(args.repeat)]
+
+    results = {
+        'import_main': summarize(samples),
+        'llm_client': summarize(client_samples),
+    }
+    print_results(results)
+    print(f"Modules loaded by import main: {len(modules)}")
+    write_results(args.output, 'startup', results)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("Import checks passed: no speech stack on the --no-voice path, heavy modules deferred")
+    if args.baseline and compare_to_baseline(results, args.baseline, args.threshold):
+        return 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Voice activity detection on recorded audio: false triggers and onset latency.
+
+Replays WAV fixtures (benchmarks/audio/*.wav + labels.json, see
+benchmarks/audio.py) through the streaming VAD used by VoiceInputProcessor
+in 50 ms blocks as delivered by sounddevice, and through the previous
+detector (mean |x| of 200 ms blocks above 0.05) in its 200 ms blocks.
+
+    python -m benchmarks.vad_eval
+    python -m benchmarks.vad_eval --synthetic
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from benchmarks.common import write_results
+from benchmarks.audio import AUDIO_DIR, load_fixtures, synthetic_fixtures
+from services.vad import StreamingVAD
+
+SAMPLE_RATE = 16000
+BLOCK = int(SAMPLE_RATE * 0.05)
+LEGACY_BLOCK = int(SAMPLE_RATE * 0.2)
+
+
+def run_streaming_vad(audio, **vad_options):
+    """Returns segments as (start, end, detected_at) in samples"""
+    vad = StreamingVAD(sample_rate=SAMPLE_RATE, **vad_options)
+    segments = []
+    onset_at = None
+    pos = 0
+    for block_end in range(BLOCK, audio.shape[0] + 1, BLOCK):
+        # The detector thread sees whole frames once the block containing them arrived
+        available = (block_end - pos) // vad.frame_length * vad.frame_length
+        for event in vad.feed(audio[pos:pos + available], pos):
+            if event[0] == 'onset':
+                onset_at = block_end
+            elif event[0] == 'segment':
+                segments.append((event[1], event[2], onset_at))
+        pos += available
+    return segments
+
+
+def run_legacy_vad(audio, threshold=0.05, silence=0.3, max_duration=3.0, min_duration=0.2):
+    """The block-energy detector VoiceInputProcessor used before the streaming VAD"""
+    segments = []
+    recording = False
+    start = last_speech = 0
+    for block_start in range(0, audio.shape[0] - LEGACY_BLOCK + 1, LEGACY_BLOCK):
+        block_end = block_start + LEGACY_BLOCK
+        now = block_end / SAMPLE_RATE
+        energy = float(np.mean(np.abs(audio[block_start:block_end])))
+        if energy > threshold:
+            if not recording:
+                recording = True
+                start = block_start
+                detected_at = block_end
+            last_speech = now
+        if recording:
+            duration = now - start / SAMPLE_RATE
+            if now - last_speech >= silence or duration >= max_duration:
+                if duration >= min_duration:
+                    segments.append((start, block_end, detected_at))
+                recording = False
+    return segments
+
+
+def score(fixtures, detector):
+    total_seconds = 0.0
+    false_triggers = 0
+    utterances = 0
+    detected = 0
+    latencies = []
+    clipping = []
+    for fixture in fixtures:
+        audio = fixture['audio']
+        total_seconds += audio.shape[0] / SAMPLE_RATE
+        speech = [(int(a * SAMPLE_RATE), int(b * SAMPLE_RATE)) for a, b in fixture['speech']]
+        segments = detector(audio)
+
+        for seg_start, seg_end, _ in segments:
+            if not any(seg_start < b and a < seg_end for a, b in speech):
+                false_triggers += 1
+
+        for a, b in speech:
+            utterances += 1
+            hits = [s for s in segments if s[0] < b and a < s[1]]
+            if not hits:
+                continue
+            detected += 1
+            first = min(hits, key=lambda s: s[0])
+            if first[2] is not None:
+                latencies.append((first[2] - a) * 1000.0 / SAMPLE_RATE)
+            clipping.append(max(0, first[0] - a) * 1000.0 / SAMPLE_RATE)
+
+    minutes = total_seconds / 60.0
+    return {
+        'audio_minutes': round(minutes, 2),
+        'false_triggers': false_triggers,
+        'false_triggers_per_minute': round(false_triggers / minutes, 3) if minutes else 0.0,
+        'utterances': utterances,
+        'recall': round(detected / utterances, 3) if utterances else None,
+        'onset_latency_median_ms': round(float(np.median(latencies)), 1) if latencies else None,
+        'onset_latency_p95_ms': round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+        'onset_clipped_median_ms': round(float(np.median(clipping)), 1) if clipping else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate voice activity detection on WAV fixtures")
+    parser.add_argument('--audio-dir', default=AUDIO_DIR, help="Directory with *.wav and labels.json")
+    parser.add_argument('--synthetic', action='store_true', help="Use generated fixtures instead of recordings")
+    parser.add_argument('--preroll-ms', type=float, default=300)
+    parser.add_argument('--snr-db', type=float, default=9.0)
+    parser.add_argument('--output', default='benchmarks/results/vad.json', help="Where to write JSON results")
+    args = parser.parse_args(argv)
+
+    fixtures = synthetic_fixtures(SAMPLE_RATE) if args.synthetic else load_fixtures(args.audio_dir, SAMPLE_RATE)
+    if not fixtures:
+        print(f"No WAV fixtures in {args.audio_dir}; record some or pass --synthetic")
+        return 1
+
+    detectors = {
+        'streaming_vad': lambda audio: run_streaming_vad(audio, preroll_ms=args.preroll_ms, snr_db=args.snr_db),
+        'legacy_block_energy': run_legacy_vad,
+    }
+    results = {name: score(fixtures, detector) for name, detector in detectors.items()}
+
+    print(f"\n{'detector':<22} {'false/min':>10} {'recall':>7} {'onset p50':>10} {'onset p95':>10} {'clipped p50':>12}")
+    for name, r in results.items():
+        fmt = lambda v: '-' if v is None else f"{v}"
+        print(f"{name:<22} {r['false_triggers_per_minute']:>10} {fmt(r['recall']):>7} "
+              f"{fmt(r['onset_latency_median_ms']):>10} {fmt(r['onset_latency_p95_ms']):>10} "
+              f"{fmt(r['onset_clipped_median_ms']):>12}")
+
+    write_results(args.output, 'vad', results, extra={'fixtures': [f['name'] for f in fixtures]})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
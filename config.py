@@ -1,7 +1,160 @@
 OPENROUTER_KEY = 'YOUR-API-KEY-HERE'
 NUM_CELLS = 512
 
+# Element location grid: with GRID_ADAPTIVE busy screen regions get small cells and empty ones
+# large cells (at most GRID_CELL_BUDGET cells, no smaller than GRID_MIN_CELL px, starting from
+# GRID_ROOT_CELL px squares); otherwise a uniform grid of about NUM_CELLS cells
+GRID_ADAPTIVE = True
+GRID_CELL_BUDGET = 320
+GRID_MIN_CELL = 24
+GRID_ROOT_CELL = 240
+
 # AI Settings
 
 MODEL = 'google/gemini-2.0-flash-001'
-SYSTEM_PROMPT = 'default'
\ No newline at end of file
+SYSTEM_PROMPT = 'default'
+
+# Agent loop
+
+# Overlap capture/encode of the next screenshot with history building and voice polling
+# (python main.py --no-pipeline runs the stages strictly one after another)
+PIPELINE_ENABLED = True
+# After an action the next screenshot is taken once two grabs SETTLE_INTERVAL apart differ
+# by less than SETTLE_TOLERANCE (mean absolute pixel difference), or after SETTLE_TIMEOUT
+SETTLE_TIMEOUT = 1.0
+SETTLE_INTERVAL = 0.05
+SETTLE_TOLERANCE = 1.0
+# A prefetched screenshot older than this is captured again before the request
+OBSERVATION_MAX_AGE = 2.0
+
+# Foveated screenshots: the planner gets a downscaled view of the whole screen plus
+# native-resolution crops of the changed regions, the cursor area and the focused window
+FOVEATION_ENABLED = True
+# Pixels of all images of one request together (a single 512 px high 16:9 view is ~466k)
+FOVEA_PIXEL_BUDGET = 600_000
+# Share of the budget for the whole-screen view; the rest is split between the crops
+FOVEA_GLOBAL_SHARE = 0.4
+# Cursor area and focused window crops
+FOVEA_MAX_CROPS = 2
+# Regions that changed since the previous screenshot, sent as crops before the others
+DIFF_TOP_K = 3
+# Pixel limit of one changed-region crop
+DIFF_CROP_PIXELS = 40_000
+# Per-pixel grayscale difference that counts as a change (0-255)
+DIFF_THRESHOLD = 24
+
+# Check clicks, typed text and scrolls for a visible effect and report actions without one
+ACTION_VERIFY = True
+# How long to look for the effect after the action, and how often (seconds)
+ACTION_VERIFY_TIMEOUT = 0.5
+ACTION_VERIFY_INTERVAL = 0.1
+# Also skip the rest of a response's commands after an action without visible effect.
+# Off by default: clicks on an already focused field and late repaints look like misses.
+ACTION_VERIFY_SKIP_REST = False
+
+# Input injection (services/input_backends.py): 'pyautogui', 'xtest', 'auto' (XTest on X11, else
+# pyautogui) or 'recording' (records actions without sending them). XTest stays opt-in until
+# the typed text check of `python -m benchmarks.input_throughput` passes for it on Xvfb
+INPUT_BACKEND = 'pyautogui'
+# 'fast' sends input without pauses or cursor tweens; 'smooth' keeps pyautogui's 0.1 s pause
+# after every action and the animated moves
+INPUT_PROFILE = 'fast'
+
+# Replay stored command sequences of finished runs when the same task starts from a similar screen
+# (off by default; python main.py --replay turns it on for one run, --no-replay off)
+TRAJECTORY_CACHE_ENABLED = False
+TRAJECTORY_CACHE_PATH = 'trajectories.json'
+# Screens match when their 256-bit fingerprints differ in at most this many bits
+TRAJECTORY_MATCH_DISTANCE = 16
+# Stored runs per task (one per distinct start screen)
+TRAJECTORY_MAX_PER_TASK = 5
+# Store runs that typed text (enter_text), with the text in plaintext in TRAJECTORY_CACHE_PATH;
+# off by default, such runs are not stored
+TRAJECTORY_STORE_TEXT = False
+
+# Local OCR index: quoted labels in element descriptions are located without the LLM. Off until
+# `python -m benchmarks.ocr_locate` has been run against agent_locate_llm_seconds: the first
+# lookup builds the index with a synchronous full-screen tesseract pass
+OCR_ENABLED = False
+# Tesseract languages, e.g. 'eng+rus' with the tesseract-ocr-rus data installed
+OCR_LANGUAGES = 'eng'
+# Frames are upscaled before OCR; small UI fonts read poorly at native size
+OCR_UPSCALE = 2
+# Words below this tesseract confidence (0-100) are not indexed
+OCR_MIN_CONFIDENCE = 50
+# Minimum similarity (0-1) of the OCR text to a quoted label
+OCR_MATCH_THRESHOLD = 0.85
+
+# AT-SPI accessibility tree (Linux): elements are looked up by role and name before OCR and the grid LLM.
+# Off until `python -m benchmarks.atspi_smoke` passes and the tree walk time has been measured
+ATSPI_ENABLED = False
+# List the interactive elements of the focused window in every observation (walks the tree each step)
+ATSPI_SUMMARY = False
+ATSPI_SUMMARY_LIMIT = 40
+# Nodes walked per snapshot of the focused application
+ATSPI_MAX_NODES = 4000
+# Minimum similarity (0-1) of an element name to a quoted label
+ATSPI_MATCH_THRESHOLD = 0.9
+# Snapshot lifetime when AT-SPI change events are unavailable (seconds)
+ATSPI_SNAPSHOT_TTL = 2.0
+
+# Process pool for screenshot resize, grid rendering and JPEG encoding (services/image_pool.py).
+# Off until `python -m benchmarks.image_pool` shows a speedup on a multi-core machine; on one core
+# the pool was 20-25% slower than in-process because of the frame copy and IPC
+IMAGE_POOL_ENABLED = False
+# Worker processes; 0 = one per core but one, at most 4
+IMAGE_POOL_WORKERS = 0
+# Smaller frames are processed in-process, where the pool round trip would cost more than it saves
+IMAGE_POOL_MIN_PIXELS = 2560 * 1440
+
+# Monitor geometry cache lifetime where RandR change events are unavailable (seconds)
+DISPLAY_STATE_TTL = 5.0
+
+# Voice input
+
+# Decode utterances up to 10 s without padding them to Whisper's 30 s window
+VOICE_SHORT_UTTERANCE = True
+
+# Keyword spotting for voice control commands: action -> spoken forms
+# (templates are enrolled with python -m services.keyword_spotter --enroll <action>)
+KWS_KEYWORDS = {
+    'stop': ['стоп', 'останови', 'прекрати'],
+    'pause': ['пауза', 'подожди'],
+    'continue': ['продолжай', 'продолжить', 'дальше'],
+}
+KWS_TEMPLATE_DIR = 'keywords'
+# Mean cosine distance along the match; tune on your recordings with python -m benchmarks.kws_eval.
+# On the synthetic eval 0.1 is the only value without false triggers (0.15: 0.6/min, 0.2: 2.3/min)
+KWS_THRESHOLD = 0.1
+# A spotted "stop" only pauses the agent; it stops once the transcription confirms the word
+KWS_CONFIRM_STOP = True
+
+# Persistent speech worker (--voice-worker): a Unix socket in the per-user runtime
+# directory; on Windows localhost TCP. Both use a random per-user key.
+SPEECH_WORKER_HOST = '127.0.0.1'
+SPEECH_WORKER_PORT = 47291
+
+# Tracing
+
+TRACE_ENABLED = False
+TRACE_DIR = 'traces'
+
+# Agent daemon (python main.py --daemon)
+
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 47292
+# Seconds a task waits for an answer (POST /tasks/<id>/input or voice) after the model's "listen";
+# without one the task is done and the next queued task starts
+DAEMON_LISTEN_TIMEOUT = 30.0
+
+# Metrics
+
+# Port for the Prometheus /metrics endpoint on 127.0.0.1 (None disables it)
+METRICS_PORT = None
+
+# Batch runner (python -m services.batch_runner)
+
+# LLM requests in flight and request starts per minute, shared by all agents of a batch
+BATCH_LLM_CONCURRENCY = 4
+BATCH_LLM_RPM = 60
+BATCH_OUTPUT_DIR = 'batch_results'
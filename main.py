@@ -2,52 +2,125 @@
 import warnings
 warnings.filterwarnings("ignore")
 
-from services.cursor import get_cursor_position, get_screen_dimensions, press_hotkey
-from services.openrouter_api import generate
+from services.cursor import press_hotkey
+from services.openrouter_api import generate, warm_up
 from services.execute_funcs import extract_json, process_commands, is_listening, set_listening
-from services.image_utils import convert_to_base64
-from services.screenshot_utils import save_screenshot
-from config import SYSTEM_PROMPT
+from services.screenshot_utils import save_screenshot, capture_observation, last_observation_frame, wait_for_settle
+from services import trajectory_cache
+from services import frame_diff
+from services import tracing
+from services import metrics
+from services.cancellation import CancellationToken, CancelledError
+from config import SYSTEM_PROMPT, PIPELINE_ENABLED, OBSERVATION_MAX_AGE, METRICS_PORT, DAEMON_PORT, TRAJECTORY_CACHE_ENABLED, \
+    KWS_CONFIRM_STOP
 import os
 import json
 import time
 import argparse
 import threading
 import asyncio
+import concurrent.futures
 import queue
 import sys
 import tkinter as tk
-from pynput import keyboard
 
 # Глобальные переменные для управления агентом
 agent_running = True
 agent_status = "Инициализация"
 status_window = None
 stop_event = threading.Event()
+# Режим демона: задачи идут одна за другой, окно статуса и ESC живут между ними
+persistent = False
 
-# Попытка импорта голосового ввода, обработка ошибок
-try:
-    from services.voice_input import VoiceInputProcessor
-    VOICE_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Voice input functionality not available: {e}")
-    print("Running without voice input support.")
-    VOICE_AVAILABLE = False
+# Токен отмены текущего шага (LLM-запрос, поиск элементов, команды и ожидания)
+_step_token = None
+_step_token_lock = threading.Lock()
+
+# Голосовой ввод (sounddevice, модели распознавания) импортируется при первом использовании,
+# чтобы запуск с --no-voice не тратил на него время
+_voice_import_error = None
+
+def voice_input_available():
+    global _voice_import_error
+    if _voice_import_error is None:
+        try:
+            import services.voice_input
+            return True
+        except ImportError as e:
+            _voice_import_error = e
+            print(f"Warning: Voice input functionality not available: {e}")
+            print("Running without voice input support.")
+    return False
 
 # Глобальные переменные для параллельной обработки
-_last_cursor_position = None
-_last_screen_dimensions = None
-_cursor_position_lock = threading.Lock()
-_screen_dimensions_lock = threading.Lock()
 _screenshot_queue = queue.Queue()
 _command_results_queue = queue.Queue()
 
+# Обновления статуса из рабочих потоков; применяются в потоке Tk
+_status_updates = queue.Queue()
+
+# Подписчики на события агента: fn(event, data), event - 'status', 'response', 'results', 'interrupted', 'replayed'
+_agent_listeners = []
+
+def add_agent_listener(fn):
+    _agent_listeners.append(fn)
+
+def remove_agent_listener(fn):
+    if fn in _agent_listeners:
+        _agent_listeners.remove(fn)
+
+def notify_listeners(event, **data):
+    for listener in list(_agent_listeners):
+        try:
+            listener(event, data)
+        except Exception as e:
+            print(f"Ошибка подписчика событий агента: {e}")
+
 # Функция для обновления статуса агента
 def update_agent_status(status):
     global agent_status
     agent_status = status
-    if status_window:
-        status_window.update_status(status)
+    # Tk не потокобезопасен: окно само заберёт обновление в своём цикле after()
+    _status_updates.put(status)
+    notify_listeners('status', status=status)
+
+# Остановка текущей задачи (ESC, «стоп», отмена через API демона)
+def stop_agent(reason):
+    global agent_running
+    agent_running = False
+    stop_event.set()
+    cancel_current_step(reason)
+
+# Сброс флагов остановки перед следующей задачей (режим демона)
+def reset_agent_state():
+    global agent_running
+    agent_running = True
+    stop_event.clear()
+    set_listening(False)
+
+# Установка токена отмены текущего шага
+def set_step_token(token):
+    global _step_token
+    with _step_token_lock:
+        _step_token = token
+
+# Прерывание текущего шага: LLM-запрос и ожидания завершаются в течение ~50 мс
+def cancel_current_step(reason):
+    with _step_token_lock:
+        token = _step_token
+    if token is not None and not token.is_cancelled():
+        print(f"Прерываю текущий шаг: {reason}")
+        token.cancel(reason)
+
+# Отсев служебных "распознаваний" Whisper на тишине и музыке
+def is_meaningful_transcription(text):
+    return bool(text) and "МУЗЫКА" not in text and "Субтит" not in text and "субтит" not in text
+
+# Новая голосовая команда во время шага прерывает его, чтобы сразу учесть исправление
+def on_voice_transcription(text):
+    print(f"[Callback] Распознано: {text}")
+    if is_meaningful_transcription(text):
+        cancel_current_step(f"голосовой ввод: {text.strip()}")
 
 # Класс для создания окна статуса
 class StatusOverlay:
@@ -60,7 +133,7 @@ class StatusOverlay:
         # Размещаем окно в правом верхнем углу
         screen_width = self.root.winfo_screenwidth()
         window_width = 300
-        self.root.geometry(f"{window_width}x80+{screen_width - window_width - 10}+10")
+        self.root.geometry(f"{window_width}x112+{screen_width - window_width - 10}+10")
         
         # Создаем рамку
         self.frame = tk.Frame(self.root, bg="#333333", bd=1)
@@ -74,6 +147,12 @@ class StatusOverlay:
         self.status_label = tk.Label(self.frame, text="Статус: Инициализация", fg="#33ff33", bg="#333333", font=("Arial", 10))
         self.status_label.pack()
         
+        # Ключевые метрики: p50/p95 задержек и скорость итераций
+        self.metrics_label = tk.Label(self.frame, text="", fg="#aaaaaa", bg="#333333", font=("Arial", 8),
+                                      wraplength=window_width - 10, justify=tk.CENTER)
+        self.metrics_label.pack()
+        self.ticks = 0
+        
         # Инструкция
         self.esc_label = tk.Label(self.frame, text="Нажмите ESC чтобы остановить агента", fg="yellow", bg="#333333", font=("Arial", 9))
         self.esc_label.pack(pady=(0, 5))
@@ -86,9 +165,22 @@ class StatusOverlay:
     
     def check_running(self):
         # Если агент остановлен, закрываем окно
-        if not agent_running:
+        if not agent_running and not persistent:
             self.root.destroy()
             return
+        # Применяем накопившиеся обновления статуса (достаточно последнего)
+        status = None
+        while True:
+            try:
+                status = _status_updates.get_nowait()
+            except queue.Empty:
+                break
+        if status is not None:
+            self.update_status(status)
+        # Метрики раз в секунду
+        if self.ticks % 10 == 0:
+            self.metrics_label.config(text=metrics.readout())
+        self.ticks += 1
         self.root.after(100, self.check_running)
 
 # Функция для создания и запуска окна статуса
@@ -100,18 +192,38 @@ def run_status_overlay():
 
 # Обработчик нажатия клавиши ESC
 def on_esc_press(key):
-    global agent_running
+    from pynput import keyboard
     try:
         if key == keyboard.Key.esc:
             print("Нажата клавиша ESC. Останавливаю агента...")
-            agent_running = False
-            stop_event.set()
-            return False  # Прекращаем прослушивание
+            stop_agent("ESC")
+            if not persistent:
+                return False  # Прекращаем прослушивание
     except Exception as e:
         print(f"Ошибка при обработке клавиш: {e}")
 
+# Реакция на ключевые слова детектора (стоп/пауза/продолжай) сразу, без распознавания и LLM
+def on_voice_keyword(action, score):
+    if action == 'stop' and KWS_CONFIRM_STOP:
+        # Ложное срабатывание не должно завершать задачу: ставим на паузу, остановит распознанное «стоп»
+        print("Ключевое слово «стоп». Пауза до подтверждения распознаванием...")
+        update_agent_status("На паузе")
+        set_listening(True)
+        cancel_current_step("стоп")
+    elif action == 'stop':
+        print("Ключевое слово «стоп». Останавливаю агента...")
+        stop_agent("стоп")
+    elif action == 'pause':
+        update_agent_status("На паузе")
+        set_listening(True)
+    elif action == 'continue':
+        update_agent_status("Работаю")
+        set_listening(False)
+
 # Функция для запуска слушателя клавиш
 def start_key_listener():
+    # pynput подключается к X-серверу при импорте: импортируем только когда слушатель нужен
+    from pynput import keyboard
     listener = keyboard.Listener(on_press=on_esc_press)
     listener.start()
     return listener
@@ -136,6 +248,13 @@ def transform_ui_elements(elements):
     
     return transformed
 
+# Подстановка частей снимка экрана на место заглушки в содержимом сообщения
+def fill_observation_slot(content, slot, parts):
+    for index, part in enumerate(content):
+        if part is slot:
+            content[index:index + 1] = parts
+            return
+
 # Функция для создания наглядного текстового представления распознанных объектов
 def get_ui_visual_summary(ui_elements):
     summary = "Распознанные UI-элементы:\n"
@@ -143,56 +262,100 @@ def get_ui_visual_summary(ui_elements):
         summary += f"  [{element['index']}] {element['type']} at ({element['position']['x']}, {element['position']['y']})\n"
     return summary
 
-# Фоновой поток для обновления позиции курсора и размеров экрана
-def update_position_info():
-    global _last_cursor_position, _last_screen_dimensions
-    while agent_running:
-        with _cursor_position_lock:
-            _last_cursor_position = get_cursor_position()
-        with _screen_dimensions_lock:
-            _last_screen_dimensions = get_screen_dimensions()
-        time.sleep(0.05)  # Обновление 20 раз в секунду
+def create_voice_processor(voice_model="tiny", voice_language="ru", voice_worker=False):
+    """Голосовой ввод с обработчиками агента (модель загружается в фоне)"""
+    from services.voice_input import VoiceInputProcessor
+    voice_processor = VoiceInputProcessor(
+        model_name=voice_model,
+        language=voice_language,
+        # Функция обратного вызова: новая голосовая команда прерывает текущий шаг
+        callback=on_voice_transcription,
+        worker=voice_worker,
+        keyword_callback=on_voice_keyword
+    )
+    voice_processor.start()
+    return voice_processor
+
+def run_desktop_agent(task, max_iterations=15, use_voice=True, voice_model="tiny", voice_language="ru",
+                      voice_worker=False, pipeline=PIPELINE_ENABLED, voice_processor=None, show_desktop=True,
+                      user_input=input, use_trajectory_cache=TRAJECTORY_CACHE_ENABLED, listen_timeout=None):
+    """
+    Запуск desktop-агента с заданной задачей.
 
-def run_desktop_agent(task, max_iterations=15, use_voice=True, voice_model="tiny", voice_language="ru"):
-    global _last_cursor_position, _last_screen_dimensions, agent_running
+    voice_processor - уже запущенный голосовой ввод (демон держит его между задачами, здесь он не
+    останавливается); show_desktop - свернуть окна (win+d) перед началом; user_input - откуда брать
+    ответ пользователя в режиме ожидания без голосового ввода (None - ответа не будет, задача выполнена:
+    так завершаются запуски без пользователя); use_trajectory_cache - повторять
+    сохранённые шаги прошлых успешных запусков этой задачи (services/trajectory_cache.py);
+    listen_timeout - сколько секунд ждать голосового ответа в режиме ожидания, прежде чем считать
+    задачу выполненной (None - без ограничения).
+    """
+    global agent_running
 
-    """Запуск desktop-агента с заданной задачей"""
     messages = [{'role': 'user', 'content': [{"type": "text", "text": f"New task: {task}"}]}]
     
     # Инициализация голосового ввода, если включён и доступен
-    voice_processor = None
-    if use_voice and VOICE_AVAILABLE:
+    owns_voice_processor = voice_processor is None
+    if voice_processor is not None:
+        use_voice = True
+    elif use_voice and voice_input_available():
         try:
-            voice_processor = VoiceInputProcessor(
-                model_name=voice_model,
-                language=voice_language,
-                # Добавляем функцию обратного вызова для мгновенной обработки
-                callback=lambda text: print(f"[Callback] Распознано: {text}")
-            )
-            voice_processor.start()
-            print("Voice input включён. Говорите для обратной связи или корректировки.")
+            voice_processor = create_voice_processor(voice_model, voice_language, voice_worker)
+            print("Voice input включён: модель загружается в фоне, говорите для обратной связи или корректировки.")
         except Exception as e:
             print(f"Ошибка инициализации голосового ввода: {e}")
             print("Продолжаем работу без голосового ввода.")
             use_voice = False
     else:
-        if use_voice and not VOICE_AVAILABLE:
+        if use_voice:
             print("Голосовой ввод запрошен, но не доступен. Проверьте зависимости.")
             print("Продолжаем работу без голосового ввода.")
         use_voice = False
     
-    # Запуск фоновых потоков
-    position_thread = threading.Thread(target=update_position_info, daemon=True)
-    position_thread.start()
-
-    press_hotkey('win', 'd')
-    time.sleep(2)
+    # Клиент API создаётся в фоне, пока сворачиваются окна и делается первый снимок
+    warm_up()
+    if show_desktop:
+        press_hotkey('win', 'd')
+        tracing.sleep(2, 'show_desktop')
     save_screenshot()
 
-    conversion_threads = []
+    # Сохранённые шаги этой задачи повторяются без модели, пока экран совпадает с записанным
+    recorder = None
+    if use_trajectory_cache:
+        start_frame = wait_for_settle()
+        recorder = trajectory_cache.TrajectoryRecorder(task, start_frame)
+        trajectory = trajectory_cache.lookup(task, start_frame)
+        if trajectory:
+            print(f"Найдена сохранённая последовательность действий ({len(trajectory['steps'])} шагов), повторяю")
+            update_agent_status("Повтор сохранённых шагов")
+            replay_token = CancellationToken()
+            set_step_token(replay_token)
+            try:
+                with tracing.span('replay', steps=len(trajectory['steps'])):
+                    replayed, complete = trajectory_cache.replay(
+                        trajectory, wait_for_settle, lambda commands: process_commands(commands, replay_token),
+                        recorder)
+            except CancelledError as e:
+                print(f"\nПовтор прерван: {e}")
+                replayed, complete = 0, False
+                recorder.interactive = True
+            finally:
+                set_step_token(None)
+            if complete:
+                print("Задача выполнена повтором сохранённых шагов, без запросов к модели.")
+                trajectory_cache.mark_replayed(task, trajectory)
+                notify_listeners('replayed', steps=replayed, complete=True)
+                recorder = None
+            elif replayed:
+                messages[0]['content'].append({"type": "text", "text": trajectory_cache.describe(trajectory, replayed)})
+                notify_listeners('replayed', steps=replayed, complete=False)
+    
+    # Конвейер: снимок следующего шага готовится в фоне с момента последнего действия
+    pipeline_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) if pipeline else None
+    observation = None
     
-    # Функция для обработки голосового ввода
-    def process_voice_input():
+    # Функция для обработки голосового ввода (wait - сколько ждать новых распознаваний)
+    def process_voice_input(wait=0.5):
         voice_feedback = None
         if use_voice and voice_processor:
             # Проверяем, идет ли процесс распознавания
@@ -202,16 +365,16 @@ def run_desktop_agent(task, max_iterations=15, use_voice=True, voice_model="tiny
                 return None
                 
             poll_start = time.time()
-            while time.time() - poll_start < 0.5:
+            while True:
                 transcriptions = voice_processor.get_all_transcriptions()
                 if transcriptions:
                     for transcription in transcriptions:
-                        if transcription and "МУЗЫКА" not in transcription and "Субтит" not in transcription and "субтит" not in transcription:
+                        if is_meaningful_transcription(transcription):
                             voice_feedback = transcription.strip()
                             print(f"Получен голосовой ввод: {voice_feedback}")
                             
                             # Прямая обработка критичных команд
-                            lower_feedback = voice_feedback.lower()
+                            lower_feedback = voice_feedback.lower().strip(' .,!?')
                             if lower_feedback in ["стоп", "останови", "прекрати"]:
                                 print("Получена команда остановки!")
                                 return "STOP_COMMAND"
@@ -228,10 +391,13 @@ def run_desktop_agent(task, max_iterations=15, use_voice=True, voice_model="tiny
                             
                             set_listening(False)
                             return voice_feedback
-                time.sleep(0.05)
+                if time.time() - poll_start >= wait:
+                    break
+                tracing.sleep(0.05, 'voice_poll')
         return voice_feedback
 
     i = 0
+    listening_since = None
     try:
         # Основной цикл работы агента
         while i < max_iterations and agent_running:
@@ -245,11 +411,14 @@ def run_desktop_agent(task, max_iterations=15, use_voice=True, voice_model="tiny
             if use_voice and voice_processor and voice_processor.is_processing():
                 update_agent_status("Распознавание речи")
                 print("== Идет распознавание речи... ==")
-                time.sleep(0.1)  # Короткая пауза, чтобы не забивать консоль
+                tracing.sleep(0.1, 'voice_processing')  # Короткая пауза, чтобы не забивать консоль
                 continue  # Пропускаем итерацию, пока идет распознавание
             
             # Обработка голосового ввода до всех остальных действий
-            voice_feedback = process_voice_input()
+            with tracing.span('voice_poll', iteration=i) as sp:
+                # В режиме конвейера распознавание идёт в своих потоках - только забираем готовое
+                voice_feedback = process_voice_input(wait=0 if pipeline else 0.5)
+                sp.set(feedback=bool(voice_feedback))
             
             # Специальные команды
             if voice_feedback == "STOP_COMMAND":
@@ -263,39 +432,42 @@ def run_desktop_agent(task, max_iterations=15, use_voice=True, voice_model="tiny
             
             # Если все еще в режиме ожидания и нет голосового ввода, пропускаем итерацию
             if is_listening() and not voice_feedback:
-                update_agent_status("Ожидание пользователя")
-                print('== Ожидаю запрос пользователя ==')
-                time.sleep(0.2)  # Небольшая задержка перед следующей проверкой
+                if listening_since is None:
+                    listening_since = time.time()
+                    update_agent_status("Ожидание пользователя")
+                    print('== Ожидаю запрос пользователя ==')
+                tracing.sleep(0.2, 'listening')  # Небольшая задержка перед следующей проверкой
                 if use_voice:
+                    if listen_timeout is not None and time.time() - listening_since >= listen_timeout:
+                        print("Ответа пользователя нет, задача завершена.")
+                        break
                     continue
-                else:
-                    voice_feedback = input('>> ')
+                voice_feedback = user_input('>> ')
+                if voice_feedback is None:
+                    print("Ответа пользователя не будет, задача завершена.")
+                    break
+            listening_since = None
+
+            # Запуск с участием пользователя не записывается для повтора
+            if voice_feedback and recorder is not None:
+                recorder.interactive = True
 
             update_agent_status("Анализ экрана")
-            save_screenshot()
-            
-            # Параллельное преобразование скриншотов в base64
-            fullscreen_img = None
-            def convert_screenshots():
-                nonlocal fullscreen_img
-                fullscreen_img = convert_to_base64('screenshots/fullscreen.jpg')
-            convert_thread = threading.Thread(target=convert_screenshots)
-            convert_thread.start()
-            conversion_threads.append(convert_thread)
-            
-            # Очистка завершённых потоков конвертации
-            for thread in conversion_threads[:]:
-                if not thread.is_alive():
-                    thread.join()
-                    conversion_threads.remove(thread)
-            
-            # Ожидание завершения конвертации скриншотов
-            convert_thread.join()
+            iteration_span = tracing.start_span('iteration', iteration=i)
+            step_token = CancellationToken()
+            set_step_token(step_token)
+            # Место снимка в запросе: заменяется на изображения (общий вид и детали), когда они готовы
+            observation_slot = {"type": "text", "text": ""}
+            if pipeline:
+                # Снимок обычно уже готовится с конца предыдущего шага
+                if observation is None:
+                    observation = pipeline_executor.submit(capture_observation)
+            else:
+                observation_parts, _ = capture_observation()
 
-            message_content = [
-                {"type": "text", "text": "Fullscreen screenshot:"},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{fullscreen_img}"}}
-            ]
+            # Запрос собирается, пока снимок ещё кодируется; изображение подставляется в конце
+            request_span = tracing.start_span('request_build')
+            message_content = [observation_slot]
 
             # Добавление голосового ввода, если он доступен (сразу для текущей итерации)
             if voice_feedback:
@@ -313,44 +485,100 @@ def run_desktop_agent(task, max_iterations=15, use_voice=True, voice_model="tiny
                 messages[-1]['content'].append({"type": "text", "text": f"'*Screenshots hidden by system*'"})
             else:
                 messages.append({'role': 'user', 'content': [{'role': 'user', 'content': [{"type": "text", "text": f"'*Screenshots hidden by system*'"}]}]})
+            request_span.end()
+            
+            if pipeline:
+                with tracing.span('encode_wait'):
+                    observation_parts, captured_at = observation.result()
+                    observation = None
+                    if time.time() - captured_at > OBSERVATION_MAX_AGE:
+                        # Снимок устарел (например, пока ждали пользователя) - делаем новый
+                        observation_parts, captured_at = capture_observation()
+            fill_observation_slot(temp_messages[-1]['content'], observation_slot, observation_parts)
+            observation_frame = last_observation_frame()
+            frame_diff.mark_sent(observation_frame)
 
-            # Генерация ответа от LLM
-            update_agent_status("Анализ и обработка")
-            generated_text = generate(list(temp_messages), SYSTEM_PROMPT)
+            try:
+                # Генерация ответа от LLM
+                update_agent_status("Анализ и обработка")
+                generated_text = generate(list(temp_messages), SYSTEM_PROMPT, cancel_token=step_token)
             
-            # Извлечение команд и текста из ответа
-            commands, text = extract_json(generated_text)
+                # Извлечение команд и текста из ответа
+                with tracing.span('extract_json', chars=len(generated_text)) as sp:
+                    commands, text = extract_json(generated_text)
+                    sp.set(commands=len(commands))
 
-            print("\nОтвет ассистента:")
-            print(generated_text)
+                print("\nОтвет ассистента:")
+                print(generated_text)
+                notify_listeners('response', iteration=i, text=generated_text, commands=len(commands))
             
-            # Обработка команд, если они есть
-            if commands:
-                print("\nВыполнение команд:")
-                update_agent_status("Выполнение команд")
-                command_results = process_commands(commands)
-
-                results_text = "Результаты выполнения команд:\n"
-                for result in command_results:
-                    status = "+" if result["success"] else "-"
-                    results_text += f"{status} {result['command']}: {result['message']}\n"
-                print(results_text)
+                # Обработка команд, если они есть
+                if commands:
+                    print("\nВыполнение команд:")
+                    update_agent_status("Выполнение команд")
+                    with tracing.span('execute', commands=len(commands)):
+                        command_results = process_commands(commands, step_token, trailing_wait=not pipeline)
+                    if pipeline:
+                        # Последнее действие выполнено: ожидание стабилизации экрана и снимок
+                        # следующего шага идут параллельно с разбором результатов
+                        observation = pipeline_executor.submit(capture_observation, True)
+
+                    results_text = "Результаты выполнения команд:\n"
+                    for result in command_results:
+                        if not result["success"]:
+                            status = "-"
+                        elif result.get("verified") is False:
+                            # Команда выполнена, но на экране ничего не изменилось
+                            status = "!"
+                        else:
+                            status = "+"
+                        results_text += f"{status} {result['command']}: {result['message']}\n"
+                    print(results_text)
+                    notify_listeners('results', iteration=i, results=command_results)
+
+                    if recorder is not None:
+                        recorder.add_step(observation_frame, commands, command_results)
+                        if recorder.finished():
+                            if recorder.save(wait_for_settle()):
+                                print("Последовательность действий сохранена для повтора.")
+                            recorder = None
+                
+                    feedback_message = {"type": "text", "text": results_text}
+                    if messages[-1]['role'] == 'user':
+                        messages.append({'role': 'assistant', 'content': [feedback_message]})
+                    else:
+                        messages[-1]['content'].append({"type": "text", "text": feedback_message})
                 
-                feedback_message = {"type": "text", "text": results_text}
+                    # Обрезка истории, если она становится слишком длинной
+                    if len(messages) > 15:
+                        system_message = messages[0]
+                        recent_messages = messages[-14:]
+                        messages = [system_message] + recent_messages
+                    if not pipeline:
+                        tracing.sleep(0.5, 'iteration_end', step_token)
+                else:
+                    update_agent_status("Ожидание")
+                    if pipeline:
+                        observation = pipeline_executor.submit(capture_observation, True)
+                    else:
+                        tracing.sleep(0.5, 'iteration_end', step_token)
+            except CancelledError as e:
+                # Шаг прерван (ESC, «стоп» или новая голосовая команда): результат шага отбрасываем,
+                # новая обратная связь будет взята в следующей итерации
+                print(f"\nШаг прерван: {e}")
+                update_agent_status("Шаг прерван")
+                notify_listeners('interrupted', iteration=i, reason=str(e))
+                if recorder is not None:
+                    recorder.interactive = True
+                cancel_note = {"type": "text", "text": "The previous step was interrupted by the user before it finished."}
                 if messages[-1]['role'] == 'user':
-                    messages.append({'role': 'assistant', 'content': [feedback_message]})
+                    messages.append({'role': 'assistant', 'content': [cancel_note]})
                 else:
-                    messages[-1]['content'].append({"type": "text", "text": feedback_message})
-                
-                # Обрезка истории, если она становится слишком длинной
-                if len(messages) > 15:
-                    system_message = messages[0]
-                    recent_messages = messages[-14:]
-                    messages = [system_message] + recent_messages
-                time.sleep(0.5)
-            else:
-                update_agent_status("Ожидание")
-                time.sleep(0.5)
+                    messages[-1]['content'].append(cancel_note)
+            finally:
+                set_step_token(None)
+            iteration_span.end()
+            metrics.ITERATIONS.inc()
             i += 1
             
             # Обновляем статус на "Работаю" после всех операций
@@ -360,26 +588,74 @@ def run_desktop_agent(task, max_iterations=15, use_voice=True, voice_model="tiny
     finally:
         update_agent_status("Завершение работы")
         agent_running = False
-        if voice_processor:
+        if voice_processor and owns_voice_processor:
             voice_processor.stop()
+        if pipeline_executor:
+            pipeline_executor.shutdown(wait=False)
+        trace_path = tracing.flush()
+        if trace_path:
+            print(f"Трассировка сохранена: {trace_path}")
         print("Агент остановлен.")
 
+# Проверка значения --voice-model для argparse
+def voice_model_spec(value):
+    from services.speech_backends import parse_model_spec
+    try:
+        parse_model_spec(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
 if __name__ == "__main__":
     import sys
     parser = argparse.ArgumentParser(description="Desktop Agent с голосовым управлением")
     parser.add_argument("task", nargs="?", default="Open Chrome and navigate to youtube.com", 
                         help="Задача для выполнения")
     parser.add_argument("--no-voice", action="store_true", help="Отключить голосовой ввод")
-    parser.add_argument("--voice-model", default="tiny", choices=["tiny", "base", "small", "medium", "large"],
-                        help="Размер модели Whisper для распознавания голоса")
+    parser.add_argument("--voice-model", default="tiny", type=voice_model_spec,
+                        help="Модель распознавания голоса: размер Whisper (tiny, base, small, medium, large) "
+                             "или ct2:<размер> для int8-движка CTranslate2 на CPU")
     parser.add_argument("--voice-language", default="ru", help="Языковой код для распознавания голоса")
+    parser.add_argument("--voice-worker", action="store_true",
+                        help="Распознавать речь в постоянном фоновом процессе, который держит модель "
+                             "загруженной между запусками (python -m services.speech_worker --stop для остановки)")
     parser.add_argument("--max-iterations", type=int, default=15, 
                         help="Максимальное число итераций")
+    parser.add_argument("--no-pipeline", action="store_true",
+                        help="Выполнять этапы шага строго последовательно (снимок, кодирование, запрос, команды, пауза)")
+    parser.add_argument("--replay", action="store_true",
+                        help="Сохранять успешные запуски задачи и повторять их шаги без модели, пока экран совпадает")
+    parser.add_argument("--no-replay", action="store_true",
+                        help="Не повторять сохранённые шаги прошлых успешных запусков задачи, всё планировать моделью")
+    parser.add_argument("--trace", action="store_true",
+                        help="Записывать трассировку этапов (Chrome trace + JSONL) в каталог traces/")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Отдавать метрики в формате Prometheus на http://127.0.0.1:<порт>/metrics")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Не выполнять задачу, а держать агента загруженным и принимать задачи по HTTP "
+                             "(python -m services.agent_daemon submit \"задача\")")
+    parser.add_argument("--daemon-port", type=int, default=DAEMON_PORT, help="Порт API демона на 127.0.0.1")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Показать, сколько времени занимает импорт модулей при запуске с этими параметрами, и выйти")
     
     args = parser.parse_args()
+
+    if args.profile_startup:
+        from services import startup_profile
+        sys.exit(startup_profile.main(["--no-voice"] * args.no_voice + ["--daemon"] * args.daemon))
+
+    if args.trace:
+        tracing.enable()
+    if args.metrics_port:
+        metrics.start_server(args.metrics_port)
+        print(f"Метрики: http://127.0.0.1:{args.metrics_port}/metrics")
     
-    print(f"Запуск desktop-агента с задачей: {args.task}")
+    if args.daemon:
+        print("Запуск desktop-агента в режиме демона")
+    else:
+        print(f"Запуск desktop-агента с задачей: {args.task}")
     print(f"Голосовой ввод: {'отключён' if args.no_voice else 'включён'}")
+    persistent = args.daemon
     
     # Запускаем статусное окно в отдельном потоке
     status_thread = threading.Thread(target=run_status_overlay, daemon=True)
@@ -391,13 +667,33 @@ if __name__ == "__main__":
     update_agent_status("Запуск")
     
     try:
-        run_desktop_agent(
-            task=args.task,
-            max_iterations=args.max_iterations,
-            use_voice=not args.no_voice,
-            voice_model=args.voice_model,
-            voice_language=args.voice_language
-        )
+        if args.daemon:
+            from services import agent_daemon
+            # Голосовой ввод и модель распознавания живут всё время работы демона
+            voice_processor = None
+            if not args.no_voice and voice_input_available():
+                try:
+                    voice_processor = create_voice_processor(args.voice_model, args.voice_language, args.voice_worker)
+                except Exception as e:
+                    print(f"Ошибка инициализации голосового ввода: {e}")
+            try:
+                update_agent_status("Ожидание задач")
+                agent_daemon.serve(sys.modules[__name__], port=args.daemon_port, voice_processor=voice_processor,
+                                   pipeline=PIPELINE_ENABLED and not args.no_pipeline)
+            finally:
+                if voice_processor:
+                    voice_processor.stop()
+        else:
+            run_desktop_agent(
+                task=args.task,
+                max_iterations=args.max_iterations,
+                use_voice=not args.no_voice,
+                voice_model=args.voice_model,
+                voice_language=args.voice_language,
+                voice_worker=args.voice_worker,
+                pipeline=PIPELINE_ENABLED and not args.no_pipeline,
+                use_trajectory_cache=(TRAJECTORY_CACHE_ENABLED or args.replay) and not args.no_replay
+            )
     except Exception as e:
         print(f"Ошибка в работе агента: {e}")
     finally:
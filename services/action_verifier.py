@@ -0,0 +1,108 @@
+import time
+
+from services import tracing
+from services import display_state
+from services.frame_diff import changed_regions
+from config import ACTION_VERIFY_TIMEOUT, ACTION_VERIFY_INTERVAL
+
+# Local check that an action had a visible effect.
+#
+# pyautogui returns as soon as the input event is sent, so a click on
+# nothing, text typed into an unfocused window or a scroll at the end of a
+# page all report success. For the actions below the screen is grabbed
+# before the action and polled for up to ACTION_VERIFY_TIMEOUT afterwards;
+# if nothing relevant changed, the command result gets a "no visible effect"
+# note and the model can retry in the same turn instead of learning it from
+# the next screenshot.
+
+# Side of the square around the click point that must change for a click
+CLICK_AREA = 200
+
+VERIFIED_COMMANDS = {'mouse_button', 'double_click', 'enter_text', 'scroll'}
+
+
+def _grab():
+    import pyautogui
+    return pyautogui.screenshot()
+
+
+def _area(point, size, screen_size):
+    half = size // 2
+    left = min(max(0, point[0] - half), max(0, screen_size[0] - size))
+    top = min(max(0, point[1] - half), max(0, screen_size[1] - size))
+    return left, top, min(screen_size[0], left + size), min(screen_size[1], top + size)
+
+
+def before(command):
+    """
+    State to compare against after `command` runs, or None when the command
+    is not verified. Must be called right before the action.
+    """
+    if command.get('command') not in VERIFIED_COMMANDS:
+        return None
+    with tracing.span('verify_before', command=command['command']):
+        try:
+            return {
+                'frame': _grab(),
+                'cursor': display_state.get_cursor_position(),
+                'focused': display_state.get_focused_window_rect(),
+            }
+        except Exception as e:
+            # Verification is best effort; the action itself still runs
+            print(f"Action verification unavailable: {e}")
+            return None
+
+
+def _effect(command, state, frame):
+    """Description of the effect seen in `frame`, or None if there is none yet"""
+    name = command['command']
+    if name in ('mouse_button', 'double_click'):
+        area = _area(state['cursor'], CLICK_AREA, frame.size)
+        if changed_regions(state['frame'].crop(area), frame.crop(area), k=1, merge_blocks=0):
+            return 'changed near the click point'
+        if display_state.get_focused_window_rect() != state['focused']:
+            return 'focus moved to another window'
+        return None
+    if name == 'enter_text':
+        if display_state.get_focused_window_rect() != state['focused']:
+            return 'focus changed'
+        if changed_regions(state['frame'], frame, k=1, merge_blocks=0):
+            return 'text field changed'
+        return None
+    if name == 'scroll':
+        if changed_regions(state['frame'], frame, k=1, min_pixels=CLICK_AREA):
+            return 'content moved'
+        return None
+    return None
+
+
+def after(command, state, cancel_token=None, timeout=ACTION_VERIFY_TIMEOUT, interval=ACTION_VERIFY_INTERVAL):
+    """
+    Poll the screen until the action shows an effect or `timeout` passes.
+    Returns a note for the command result when nothing changed, else None.
+    """
+    if state is None:
+        return None
+    deadline = time.time() + timeout
+    with tracing.span('verify', command=command['command']) as sp:
+        polls = 0
+        while True:
+            polls += 1
+            try:
+                effect = _effect(command, state, _grab())
+            except Exception as e:
+                print(f"Action verification failed: {e}")
+                return None
+            if effect is not None or time.time() + interval > deadline:
+                sp.set(polls=polls, effect=effect)
+                break
+            tracing.sleep(interval, 'verify_poll', cancel_token)
+
+    if effect is not None:
+        return None
+    name = command['command']
+    if name in ('mouse_button', 'double_click'):
+        return "no visible effect: nothing changed near the click point and focus stayed the same"
+    if name == 'enter_text':
+        return "no visible effect: the text did not appear on screen (is an input field focused?)"
+    return "no visible effect: the content did not move (nothing scrollable under the cursor or already at the end)"
@@ -0,0 +1,96 @@
+import heapq
+
+import numpy as np
+
+from services import tracing
+from config import GRID_CELL_BUDGET, GRID_MIN_CELL, GRID_ROOT_CELL
+
+# Content-adaptive grid for element location.
+#
+# The screen starts as a coarse grid of roughly GRID_ROOT_CELL px squares.
+# The busiest cell - the one with the most edge pixels - is split into four
+# until the cell budget is used up or no cell with edges is larger than
+# GRID_MIN_CELL on a side, so wallpaper and empty page areas keep a few
+# large cells and toolbars and lists get small ones. Edge pixel counts of
+# any rectangle come from an integral image in O(1).
+
+# Gradient magnitude (0-255 grayscale) that counts as an edge
+EDGE_THRESHOLD = 24
+
+
+def edge_integral(frame):
+    """
+    Integral image of the edge mask of an RGB or grayscale frame:
+    ii[y, x] = number of edge pixels above and left of (x, y), with a zero
+    first row and column.
+    """
+    import cv2
+
+    pixels = np.ascontiguousarray(frame)
+    gray = cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY) if pixels.ndim == 3 else pixels.astype(np.uint8)
+    edges = np.zeros(gray.shape, dtype=np.uint8)
+    edges[:, 1:] = cv2.absdiff(gray[:, 1:], gray[:, :-1]) > EDGE_THRESHOLD
+    edges[1:, :] |= cv2.absdiff(gray[1:, :], gray[:-1, :]) > EDGE_THRESHOLD
+    return cv2.integral(edges)
+
+
+def _edges_in(integral, x, y, w, h, step=1):
+    """Edge pixels in the frame rectangle (x, y, w, h) of an integral image taken every `step` pixels"""
+    x0, y0, x1, y1 = x // step, y // step, (x + w) // step, (y + h) // step
+    return int(integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0])
+
+
+def _split(cell):
+    x, y, w, h = cell
+    left, top = w // 2, h // 2
+    return [(x, y, left, top), (x + left, y, w - left, top),
+            (x, y + top, left, h - top), (x + left, y + top, w - left, h - top)]
+
+
+def adaptive_cells(frame, budget=GRID_CELL_BUDGET, min_cell=GRID_MIN_CELL, root_cell=GRID_ROOT_CELL):
+    """
+    Cells (x, y, w, h) covering the frame, at most `budget` of them, in
+    reading order (top to bottom, then left to right).
+    """
+    pixels = np.asarray(frame)
+    height, width = pixels.shape[:2]
+    # Edge density is measured on every step-th pixel of frames above 1080p
+    step = max(1, width // 1920)
+    with tracing.span('adaptive_grid', budget=budget) as sp:
+        integral = edge_integral(pixels[::step, ::step])
+
+        rows = max(1, round(height / root_cell))
+        cols = max(1, round(width / root_cell))
+        while rows * cols > budget and (rows > 1 or cols > 1):
+            rows, cols = max(1, rows - 1), max(1, cols - 1)
+        xs = np.linspace(0, width, cols + 1).astype(int)
+        ys = np.linspace(0, height, rows + 1).astype(int)
+
+        leaves = []
+        # Max-heap of splittable cells by edge pixel count
+        heap = []
+
+        def add(cell):
+            x, y, w, h = cell
+            edges = _edges_in(integral, x, y, w, h, step)
+            if edges and min(w, h) >= 2 * min_cell:
+                heapq.heappush(heap, (-edges, len(leaves), cell))
+            leaves.append(cell)
+
+        for row in range(rows):
+            for col in range(cols):
+                add((int(xs[col]), int(ys[row]), int(xs[col + 1] - xs[col]), int(ys[row + 1] - ys[row])))
+
+        removed = set()
+        count = len(leaves)
+        while heap and count + 3 <= budget:
+            _, index, cell = heapq.heappop(heap)
+            removed.add(index)
+            for child in _split(cell):
+                add(child)
+            count += 3
+
+        cells = [cell for index, cell in enumerate(leaves) if index not in removed]
+        cells.sort(key=lambda c: (c[1], c[0]))
+        sp.set(cells=len(cells))
+    return cells
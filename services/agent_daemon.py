@@ -0,0 +1,432 @@
+"""
+Long-lived agent with a local task API.
+
+A plain `python main.py "task"` pays for imports (cv2, openai, torch when
+voice is on), speech model loading, API client construction, prompt reads
+and the win+d / 2 s desktop reset on every run. `python main.py --daemon`
+does all of that once and then takes tasks over HTTP on 127.0.0.1, running
+them one after another on the same desktop with everything warm:
+
+    POST /tasks                {"task": "...", "max_iterations": 15, "show_desktop": false} -> {"id": ...}
+    GET  /tasks                all tasks with their state
+    GET  /tasks/<id>           one task with all its events so far
+    GET  /tasks/<id>/events    newline-delimited JSON events, streamed until the task ends
+    POST /tasks/<id>/cancel    cancel a queued or running task
+    POST /tasks/<id>/input     {"text": "..."} answer for a task waiting for the user
+                               (it waits DAEMON_LISTEN_TIMEOUT seconds, then counts as done)
+    POST /shutdown             stop the daemon
+
+Every request must carry the per-user token from the 0600 file
+daemon.token in the private runtime directory (services/runtime_dir.py) as
+"Authorization: Bearer <token>", a Host of 127.0.0.1 or localhost with the
+daemon port, no Origin header, and for POST a JSON Content-Type. Web pages
+the user opens can reach 127.0.0.1 too; they cannot read the token, and a
+browser always sends Origin with cross-site POSTs.
+
+Events are {"t": unix time, "event": ..., ...}: "state" (queued, running,
+done, cancelled, failed), "status" (the overlay status line), "response"
+(model output), "results" (command results), "interrupted" and "replayed"
+(steps replayed from the trajectory cache).
+
+The same API from the command line:
+
+    python -m services.agent_daemon submit "Open the editor" --follow
+    python -m services.agent_daemon cancel <id>
+    python -m services.agent_daemon list
+"""
+import argparse
+import hmac
+import itertools
+import json
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import DAEMON_HOST, DAEMON_PORT, DAEMON_LISTEN_TIMEOUT
+from services.cancellation import CancelledError
+from services.runtime_dir import secret
+
+FINAL_STATES = ('done', 'cancelled', 'failed')
+TOKEN_FILE = 'daemon.token'
+
+
+class DaemonTask:
+    def __init__(self, task_id, text, max_iterations=15, show_desktop=False):
+        self.id = task_id
+        self.text = text
+        self.max_iterations = max_iterations
+        self.show_desktop = show_desktop
+        self.state = 'queued'
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.events = []
+        self.changed = threading.Condition()
+        self.replies = queue.Queue()
+        self.cancelled = threading.Event()
+
+    def add_event(self, event, **data):
+        record = {'t': round(time.time(), 3), 'event': event}
+        record.update(data)
+        with self.changed:
+            self.events.append(record)
+            self.changed.notify_all()
+
+    def set_state(self, state, error=None):
+        self.state = state
+        self.error = error
+        if state == 'running':
+            self.started = time.time()
+        elif state in FINAL_STATES:
+            self.finished = time.time()
+        self.add_event('state', state=state, **({'error': error} if error else {}))
+
+    def summary(self):
+        return {
+            'id': self.id, 'task': self.text, 'state': self.state, 'error': self.error,
+            'created': self.created, 'started': self.started, 'finished': self.finished,
+            # Time from submission to the first agent action, the number a warm daemon exists for
+            'start_latency_ms': round((self.started - self.created) * 1000.0, 2) if self.started else None,
+        }
+
+
+class AgentDaemon:
+    """
+    Runs submitted tasks sequentially on the agent in `agent` (the main
+    module); the HTTP handler only touches the task table.
+    """
+
+    def __init__(self, agent, voice_processor=None, pipeline=True):
+        self.agent = agent
+        self.voice_processor = voice_processor
+        self.pipeline = pipeline
+        self.tasks = {}
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.current = None
+        self.stopped = threading.Event()
+        self._ids = itertools.count(1)
+        self.agent.add_agent_listener(self._on_agent_event)
+
+    def submit(self, text, max_iterations=15, show_desktop=False):
+        task = DaemonTask(str(next(self._ids)), text, max_iterations, show_desktop)
+        with self.lock:
+            self.tasks[task.id] = task
+        task.set_state('queued')
+        self.pending.put(task)
+        return task
+
+    def cancel(self, task):
+        task.cancelled.set()
+        with self.lock:
+            running = self.current is task
+        if running:
+            self.agent.stop_agent("отмена через API")
+        return running or task.state == 'queued'
+
+    def reply(self, task, text):
+        task.replies.put(text)
+
+    def _on_agent_event(self, event, data):
+        task = self.current
+        if task is not None:
+            task.add_event(event, **data)
+
+    def _user_input(self, task):
+        # Agent waits for the user without voice input: the answer comes from POST /tasks/<id>/input.
+        # Without one within DAEMON_LISTEN_TIMEOUT the task is done (None ends run_desktop_agent)
+        def read(prompt):
+            task.add_event('waiting_for_input', timeout=DAEMON_LISTEN_TIMEOUT)
+            deadline = time.time() + DAEMON_LISTEN_TIMEOUT
+            while time.time() < deadline:
+                if task.cancelled.is_set() or not self.agent.agent_running:
+                    raise CancelledError("task cancelled while waiting for input")
+                try:
+                    return task.replies.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return None
+        return read
+
+    def run_forever(self):
+        """Worker loop; runs until shutdown()"""
+        while not self.stopped.is_set():
+            try:
+                task = self.pending.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if task.cancelled.is_set():
+                task.set_state('cancelled')
+                continue
+
+            self.agent.reset_agent_state()
+            with self.lock:
+                self.current = task
+            task.set_state('running')
+            try:
+                self.agent.run_desktop_agent(
+                    task.text,
+                    max_iterations=task.max_iterations,
+                    use_voice=self.voice_processor is not None,
+                    voice_processor=self.voice_processor,
+                    pipeline=self.pipeline,
+                    show_desktop=task.show_desktop,
+                    user_input=self._user_input(task),
+                    listen_timeout=DAEMON_LISTEN_TIMEOUT,
+                )
+                task.set_state('cancelled' if task.cancelled.is_set() else 'done')
+            except CancelledError:
+                task.set_state('cancelled')
+            except Exception as e:
+                task.set_state('failed', error=f"{type(e).__name__}: {e}")
+            finally:
+                with self.lock:
+                    self.current = None
+
+    def shutdown(self):
+        self.stopped.set()
+        with self.lock:
+            current = self.current
+        if current is not None:
+            self.cancel(current)
+
+
+class _DaemonHandler(BaseHTTPRequestHandler):
+    daemon = None
+    token = None
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def _authorized(self):
+        """Checks token, Host and Origin; sends the error response and returns False on failure"""
+        port = self.server.server_address[1]
+        if self.headers.get('Origin') is not None:
+            self._send_json(403, {'error': 'cross-origin requests are not allowed'})
+            return False
+        if self.headers.get('Host') not in (f'127.0.0.1:{port}', f'localhost:{port}'):
+            self._send_json(403, {'error': 'unexpected Host header'})
+            return False
+        expected = f'Bearer {self.token}'
+        if not hmac.compare_digest(self.headers.get('Authorization', '').encode('utf-8'), expected.encode('utf-8')):
+            self._send_json(401, {'error': 'missing or wrong token'})
+            return False
+        return True
+
+    def _task(self, task_id):
+        with self.daemon.lock:
+            task = self.daemon.tasks.get(task_id)
+        if task is None:
+            self._send_json(404, {'error': f"no task {task_id}"})
+        return task
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        if parts == ['tasks']:
+            with self.daemon.lock:
+                tasks = list(self.daemon.tasks.values())
+            self._send_json(200, [task.summary() for task in tasks])
+        elif len(parts) == 2 and parts[0] == 'tasks':
+            task = self._task(parts[1])
+            if task is not None:
+                with task.changed:
+                    events = list(task.events)
+                self._send_json(200, dict(task.summary(), events=events))
+        elif len(parts) == 3 and parts[0] == 'tasks' and parts[2] == 'events':
+            task = self._task(parts[1])
+            if task is not None:
+                self._stream_events(task)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def _stream_events(self, task):
+        # HTTP/1.0 without Content-Length: the body ends when the connection closes
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.end_headers()
+        sent = 0
+        try:
+            while True:
+                with task.changed:
+                    if sent == len(task.events) and task.state not in FINAL_STATES:
+                        task.changed.wait(timeout=1.0)
+                    events = task.events[sent:]
+                    finished = task.state in FINAL_STATES
+                for event in events:
+                    self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8'))
+                sent += len(events)
+                self.wfile.flush()
+                if finished and sent == len(task.events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._send_json(415, {'error': 'Content-Type must be application/json'})
+            return
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        try:
+            body = self._read_json()
+        except (ValueError, UnicodeDecodeError) as e:
+            self._send_json(400, {'error': f"invalid JSON: {e}"})
+            return
+        if not isinstance(body, dict):
+            self._send_json(400, {'error': 'the body must be a JSON object'})
+            return
+
+        if parts == ['tasks']:
+            if not isinstance(body.get('task'), str) or not body['task'].strip():
+                self._send_json(400, {'error': "'task' is required"})
+                return
+            try:
+                max_iterations = int(body.get('max_iterations', 15))
+            except (TypeError, ValueError):
+                max_iterations = 0
+            if max_iterations < 1:
+                self._send_json(400, {'error': "'max_iterations' must be a positive integer"})
+                return
+            task = self.daemon.submit(body['task'], max_iterations, bool(body.get('show_desktop', False)))
+            self._send_json(201, task.summary())
+        elif len(parts) == 3 and parts[0] == 'tasks' and parts[2] == 'cancel':
+            task = self._task(parts[1])
+            if task is not None:
+                cancelled = self.daemon.cancel(task)
+                self._send_json(200, dict(task.summary(), cancelled=cancelled))
+        elif len(parts) == 3 and parts[0] == 'tasks' and parts[2] == 'input':
+            task = self._task(parts[1])
+            if task is not None:
+                self.daemon.reply(task, str(body.get('text', '')))
+                self._send_json(200, task.summary())
+        elif parts == ['shutdown']:
+            self._send_json(200, {'stopping': True})
+            self.daemon.shutdown()
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(agent, host=DAEMON_HOST, port=DAEMON_PORT, voice_processor=None, pipeline=True):
+    """Start the HTTP API and run tasks in the calling thread until shutdown"""
+    from services.openrouter_api import preload_prompts
+
+    preload_prompts()
+    daemon = AgentDaemon(agent, voice_processor, pipeline)
+    handler = type('DaemonHandler', (_DaemonHandler,), {'daemon': daemon, 'token': secret(TOKEN_FILE)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='daemon-http').start()
+    print(f"Agent daemon listening on http://{host}:{port}")
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        daemon.shutdown()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return daemon
+
+
+# Command line client
+
+def _request(method, path, body=None, host=DAEMON_HOST, port=DAEMON_PORT):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                     headers={'Content-Type': 'application/json',
+                                              'Authorization': f'Bearer {secret(TOKEN_FILE)}'})
+    return urllib.request.urlopen(request)
+
+
+def follow(task_id, host=DAEMON_HOST, port=DAEMON_PORT, out=sys.stdout):
+    """Print a task's events until it ends; returns the final state"""
+    state = None
+    with _request('GET', f"/tasks/{task_id}/events", host=host, port=port) as response:
+        for line in response:
+            event = json.loads(line)
+            if event['event'] == 'state':
+                state = event['state']
+            elif event['event'] == 'response':
+                event = dict(event, text=event['text'][:200])
+            out.write(json.dumps(event, ensure_ascii=False) + "\n")
+            out.flush()
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Client for the agent daemon (python main.py --daemon)")
+    parser.add_argument('--port', type=int, default=DAEMON_PORT)
+    commands = parser.add_subparsers(dest='command', required=True)
+    submit = commands.add_parser('submit', help="Queue a task")
+    submit.add_argument('task')
+    submit.add_argument('--max-iterations', type=int, default=15)
+    submit.add_argument('--show-desktop', action='store_true', help="Minimize all windows (win+d) first")
+    submit.add_argument('--follow', action='store_true', help="Stream the task's events until it ends")
+    cancel = commands.add_parser('cancel', help="Cancel a queued or running task")
+    cancel.add_argument('id')
+    watch = commands.add_parser('follow', help="Stream a task's events")
+    watch.add_argument('id')
+    reply = commands.add_parser('input', help="Answer a task waiting for the user")
+    reply.add_argument('id')
+    reply.add_argument('text')
+    commands.add_parser('list', help="Show all tasks")
+    commands.add_parser('shutdown', help="Stop the daemon")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'submit':
+            with _request('POST', '/tasks', {'task': args.task, 'max_iterations': args.max_iterations,
+                                             'show_desktop': args.show_desktop}, port=args.port) as response:
+                task = json.load(response)
+            print(f"Task {task['id']} queued")
+            if args.follow:
+                return 0 if follow(task['id'], port=args.port) == 'done' else 1
+        elif args.command == 'follow':
+            return 0 if follow(args.id, port=args.port) == 'done' else 1
+        elif args.command == 'cancel':
+            with _request('POST', f"/tasks/{args.id}/cancel", {}, port=args.port) as response:
+                print(json.load(response)['state'])
+        elif args.command == 'input':
+            with _request('POST', f"/tasks/{args.id}/input", {'text': args.text}, port=args.port) as response:
+                response.read()
+        elif args.command == 'list':
+            with _request('GET', '/tasks', port=args.port) as response:
+                for task in json.load(response):
+                    latency = '-' if task['start_latency_ms'] is None else f"{task['start_latency_ms']:.0f} ms"
+                    print(f"{task['id']:>4} {task['state']:<10} {latency:>9}  {task['task']}")
+        elif args.command == 'shutdown':
+            with _request('POST', '/shutdown', {}, port=args.port) as response:
+                response.read()
+    except urllib.error.HTTPError as e:
+        print(f"Daemon error {e.code}: {e.read().decode('utf-8', 'replace')}")
+        return 1
+    except urllib.error.URLError as e:
+        print(f"Daemon not reachable on port {args.port}: {e.reason}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,396 @@
+import difflib
+import os
+import re
+import sys
+import threading
+import time
+
+from services import tracing
+from services import metrics
+from services import display_state
+from config import ATSPI_MAX_NODES, ATSPI_MATCH_THRESHOLD, ATSPI_SNAPSHOT_TTL, ATSPI_SUMMARY_LIMIT
+
+# Element lookup through the Linux accessibility tree (AT-SPI).
+#
+# GTK and Qt apps and browsers publish every widget with its role, name and
+# screen extents over the accessibility bus. The snapshot holds the showing
+# widgets of the focused application; element descriptions are matched
+# against role plus name, so a described button is found without a
+# screenshot or an LLM call. AT-SPI events (children added or removed,
+# names, showing state) mark the subtrees that changed, and the next lookup
+# walks only those again; a different active window, a moved window or an
+# event from outside the snapshot forces a full walk. Events are queued by
+# the D-Bus connection and dispatched on the calling thread before each
+# lookup, so no main loop thread is needed. Without event delivery the
+# snapshot expires after ATSPI_SNAPSHOT_TTL seconds.
+#
+# Needs pyatspi (python3-pyatspi) and an accessibility bus in the session;
+# apps must have accessibility enabled (GTK does by default, Qt needs
+# QT_ACCESSIBILITY=1). Elsewhere every lookup returns None.
+
+# Roles worth clicking or typing into, by AT-SPI role name
+INTERACTIVE_ROLES = {
+    'push button', 'toggle button', 'check box', 'radio button', 'menu item', 'check menu item',
+    'radio menu item', 'menu', 'page tab', 'entry', 'text', 'password text', 'spin button', 'combo box',
+    'slider', 'list item', 'table cell', 'tree item', 'link', 'icon', 'toggle switch',
+}
+
+# Words in an element description and the roles they refer to
+ROLE_WORDS = {
+    'button': {'push button', 'toggle button'},
+    'toggle': {'toggle button', 'toggle switch'},
+    'switch': {'toggle switch', 'toggle button'},
+    'checkbox': {'check box', 'check menu item'},
+    'check box': {'check box', 'check menu item'},
+    'radio': {'radio button', 'radio menu item'},
+    'menu': {'menu', 'menu item', 'check menu item', 'radio menu item'},
+    'tab': {'page tab'},
+    'link': {'link'},
+    'field': {'entry', 'text', 'password text', 'spin button'},
+    'input': {'entry', 'text', 'password text', 'spin button'},
+    'entry': {'entry', 'text', 'password text'},
+    'text box': {'entry', 'text', 'password text'},
+    'textbox': {'entry', 'text', 'password text'},
+    'search': {'entry', 'text'},
+    'combo': {'combo box'},
+    'dropdown': {'combo box'},
+    'drop-down': {'combo box'},
+    'slider': {'slider'},
+    'item': {'list item', 'table cell', 'tree item', 'menu item'},
+    'icon': {'icon', 'push button'},
+}
+
+# Event types that invalidate part of the snapshot
+SUBTREE_EVENTS = ['object:children-changed', 'object:property-change:accessible-name',
+                  'object:state-changed:showing', 'object:state-changed:visible']
+WINDOW_EVENTS = ['window:activate', 'window:deactivate', 'window:create', 'window:destroy']
+
+_lock = threading.Lock()
+_pyatspi = None
+_unavailable = None
+_listening = False
+_dirty = []
+_full_refresh = False
+_snapshot = None
+
+
+def _load():
+    """pyatspi, or None off Linux or without an accessibility bus"""
+    global _pyatspi, _unavailable, _listening
+    if _pyatspi is not None or _unavailable is not None:
+        return _pyatspi
+    if not sys.platform.startswith('linux') or not os.environ.get('DISPLAY'):
+        _unavailable = 'not an X11 session'
+        return None
+    try:
+        import pyatspi
+        pyatspi.Registry.getDesktop(0).childCount
+    except Exception as e:
+        _unavailable = e
+        print(f"AT-SPI unavailable, elements are located from screenshots only: {e}")
+        return None
+    try:
+        pyatspi.Registry.registerEventListener(_on_subtree_event, *SUBTREE_EVENTS)
+        pyatspi.Registry.registerEventListener(_on_window_event, *WINDOW_EVENTS)
+        _listening = True
+    except Exception as e:
+        print(f"AT-SPI events unavailable, the element snapshot expires every {ATSPI_SNAPSHOT_TTL}s: {e}")
+    _pyatspi = pyatspi
+    return _pyatspi
+
+
+def _on_subtree_event(event):
+    _dirty.append(event.source)
+
+
+def _on_window_event(event):
+    global _full_refresh
+    _full_refresh = True
+
+
+def _pump_events():
+    """Dispatch AT-SPI events queued since the last lookup on this thread"""
+    if not _listening:
+        return
+    from gi.repository import GLib
+    context = GLib.MainContext.default()
+    while context.pending():
+        context.iteration(False)
+
+
+def _extents(accessible):
+    """(x, y, w, h) on the screen, or None"""
+    try:
+        box = accessible.queryComponent().getExtents(_pyatspi.DESKTOP_COORDS)
+    except Exception:
+        return None
+    if box.width <= 0 or box.height <= 0:
+        return None
+    return box.x, box.y, box.width, box.height
+
+
+def _showing(accessible):
+    try:
+        state = accessible.getState()
+        return state.contains(_pyatspi.STATE_SHOWING) and state.contains(_pyatspi.STATE_VISIBLE)
+    except Exception:
+        return False
+
+
+def _active_window():
+    """
+    (application, window) owning the focus. Without a window manager no
+    window is active; then the showing window under the center of the
+    focused X window, or under the cursor, is taken.
+    """
+    desktop = _pyatspi.Registry.getDesktop(0)
+    fallback = None
+    focused = display_state.get_focused_window_rect()
+    if focused:
+        point = (focused[0] + focused[2] // 2, focused[1] + focused[3] // 2)
+    else:
+        point = display_state.get_cursor_position()
+    for application in desktop:
+        if application is None:
+            continue
+        for window in application:
+            if window is None:
+                continue
+            try:
+                if window.getState().contains(_pyatspi.STATE_ACTIVE):
+                    return application, window
+            except Exception:
+                continue
+            if fallback is None and point and _showing(window):
+                extents = _extents(window)
+                if extents and extents[0] <= point[0] < extents[0] + extents[2] \
+                        and extents[1] <= point[1] < extents[1] + extents[3]:
+                    fallback = (application, window)
+    return fallback or (None, None)
+
+
+def _walk(accessible, budget):
+    """Snapshot node for `accessible` and its showing descendants; budget = [nodes left]"""
+    try:
+        node = {'accessible': accessible, 'role': accessible.getRoleName(), 'name': (accessible.name or '').strip(),
+                'extents': None, 'children': []}
+        count = accessible.childCount
+    except Exception:
+        return None
+    budget[0] -= 1
+    if node['role'] in INTERACTIVE_ROLES and node['name']:
+        node['extents'] = _extents(accessible)
+    for i in range(count):
+        if budget[0] <= 0:
+            break
+        try:
+            child = accessible.getChildAtIndex(i)
+        except Exception:
+            continue
+        if child is None or not _showing(child):
+            continue
+        child_node = _walk(child, budget)
+        if child_node is not None:
+            node['children'].append(child_node)
+    return node
+
+
+def _find_node(node, accessible):
+    if node['accessible'] == accessible:
+        return node
+    for child in node['children']:
+        found = _find_node(child, accessible)
+        if found is not None:
+            return found
+    return None
+
+
+def _full_walk(application, window):
+    """Snapshot of the showing windows of `application`"""
+    budget = [ATSPI_MAX_NODES]
+    roots = []
+    for top in application:
+        if top is not None and (top == window or _showing(top)):
+            node = _walk(top, budget)
+            if node is not None:
+                roots.append(node)
+    return {'application': application, 'window': window, 'window_extents': _extents(window),
+            'roots': roots, 'time': time.time()}
+
+
+def _refresh():
+    """Bring the snapshot up to date; returns it, or None without a focused application"""
+    global _snapshot, _full_refresh
+    _pump_events()
+    application, window = _active_window()
+    if window is None:
+        _snapshot = None
+        _dirty.clear()
+        return None
+
+    snapshot = _snapshot
+    stale = (snapshot is None or _full_refresh or snapshot['window'] != window
+             or snapshot['window_extents'] != _extents(window)
+             or (not _listening and time.time() - snapshot['time'] > ATSPI_SNAPSHOT_TTL))
+    with tracing.span('atspi_refresh', full=stale) as sp:
+        if not stale:
+            sources = list(_dirty)
+            for source in sources:
+                node = None
+                for root in snapshot['roots']:
+                    node = _find_node(root, source)
+                    if node is not None:
+                        break
+                if node is not None:
+                    fresh = _walk(source, [ATSPI_MAX_NODES])
+                    if fresh is not None:
+                        node.update(fresh)
+                    continue
+                try:
+                    outside = source.getApplication() != application
+                except Exception:
+                    outside = True
+                if not outside:
+                    stale = True
+                    break
+            sp.set(subtrees=len(sources))
+        if stale:
+            snapshot = _full_walk(application, window)
+        _dirty.clear()
+        _full_refresh = False
+        _snapshot = snapshot
+    return snapshot
+
+
+def _elements(snapshot):
+    """[(role, name, extents, accessible)] of the interactive named elements, in reading order"""
+    found = []
+    stack = list(snapshot['roots'])
+    while stack:
+        node = stack.pop()
+        if node['extents'] is not None:
+            found.append((node['role'], node['name'], node['extents'], node['accessible']))
+        stack.extend(node['children'])
+    found.sort(key=lambda element: (element[2][1], element[2][0]))
+    return found
+
+
+def _normalize(text):
+    return ' '.join(re.sub(r'[^\w]+', ' ', text.casefold()).split())
+
+
+def _described_roles(description):
+    text = f" {_normalize(description.replace('-', ''))} "
+    roles = set()
+    for word, role_names in ROLE_WORDS.items():
+        if f" {_normalize(word.replace('-', ''))} " in text:
+            roles |= role_names
+    return roles
+
+
+def _spans(words, name_words):
+    """(start, end) word positions of `name_words` in `words`"""
+    n = len(name_words)
+    return [(i, i + n) for i in range(len(words) - n + 1) if words[i:i + n] == name_words]
+
+
+def _named_in(description, names):
+    """
+    The one name of `names` that appears word for word in `description`,
+    or None if none or several do. A name found only inside a longer one
+    ("Save" in "Save as") does not count.
+    """
+    words = _normalize(description).split()
+    found = {}
+    for name in names:
+        spans = _spans(words, name.split())
+        if spans:
+            found[name] = spans
+    distinct = [name for name, spans in found.items()
+                if not all(any(s <= start and end <= e and (s, e) != (start, end)
+                               for other, others in found.items() if other != name for s, e in others)
+                           for start, end in spans)]
+    return distinct[0] if len(distinct) == 1 else None
+
+
+def match(description, elements):
+    """
+    The one element of [(role, name, extents, accessible)] that
+    `description` refers to, or None if none or several fit. A quoted label
+    is compared with element names; without one, the description must name
+    exactly one element word for word. Role words in the description
+    ("button", "field", ...) restrict the candidates to those roles.
+    """
+    from services.ocr_index import quoted_labels
+
+    labels = [_normalize(label) for label in quoted_labels(description)]
+    named = [(_normalize(element[1]), element) for element in elements]
+    named = [(name, element) for name, element in named if name]
+    candidates = []
+    if labels:
+        for name, element in named:
+            score = max(difflib.SequenceMatcher(None, label, name).ratio() for label in labels)
+            if score >= ATSPI_MATCH_THRESHOLD:
+                candidates.append((score, element))
+    else:
+        name = _named_in(description, {name for name, _ in named if len(name) > 1})
+        candidates = [(1.0, element) for other, element in named if other == name]
+
+    roles = _described_roles(description)
+    if roles:
+        candidates = [c for c in candidates if c[1][0] in roles]
+    if not candidates:
+        return None
+    candidates.sort(key=lambda candidate: -candidate[0])
+    best = candidates[0]
+    if len(candidates) > 1 and candidates[1][0] == best[0] and candidates[1][1][2] != best[1][2]:
+        return None
+    return best[1]
+
+
+def locate(description):
+    """
+    Screen coordinates of the center of the element `description` refers
+    to in the focused application, or None.
+    """
+    with _lock:
+        if _load() is None:
+            return None
+        try:
+            snapshot = _refresh()
+            if snapshot is None:
+                return None
+            element = match(description, _elements(snapshot))
+            if element is None:
+                metrics.ATSPI_MISSES.inc()
+                return None
+            # Extents are read again: the widget may have scrolled since the snapshot
+            extents = _extents(element[3]) or element[2]
+        except Exception as e:
+            print(f"AT-SPI lookup failed: {e}")
+            return None
+    metrics.ATSPI_HITS.inc()
+    x, y, w, h = extents
+    return x + w // 2, y + h // 2
+
+
+def summary(limit=ATSPI_SUMMARY_LIMIT):
+    """
+    Text listing the interactive elements of the focused application with
+    their centers, for the planner; None when AT-SPI is unavailable or
+    nothing is found.
+    """
+    with _lock:
+        if _load() is None:
+            return None
+        try:
+            snapshot = _refresh()
+            elements = _elements(snapshot) if snapshot is not None else []
+        except Exception as e:
+            print(f"AT-SPI snapshot failed: {e}")
+            return None
+    if not elements:
+        return None
+    lines = [f"- {role} '{name}' at {x + w // 2}, {y + h // 2}" for role, name, (x, y, w, h), _ in elements[:limit]]
+    more = f"\n(and {len(elements) - limit} more)" if len(elements) > limit else ''
+    return "Interactive elements of the focused window (accessibility tree):\n" + '\n'.join(lines) + more
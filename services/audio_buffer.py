@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity float32 ring buffer written from the realtime audio callback.
+
+    Every sample is stored twice (at i and i + capacity), so any window of up
+    to `capacity` samples is a single contiguous slice and can be handed out
+    as a numpy view without copying. Positions are absolute sample counts
+    since the buffer was created; there is exactly one writer (the audio
+    thread), readers only take views and check is_valid() after copying.
+    """
+
+    def __init__(self, capacity, max_block=None):
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=np.float32)
+        # Scratch space for downmixing / energy so the callback does not allocate
+        self._scratch = np.zeros(int(max_block or self.capacity), dtype=np.float32)
+        self.write_pos = 0
+
+    def write(self, block):
+        """Append a 1-D block of samples (any float dtype, may be a strided view)"""
+        n = block.shape[0]
+        if n > self.capacity:
+            self.write_pos += n - self.capacity
+            block = block[n - self.capacity:]
+            n = self.capacity
+
+        capacity = self.capacity
+        start = self.write_pos % capacity
+        first = min(n, capacity - start)
+        self._data[start:start + first] = block[:first]
+        self._data[start + capacity:start + capacity + first] = block[:first]
+        if first < n:
+            rest = n - first
+            self._data[:rest] = block[first:]
+            self._data[capacity:capacity + rest] = block[first:]
+        self.write_pos += n
+
+    def write_frames(self, indata):
+        """
+        Append a (frames, channels) block from sounddevice, downmixing to mono.
+
+        Returns the absolute position of the first written sample.
+        """
+        start = self.write_pos
+        frames, channels = indata.shape
+        if channels == 1:
+            self.write(indata[:, 0])
+        elif frames <= self._scratch.shape[0]:
+            mono = self._scratch[:frames]
+            np.mean(indata, axis=1, out=mono)
+            self.write(mono)
+        else:
+            self.write(indata.mean(axis=1))
+        return start
+
+    def mean_abs(self, start, end):
+        """Mean absolute amplitude of samples [start, end) computed in scratch space"""
+        window = self.view(start, end)
+        n = window.shape[0]
+        if n == 0:
+            return 0.0
+        if n > self._scratch.shape[0]:
+            return float(np.abs(window).mean())
+        scratch = self._scratch[:n]
+        np.abs(window, out=scratch)
+        return float(scratch.mean())
+
+    def is_valid(self, start):
+        """True while the samples from `start` onwards have not been overwritten"""
+        return self.write_pos - start <= self.capacity
+
+    def view(self, start, end=None):
+        """Zero-copy view of samples [start, end) (end defaults to the write position)"""
+        if end is None:
+            end = self.write_pos
+        start = max(start, self.write_pos - self.capacity)
+        if end <= start:
+            return self._data[:0]
+        offset = start % self.capacity
+        return self._data[offset:offset + (end - start)]
@@ -0,0 +1,29 @@
+import wave
+
+import numpy as np
+
+
+def load_wav(path, sample_rate=16000):
+    """Read a PCM WAV file as mono float32 in [-1, 1], resampled to sample_rate"""
+    with wave.open(path, 'rb') as f:
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        rate = f.getframerate()
+        raw = f.readframes(f.getnframes())
+
+    if width == 1:
+        audio = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        audio = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 4:
+        audio = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width {width} in {path}")
+
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate:
+        duration = audio.shape[0] / rate
+        target = np.linspace(0, duration, int(duration * sample_rate), endpoint=False)
+        audio = np.interp(target, np.arange(audio.shape[0]) / rate, audio).astype(np.float32)
+    return audio
@@ -0,0 +1,364 @@
+"""
+Batch runner: a JSONL task file run by N agents in parallel, each on its
+own Xvfb display.
+
+    python -m services.batch_runner tasks.jsonl --workers 8
+    python -m services.batch_runner tasks.jsonl --llm-concurrency 4 --llm-rpm 120 --trace
+
+One task per line:
+
+    {"id": "notepad", "task": "Open the editor and type hello", "max_iterations": 10,
+     "setup": "python -m benchmarks.e2e.apps form --state /tmp/s.json",
+     "check": "python check_notepad.py", "timeout": 300}
+
+Only "task" is required. "setup" is started on the worker's display before
+the agent and stopped after it; "check" runs on the same display after the
+agent and decides success by its exit code (without it a task succeeds when
+the agent finishes without an error).
+
+Every worker slot owns one Xvfb server and runs its tasks one after another,
+each in a fresh agent process with DISPLAY pointing at that server, so
+pyautogui, the Xlib queries and the clipboard are all bound to it. Agents
+run in a per-slot directory (screenshots/ and a link to prompts/) so their
+screenshot files do not collide. All agents share one LLM budget: at most
+--llm-concurrency requests in flight and --llm-rpm request starts per minute.
+
+Results go to <output-dir>/results.jsonl as tasks finish, together with the
+final screenshot of every task.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from config import BATCH_LLM_CONCURRENCY, BATCH_LLM_RPM, BATCH_OUTPUT_DIR
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LLMBudget:
+    """
+    Request budget shared by the agent processes of a batch.
+
+    A context manager around one completion call: at most `max_concurrent`
+    requests are in flight, and request starts are spaced at least 60 / rpm
+    seconds apart across all processes. A slot is a shared table entry
+    holding the PID of the process using it, so slots of an agent killed in
+    the middle of a call are not lost: the harness frees them with
+    release_process(), and waiting processes also reclaim slots of PIDs that
+    no longer exist.
+    """
+
+    def __init__(self, context, max_concurrent=BATCH_LLM_CONCURRENCY, requests_per_minute=BATCH_LLM_RPM):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._holders = context.Array('i', max_concurrent)
+        self._changed = context.Condition(self._holders.get_lock())
+        self._next_start = context.Value('d', 0.0)
+
+    def __enter__(self):
+        pid = os.getpid()
+        with self._changed:
+            while True:
+                slot = next((i for i, holder in enumerate(self._holders) if holder == 0 or not _alive(holder)), None)
+                if slot is not None:
+                    self._holders[slot] = pid
+                    break
+                # Timed wait: a holder can die without anyone notifying
+                self._changed.wait(1.0)
+        if self.interval:
+            with self._next_start.get_lock():
+                now = time.time()
+                start = max(now, self._next_start.value)
+                self._next_start.value = start + self.interval
+            if start > now:
+                time.sleep(start - now)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pid = os.getpid()
+        with self._changed:
+            # Slots of one process are interchangeable; free any one of them
+            for i, holder in enumerate(self._holders):
+                if holder == pid:
+                    self._holders[i] = 0
+                    break
+            self._changed.notify_all()
+        return False
+
+    def release_process(self, pid):
+        """Free every slot held by `pid` (called after an agent process was terminated)"""
+        with self._changed:
+            for i, holder in enumerate(self._holders):
+                if holder == pid:
+                    self._holders[i] = 0
+            self._changed.notify_all()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def load_tasks(path):
+    """Tasks from a JSONL file; blank lines and lines starting with # are skipped"""
+    tasks = []
+    with open(path, encoding='utf8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            task = json.loads(line)
+            if not task.get('task'):
+                raise ValueError(f"{path}:{number}: task has no 'task' text")
+            task.setdefault('id', f"task{number}")
+            tasks.append(task)
+    ids = [task['id'] for task in tasks]
+    duplicates = sorted({i for i in ids if ids.count(i) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate task ids: {', '.join(map(str, duplicates))}")
+    return tasks
+
+
+def _command(value):
+    return shlex.split(value) if isinstance(value, str) else list(value)
+
+
+def _prepare_work_dir(path):
+    os.makedirs(os.path.join(path, 'screenshots'), exist_ok=True)
+    prompts = os.path.join(path, 'prompts')
+    if not os.path.exists(prompts):
+        os.symlink(os.path.join(ROOT_DIR, 'prompts'), prompts)
+
+
+def _agent_process(task, display, work_dir, budget, result_path, trace_dir):
+    """Runs in the child process: one task on `display`, results to `result_path`"""
+    # Before anything imports pyautogui or opens an X connection
+    os.environ['DISPLAY'] = display
+    os.chdir(work_dir)
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+
+    from services import metrics
+
+    result = {'id': task['id'], 'display': display}
+    start = time.perf_counter()
+    try:
+        import main as agent
+        from services import tracing
+        from services.openrouter_api import set_request_limiter
+
+        set_request_limiter(budget)
+        if trace_dir:
+            tracing.enable(trace_dir)
+        result['import_ms'] = round((time.perf_counter() - start) * 1000.0, 2)
+
+        # Nobody answers in a batch: "listen" (the model's "done") ends the run instead of reading stdin
+        agent.run_desktop_agent(task['task'], max_iterations=task.get('max_iterations', 15), use_voice=False,
+                                user_input=lambda prompt: None)
+        result['error'] = None
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['agent_ms'] = round((time.perf_counter() - start) * 1000.0, 2)
+
+    result['iterations'] = metrics.ITERATIONS.value()
+    result['llm_errors'] = metrics.LLM_ERRORS.value()
+    result['timing'] = {
+        name: histogram.snapshot() for name, histogram in (
+            ('llm', metrics.LLM_SECONDS), ('locate', metrics.LOCATE_SECONDS),
+            ('capture', metrics.CAPTURE_SECONDS), ('encode', metrics.ENCODE_SECONDS))
+    }
+    result['request_bytes'] = metrics.LLM_REQUEST_BYTES.snapshot()
+
+    with open(result_path, 'w', encoding='utf8') as f:
+        json.dump(result, f, indent=2)
+
+
+def run_task(task, display, work_dir, budget, output_dir, trace_dir, default_timeout):
+    """Harness side: setup, agent process, check; returns the task's result record"""
+    context = multiprocessing.get_context('spawn')
+    env = display.env()
+    result_path = os.path.join(work_dir, 'result.json')
+    if os.path.exists(result_path):
+        os.remove(result_path)
+    timeout = task.get('timeout', default_timeout)
+
+    setup = None
+    if task.get('setup'):
+        setup = subprocess.Popen(_command(task['setup']), cwd=ROOT_DIR, env=env)
+        time.sleep(task.get('setup_wait', 1.0))
+
+    wall_start = time.perf_counter()
+    try:
+        process = context.Process(
+            target=_agent_process,
+            args=(task, display.display, work_dir, budget, result_path,
+                  os.path.join(trace_dir, str(task['id'])) if trace_dir else None),
+            name=f"agent-{task['id']}",
+        )
+        process.start()
+        process.join(timeout)
+        timed_out = process.is_alive()
+        if timed_out:
+            process.terminate()
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        # A killed agent may have been inside an LLM call
+        budget.release_process(process.pid)
+        if timed_out:
+            result = {'id': task['id'], 'display': display.display, 'error': f"timeout after {timeout:.0f}s"}
+        elif os.path.exists(result_path):
+            with open(result_path, encoding='utf8') as f:
+                result = json.load(f)
+        else:
+            result = {'id': task['id'], 'display': display.display,
+                      'error': f"agent process exited with {process.exitcode}"}
+        result['wall_ms'] = round((time.perf_counter() - wall_start) * 1000.0, 2)
+
+        success = result['error'] is None
+        if success and task.get('check'):
+            try:
+                check = subprocess.run(_command(task['check']), cwd=ROOT_DIR, env=env, timeout=60)
+                success = check.returncode == 0
+                result['check_returncode'] = check.returncode
+            except subprocess.TimeoutExpired:
+                success = False
+                result['check_returncode'] = None
+        result['success'] = success
+    finally:
+        if setup is not None:
+            setup.terminate()
+            try:
+                setup.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                setup.kill()
+
+    screenshot = os.path.join(work_dir, 'screenshots', 'fullscreen.jpg')
+    if os.path.exists(screenshot):
+        result['screenshot'] = os.path.join(output_dir, f"{task['id']}.jpg")
+        shutil.copyfile(screenshot, result['screenshot'])
+        os.remove(screenshot)
+    return result
+
+
+def run_batch(tasks, workers, output_dir, budget, screen=(1280, 720), trace_dir=None, timeout=600.0):
+    """Runs `tasks` on `workers` displays in parallel; returns the results in task order"""
+    from services.virtual_display import VirtualDisplay
+
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = os.path.join(output_dir, 'results.jsonl')
+    pending = queue.Queue()
+    for task in tasks:
+        pending.put(task)
+    results = {}
+    results_lock = threading.Lock()
+
+    def slot(index, work_root):
+        work_dir = os.path.join(work_root, f'slot{index}')
+        _prepare_work_dir(work_dir)
+        display = VirtualDisplay(*screen)
+        try:
+            display.start()
+        except RuntimeError as e:
+            print(f"[slot {index}] {e}")
+            return
+        with display:
+            print(f"[slot {index}] Xvfb on {display.display}")
+            while True:
+                try:
+                    task = pending.get_nowait()
+                except queue.Empty:
+                    return
+                print(f"[slot {index}] {task['id']}: {task['task']}")
+                try:
+                    result = run_task(task, display, work_dir, budget, output_dir, trace_dir, timeout)
+                except Exception as e:
+                    result = {'id': task['id'], 'display': display.display, 'success': False,
+                              'error': f"{type(e).__name__}: {e}"}
+                print(f"[slot {index}] {task['id']}: {'ok' if result['success'] else 'FAILED'} "
+                      f"in {result.get('wall_ms', 0) / 1000:.1f}s" +
+                      (f" ({result['error']})" if result.get('error') else ""))
+                with results_lock:
+                    results[task['id']] = result
+                    with open(results_path, 'a', encoding='utf8') as f:
+                        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    with tempfile.TemporaryDirectory(prefix='agent-batch-') as work_root:
+        threads = [threading.Thread(target=slot, args=(i, work_root), name=f'batch-slot{i}')
+                   for i in range(min(workers, len(tasks)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return [results.get(task['id'], {'id': task['id'], 'success': False, 'error': 'not run (no display)'})
+            for task in tasks]
+
+
+def print_summary(results, wall_s):
+    print(f"\n{'task':<24} {'ok':<4} {'wall s':>8} {'iters':>6} {'llm p50':>8} {'llm p95':>8} {'llm s':>7}")
+    for r in results:
+        llm = r.get('timing', {}).get('llm', {})
+        fmt = lambda v: '-' if v is None else f"{v:.2f}"
+        print(f"{str(r['id']):<24} {'yes' if r['success'] else 'no':<4} {r.get('wall_ms', 0) / 1000:>8.1f} "
+              f"{r.get('iterations', '-'):>6} {fmt(llm.get('p50')):>8} {fmt(llm.get('p95')):>8} "
+              f"{fmt(llm.get('sum')):>7}")
+    passed = sum(1 for r in results if r['success'])
+    task_s = sum(r.get('wall_ms', 0) for r in results) / 1000.0
+    print(f"\n{passed}/{len(results)} tasks passed in {wall_s:.1f}s "
+          f"({task_s:.1f}s of agent time, {task_s / wall_s if wall_s else 0:.1f}x parallel)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL task file with parallel agents on Xvfb displays")
+    parser.add_argument('tasks', help="JSONL file, one {\"task\": ...} object per line")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Parallel agents, each with its own Xvfb display (default: CPU count)")
+    parser.add_argument('--llm-concurrency', type=int, default=BATCH_LLM_CONCURRENCY,
+                        help="LLM requests in flight across all agents")
+    parser.add_argument('--llm-rpm', type=float, default=BATCH_LLM_RPM,
+                        help="LLM requests per minute across all agents (0 = unlimited)")
+    parser.add_argument('--screen', default='1280x720', help="Virtual screen size")
+    parser.add_argument('--timeout', type=float, default=600.0, help="Default per-task timeout in seconds")
+    parser.add_argument('--output-dir', default=None,
+                        help=f"Results directory (default: {BATCH_OUTPUT_DIR}/<timestamp>)")
+    parser.add_argument('--trace', action='store_true', help="Write a trace of every task to <output-dir>/traces")
+    args = parser.parse_args(argv)
+
+    try:
+        tasks = load_tasks(args.tasks)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not tasks:
+        print(f"No tasks in {args.tasks}")
+        return 1
+
+    output_dir = args.output_dir or os.path.join(BATCH_OUTPUT_DIR, time.strftime('%Y%m%d-%H%M%S'))
+    width, height = (int(v) for v in args.screen.lower().split('x'))
+    budget = LLMBudget(multiprocessing.get_context('spawn'), args.llm_concurrency, args.llm_rpm)
+    trace_dir = os.path.abspath(os.path.join(output_dir, 'traces')) if args.trace else None
+
+    print(f"{len(tasks)} tasks, {min(args.workers, len(tasks))} workers, results in {output_dir}")
+    start = time.perf_counter()
+    results = run_batch(tasks, args.workers, os.path.abspath(output_dir), budget, (width, height),
+                        trace_dir, args.timeout)
+    print_summary(results, time.perf_counter() - start)
+    return 0 if all(r['success'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import concurrent.futures
+import threading
+
+
+class CancelledError(BaseException):
+    """
+    Raised inside a step that was cancelled.
+
+    Derives from BaseException (like asyncio.CancelledError) so the broad
+    `except Exception` handlers around commands and API calls let it through
+    instead of reporting it as an ordinary failure.
+    """
+
+
+class CancellationToken:
+    """
+    Cancellation flag for one agent step.
+
+    The agent creates a token per iteration and passes it down to the LLM
+    call, locate calls, the command executor and every wait; ESC, the "стоп"
+    keyword or new voice feedback call cancel() from another thread, and the
+    step stops at the next wait or check point.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason=None):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Block up to `timeout` seconds; returns True if the token was cancelled"""
+        return self._event.wait(timeout)
+
+    def sleep(self, seconds):
+        """time.sleep() that raises CancelledError as soon as the token is cancelled"""
+        if self._event.wait(seconds):
+            raise CancelledError(self.reason)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise CancelledError(self.reason)
+
+
+def result(future, token=None, poll_interval=0.05):
+    """
+    Wait for a concurrent.futures.Future, checking the token every poll_interval.
+
+    On cancellation the future is abandoned (a running call cannot be
+    interrupted, its result is dropped) and CancelledError is raised.
+    """
+    while True:
+        if token is not None:
+            token.raise_if_cancelled()
+        try:
+            return future.result(timeout=poll_interval if token is not None else None)
+        except concurrent.futures.TimeoutError:
+            continue
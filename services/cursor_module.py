@@ -1,18 +1,18 @@
-import pyautogui
-from screeninfo import get_monitors
+from services import display_state
+from services.input_backends import get_backend
+
+# Input goes through the configured backend (services/input_backends.py);
+# backends import pyautogui or Xlib when they are created, which keeps this
+# module importable on headless machines.
 
 # Get current cursor position
 def get_cursor_position():
-    return pyautogui.position()
+    return get_backend().position()
 
 
-# Get screen dimensions
+# Get screen dimensions (cached, see services/display_state.py)
 def get_screen_dimensions():
-    monitors = get_monitors()
-    if monitors:
-        return monitors[0].width, monitors[0].height
-    else:
-        return pyautogui.size()
+    return display_state.get_screen_dimensions()
 
 
 # Move cursor to absolute coordinates
@@ -21,59 +21,58 @@ def move_cursor_absolute(x, y):
     # Ensure coordinates are within screen bounds
     x = max(0, min(x, screen_width - 1))
     y = max(0, min(y, screen_height - 1))
-    pyautogui.FAILSAFE = False
-    pyautogui.moveTo(x, y, duration=0.1)  # Small duration to prevent jumps
+    get_backend().move_to(x, y)
 
 
 # Move cursor by relative offset
 def move_cursor_relative(dx, dy):
-    current_x, current_y = pyautogui.position()
+    backend = get_backend()
+    current_x, current_y = backend.position()
     screen_width, screen_height = get_screen_dimensions()
     
     # Calculate new position with bounds checking
     new_x = max(0, min(current_x + dx, screen_width - 1))
     new_y = max(0, min(current_y + dy, screen_height - 1))
     
-    pyautogui.FAILSAFE = False
-    pyautogui.moveTo(new_x, new_y, duration=0.1)
+    backend.move_to(new_x, new_y)
 
 
 # Mouse button click
 def click_mouse_button(button="left"):
-    pyautogui.click(button=button)
+    get_backend().click(button)
     return True
 
 
 # Double click
 def double_click(button="left"):
-    pyautogui.doubleClick(button=button)
+    get_backend().click(button, clicks=2)
     return True
 
 
-# Drag from current position to target position
-def drag_to(x, y, button="left", duration=0.5):
+# Drag from current position to target position (duration None: the timing profile's default)
+def drag_to(x, y, button="left", duration=None):
     screen_width, screen_height = get_screen_dimensions()
     # Ensure coordinates are within screen bounds
     x = max(0, min(x, screen_width - 1))
     y = max(0, min(y, screen_height - 1))
     
-    pyautogui.dragTo(x, y, button=button, duration=duration)
+    get_backend().drag_to(x, y, button=button, duration=duration)
     return True
 
 
 # Press and hold mouse button
 def mouse_down(button="left"):
-    pyautogui.mouseDown(button=button)
+    get_backend().mouse_down(button)
     return True
 
 
 # Release mouse button
 def mouse_up(button="left"):
-    pyautogui.mouseUp(button=button)
+    get_backend().mouse_up(button)
     return True
 
 
 # Scroll up or down
 def scroll(clicks):
-    pyautogui.scroll(clicks)
-    return True
\ No newline at end of file
+    get_backend().scroll(clicks)
+    return True
@@ -0,0 +1,175 @@
+import os
+import sys
+import threading
+import time
+
+from config import DISPLAY_STATE_TTL
+
+# Monitor geometry is cached. On X11 with RandR a watcher thread drops the
+# cache whenever outputs or CRTCs change (resolution switch, monitor plugged
+# in); elsewhere the cache expires after DISPLAY_STATE_TTL seconds.
+# Cursor position and the focused window are read directly, which is a
+# single round trip to the X server / a single Win32 call.
+
+_lock = threading.Lock()
+_monitors = None
+_monitors_time = 0.0
+_generation = 0
+_event_driven = False
+_watcher = None
+
+# Display connection for queries; python-xlib connections are not thread-safe
+_x_lock = threading.Lock()
+_x_display = None
+_x_unavailable = False
+
+
+def _xlib_display():
+    """Shared Xlib connection for cursor and window queries, or None off X11"""
+    global _x_display, _x_unavailable
+    if _x_display is not None or _x_unavailable:
+        return _x_display
+    if sys.platform.startswith('win') or sys.platform == 'darwin' or not os.environ.get('DISPLAY'):
+        _x_unavailable = True
+        return None
+    with _x_lock:
+        if _x_display is None and not _x_unavailable:
+            try:
+                from Xlib import display as xdisplay
+                _x_display = xdisplay.Display()
+            except Exception as e:
+                print(f"Xlib unavailable, falling back to pyautogui for display state: {e}")
+                _x_unavailable = True
+    return _x_display
+
+
+def _watch_randr():
+    """Invalidate the monitor cache on RandR notifications (runs in a daemon thread)"""
+    global _event_driven
+    try:
+        from Xlib import display as xdisplay
+        from Xlib.ext import randr
+        connection = xdisplay.Display()
+        if not connection.has_extension('RANDR'):
+            connection.close()
+            return
+        root = connection.screen().root
+        root.xrandr_select_input(randr.RRScreenChangeNotifyMask |
+                                 randr.RRCrtcChangeNotifyMask |
+                                 randr.RROutputChangeNotifyMask)
+        connection.flush()
+    except Exception as e:
+        print(f"RandR change events unavailable, monitor geometry expires every {DISPLAY_STATE_TTL}s: {e}")
+        return
+
+    _event_driven = True
+    while True:
+        try:
+            connection.next_event()
+        except Exception:
+            _event_driven = False
+            return
+        # Only RandR events were selected: any event means the layout may have changed
+        invalidate()
+
+
+def _ensure_watcher():
+    global _watcher
+    if _watcher is not None or _xlib_display() is None:
+        return
+    with _lock:
+        if _watcher is None:
+            _watcher = threading.Thread(target=_watch_randr, daemon=True, name='randr-watcher')
+            _watcher.start()
+
+
+def invalidate():
+    """Forget the cached monitor geometry"""
+    global _monitors, _generation
+    with _lock:
+        _monitors = None
+        _generation += 1
+
+
+def get_monitors():
+    """Monitor list as [(x, y, width, height), ...], primary first"""
+    global _monitors, _monitors_time
+    _ensure_watcher()
+    with _lock:
+        fresh = _event_driven or time.time() - _monitors_time < DISPLAY_STATE_TTL
+        if _monitors is not None and fresh:
+            return _monitors
+        generation = _generation
+
+    monitors = []
+    try:
+        from screeninfo import get_monitors as enumerate_monitors
+        found = enumerate_monitors()
+        found.sort(key=lambda m: not getattr(m, 'is_primary', False))
+        monitors = [(m.x, m.y, m.width, m.height) for m in found]
+    except Exception as e:
+        print(f"Monitor enumeration failed: {e}")
+    if not monitors:
+        import pyautogui
+        width, height = pyautogui.size()
+        monitors = [(0, 0, width, height)]
+
+    with _lock:
+        # A change notification during enumeration means the result may already be stale
+        if generation == _generation:
+            _monitors = monitors
+            _monitors_time = time.time()
+    return monitors
+
+
+def get_screen_dimensions():
+    """Width and height of the primary monitor"""
+    _, _, width, height = get_monitors()[0]
+    return width, height
+
+
+def get_cursor_position():
+    connection = _xlib_display()
+    if connection is not None:
+        with _x_lock:
+            pointer = connection.screen().root.query_pointer()
+        return pointer.root_x, pointer.root_y
+    import pyautogui
+    return tuple(pyautogui.position())
+
+
+def get_focused_window_rect():
+    """(x, y, width, height) of the focused top-level window, or None if unknown"""
+    if sys.platform.startswith('win'):
+        return _focused_window_rect_win32()
+    connection = _xlib_display()
+    if connection is None:
+        return None
+    try:
+        from Xlib import X
+        with _x_lock:
+            root = connection.screen().root
+            active = root.get_full_property(connection.intern_atom('_NET_ACTIVE_WINDOW'), X.AnyPropertyType)
+            if not active or not active.value or not active.value[0]:
+                return None
+            window = connection.create_resource_object('window', active.value[0])
+            geometry = window.get_geometry()
+            origin = window.translate_coords(root, 0, 0)
+        # translate_coords gives the root origin in window coordinates
+        return -origin.x, -origin.y, geometry.width, geometry.height
+    except Exception:
+        return None
+
+
+def _focused_window_rect_win32():
+    import ctypes
+    from ctypes import wintypes
+
+    user32 = ctypes.windll.user32
+    handle = user32.GetForegroundWindow()
+    if not handle:
+        return None
+    rect = wintypes.RECT()
+    if not user32.GetWindowRect(handle, ctypes.byref(rect)):
+        return None
+    return rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top
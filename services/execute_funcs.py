@@ -17,7 +17,9 @@ from services.cursor import (
     scroll,
     get_cursor_position
 )
-from services.find_ui import move_mouse_to_ui_element
+from services import tracing
+from services import action_verifier
+from config import ACTION_VERIFY, ACTION_VERIFY_SKIP_REST
 
 listening = False
 
@@ -65,7 +67,28 @@ def extract_json(text):
     return json_objects, text.strip()
 
 
-def process_commands(commands):
+def _no_visible_effect(results):
+    return ACTION_VERIFY_SKIP_REST and any(result.get("verified") is False for result in results)
+
+
+def _skipped(commands):
+    """Results for commands not run because an earlier action had no visible effect (ACTION_VERIFY_SKIP_REST)"""
+    return [{"command": command["command"], "success": False,
+             "message": "Skipped: an earlier action had no visible effect"}
+            for command in commands]
+
+
+def process_commands(commands, cancel_token=None, trailing_wait=True):
+    """
+    Execute commands and return their results. With a CancellationToken every
+    command and wait checks it and CancelledError propagates to the caller.
+    trailing_wait=False skips the pause after the last command, for callers
+    that wait for the screen to settle themselves. With ACTION_VERIFY an
+    action without visible effect (services/action_verifier.py) gets
+    "verified": False and a note in its message; the verifier's polling is
+    taken out of the 0.5 s pause between commands, not added to it. Only with
+    ACTION_VERIFY_SKIP_REST are the commands after such an action skipped.
+    """
     results = []
     try:
         # Process commands in batches for efficiency
@@ -74,19 +97,24 @@ def process_commands(commands):
         
         for command in commands:
             result = {"command": command["command"], "success": True, "message": ""}
+            if _no_visible_effect(results):
+                results.extend(_skipped([command]))
+                continue
             
             try:
                 # Group commands that can be batched together
                 if command['command'] in ['wait']:
                     # Process any accumulated batch commands first
                     if batch_commands:
-                        batch_results = execute_batch_commands(batch_commands)
+                        batch_results = execute_batch_commands(batch_commands, cancel_token)
                         results.extend(batch_results)
+                        if _no_visible_effect(batch_results):
+                            results.extend(_skipped(batch_commands[len(batch_results):]))
                         batch_commands = []
                     
                     # Process the wait command individually
                     seconds = command['params']['seconds']
-                    time.sleep(seconds)
+                    tracing.sleep(seconds, 'wait', cancel_token)
                     result["message"] = f"Waited for {seconds} seconds"
                     results.append(result)
                 else:
@@ -95,8 +123,11 @@ def process_commands(commands):
                     
                     # If batch size reaches threshold or this is the last command, process the batch
                     if len(batch_commands) >= 3 or command == commands[-1]:
-                        batch_results = execute_batch_commands(batch_commands)
+                        batch_results = execute_batch_commands(batch_commands, cancel_token,
+                                                               trailing_wait or command != commands[-1])
                         results.extend(batch_results)
+                        if _no_visible_effect(batch_results):
+                            results.extend(_skipped(batch_commands[len(batch_results):]))
                         batch_commands = []
                         continue
                     
@@ -114,8 +145,10 @@ def process_commands(commands):
         
         # Process any remaining batch commands
         if batch_commands:
-            batch_results = execute_batch_commands(batch_commands)
+            batch_results = execute_batch_commands(batch_commands, cancel_token, trailing_wait)
             results.extend(batch_results)
+            if _no_visible_effect(batch_results):
+                results.extend(_skipped(batch_commands[len(batch_results):]))
     
     except Exception as e:
         print(f"Error processing commands: {e}")
@@ -133,106 +166,126 @@ def set_listening(value):
     listening = value
     return
 
-def execute_batch_commands(commands):
+def execute_batch_commands(commands, cancel_token=None, trailing_wait=True):
     """Execute a batch of commands efficiently"""
     global listening
     results = []
     
     for command in commands:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
         result = {"command": command["command"], "success": True, "message": ""}
-        try:
-            if command['command'] == 'move_cursor_absolute':
-                move_cursor_absolute(command['params']['x'], command['params']['y'])
-                result["message"] = f"Moved cursor to absolute position: {command['params']['x']}, {command['params']['y']}"
+        verify_state = action_verifier.before(command) if ACTION_VERIFY else None
+        with tracing.span('command', command=command['command']) as sp:
+            try:
+                if command['command'] == 'move_cursor_absolute':
+                    move_cursor_absolute(command['params']['x'], command['params']['y'])
+                    result["message"] = f"Moved cursor to absolute position: {command['params']['x']}, {command['params']['y']}"
             
-            elif command['command'] == 'move_cursor_relative':
-                move_cursor_relative(command['params']['dx'], command['params']['dy'])
-                x, y = get_cursor_position()
-                result["message"] = f"Moved cursor by offset: {command['params']['dx']}, {command['params']['dy']}. New position: {x}, {y}"
+                elif command['command'] == 'move_cursor_relative':
+                    move_cursor_relative(command['params']['dx'], command['params']['dy'])
+                    x, y = get_cursor_position()
+                    result["message"] = f"Moved cursor by offset: {command['params']['dx']}, {command['params']['dy']}. New position: {x}, {y}"
             
-            elif command['command'] == 'mouse_button':
-                click_mouse_button(command['params']['button'])
-                result["message"] = f"Clicked {command['params']['button']} mouse button"
+                elif command['command'] == 'mouse_button':
+                    click_mouse_button(command['params']['button'])
+                    result["message"] = f"Clicked {command['params']['button']} mouse button"
             
-            elif command['command'] == 'move_cursor_to_element':
-                move_mouse_to_ui_element(command['params']['name'])
-                time.sleep(5)
-                result["message"] = f"Moved cursor to element {command['params']['name']}"
+                elif command['command'] == 'move_cursor_to_element':
+                    # find_ui pulls in the grid renderer and the LLM client: import on first use
+                    from services.find_ui import move_mouse_to_ui_element
+                    coordinates = move_mouse_to_ui_element(command['params']['name'], cancel_token=cancel_token)
+                    sp.set(coordinates=coordinates)
+                    if coordinates:
+                        result["position"] = tuple(coordinates)
+                    tracing.sleep(5, 'after_locate', cancel_token)
+                    result["message"] = f"Moved cursor to element {command['params']['name']}"
             
-            elif command['command'] == 'double_click':
-                button = command['params'].get('button', 'left')
-                double_click(button)
-                result["message"] = f"Double-clicked {button} mouse button"
+                elif command['command'] == 'double_click':
+                    button = command['params'].get('button', 'left')
+                    double_click(button)
+                    result["message"] = f"Double-clicked {button} mouse button"
             
-            elif command['command'] == 'drag_to':
-                x = command['params']['x']
-                y = command['params']['y']
-                button = command['params'].get('button', 'left')
-                duration = command['params'].get('duration', 0.5)
-                drag_to(x, y, button, duration)
-                result["message"] = f"Dragged to position: {x}, {y}"
+                elif command['command'] == 'drag_to':
+                    x = command['params']['x']
+                    y = command['params']['y']
+                    button = command['params'].get('button', 'left')
+                    duration = command['params'].get('duration', 0.5)
+                    drag_to(x, y, button, duration)
+                    result["message"] = f"Dragged to position: {x}, {y}"
             
-            elif command['command'] == 'mouse_down':
-                button = command['params'].get('button', 'left')
-                mouse_down(button)
-                result["message"] = f"Pressed and held {button} mouse button"
+                elif command['command'] == 'mouse_down':
+                    button = command['params'].get('button', 'left')
+                    mouse_down(button)
+                    result["message"] = f"Pressed and held {button} mouse button"
             
-            elif command['command'] == 'mouse_up':
-                button = command['params'].get('button', 'left')
-                mouse_up(button)
-                result["message"] = f"Released {button} mouse button"
+                elif command['command'] == 'mouse_up':
+                    button = command['params'].get('button', 'left')
+                    mouse_up(button)
+                    result["message"] = f"Released {button} mouse button"
             
-            elif command['command'] == 'press_key':
-                press_key(command['params']['key'])
-                result["message"] = f"Pressed key: {command['params']['key']}"
+                elif command['command'] == 'press_key':
+                    press_key(command['params']['key'])
+                    result["message"] = f"Pressed key: {command['params']['key']}"
             
-            elif command['command'] == 'press_hotkey':
-                keys = command['params']['keys']
-                press_hotkey(*keys)
-                result["message"] = f"Pressed hotkey combination: {'+'.join(keys)}"
+                elif command['command'] == 'press_hotkey':
+                    keys = command['params']['keys']
+                    press_hotkey(*keys)
+                    result["message"] = f"Pressed hotkey combination: {'+'.join(keys)}"
             
-            elif command['command'] == 'enter_text':
-                text = command['params']['text']
-                type_text(text)
-                result["message"] = f"Typed text: {text}"
+                elif command['command'] == 'enter_text':
+                    text = command['params']['text']
+                    type_text(text)
+                    result["message"] = f"Typed text: {text}"
             
-            elif command['command'] == 'scroll':
-                clicks = command['params']['clicks']
-                scroll(clicks)
-                result["message"] = f"Scrolled by {clicks} clicks"
-            elif command['command'] == 'listen':
-                if not listening:
+                elif command['command'] == 'scroll':
+                    clicks = command['params']['clicks']
+                    scroll(clicks)
+                    result["message"] = f"Scrolled by {clicks} clicks"
+                elif command['command'] == 'listen':
+                    if not listening:
+                        set_listening(True)
+                        result["success"] = True
+                        result["message"] = f"Waiting for user instructions..."
+                        results.append(result)
+                    return results
+                elif command['command'] == 'listen':
                     set_listening(True)
                     result["success"] = True
-                    result["message"] = f"Waiting for user instructions..."
+                    result["message"] = f"<repeat>"
+                    results.append(result)
+                    return results
+                else:
+                    result["success"] = False
+                    result["message"] = f"Unknown command: {command['command']}"
                     results.append(result)
-                return results
-            elif command['command'] == 'listen':
-                set_listening(True)
-                result["success"] = True
-                result["message"] = f"<repeat>"
+                    break
+        
+            except KeyError as e:
+                result["success"] = False
+                result["message"] = f"Missing required parameter: {e}"
                 results.append(result)
-                return results
-            else:
+                set_listening(False)
+                break
+            except Exception as e:
                 result["success"] = False
-                result["message"] = f"Unknown command: {command['command']}"
+                result["message"] = f"Error executing command: {str(e)}"
                 results.append(result)
+                set_listening(False)
                 break
         
-        except KeyError as e:
-            result["success"] = False
-            result["message"] = f"Missing required parameter: {e}"
-            results.append(result)
-            set_listening(False)
-            break
-        except Exception as e:
-            result["success"] = False
-            result["message"] = f"Error executing command: {str(e)}"
-            results.append(result)
-            set_listening(False)
-            break
-        
         results.append(result)
-        time.sleep(0.5)
+        # Verification polling counts towards the pause between commands
+        verify_start = time.time()
+        note = action_verifier.after(command, verify_state, cancel_token)
+        if note is not None:
+            result["verified"] = False
+            result["message"] += f" - {note}"
+            if ACTION_VERIFY_SKIP_REST:
+                # The following commands assumed this one worked
+                break
+        pause = 0.5 - (time.time() - verify_start)
+        if (trailing_wait or command is not commands[-1]) and pause > 0:
+            tracing.sleep(pause, 'between_commands', cancel_token)
     
     return results
@@ -1,14 +1,18 @@
 import base64
 import io
 import time
-import cv2
 import numpy as np
-import pyautogui
 from PIL import Image
 import os
 import re
 from services.openrouter_api import generate
 from services.cache_module import _screenshot_cache, _cache_lock
+from services import tracing
+from services import metrics
+from services import ocr_index
+from services import atspi_backend
+from services.input_backends import get_backend
+from config import OCR_ENABLED, ATSPI_ENABLED
 
 def encode_image_to_base64(image_path=None, pil_image=None):
     """Convert image to base64 encoding"""
@@ -31,13 +35,17 @@ def get_grid_cells_from_cache():
 
 def get_current_screenshot():
     """Capture current screenshot and return as OpenCV image"""
+    import cv2
+    import pyautogui
+
     screenshot = pyautogui.screenshot()
     img_np = np.array(screenshot)
     # Convert from RGB to BGR (OpenCV format)
     img_cv = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
     return img_cv, screenshot.width, screenshot.height
 
-def llm_choose_best_grid_cell(element_description, grid_image_path, original_image_path, screen_dimensions):
+def llm_choose_best_grid_cell(element_description, grid_image_path, original_image_path, screen_dimensions,
+                              cancel_token=None):
     """
     Ask LLM to choose the best grid cell for the UI element
     """
@@ -65,7 +73,7 @@ def llm_choose_best_grid_cell(element_description, grid_image_path, original_ima
     ]
 
     system_prompt = "locate_ui_element"
-    result = generate(messages, system_prompt)
+    result = generate(messages, system_prompt, cancel_token=cancel_token)
 
     return result
 
@@ -91,9 +99,10 @@ def get_cell_center_coordinates(cell_number):
     """Get the center coordinates of a grid cell from the cache"""
     grid_cells = get_grid_cells_from_cache()
 
-    for cell in grid_cells:
-        if cell['index'] == cell_number:
-            return cell['center_x'], cell['center_y']
+    # Cells are numbered 1..N in list order
+    if 1 <= cell_number <= len(grid_cells) and grid_cells[cell_number - 1]['index'] == cell_number:
+        cell = grid_cells[cell_number - 1]
+        return cell['center_x'], cell['center_y']
 
     return None
 
@@ -119,10 +128,37 @@ def ensure_grid_screenshot_exists():
 
     return grid_path, fullscreen_path
 
-def get_ui_element_coordinates(screenshot_path=None, element_description=None, screen_width=None, screen_height=None):
+def get_ui_element_coordinates(screenshot_path=None, element_description=None, screen_width=None, screen_height=None,
+                               cancel_token=None):
     """
-    Find UI element coordinates using the grid-based approach and LLM
+    Find UI element coordinates: the accessibility tree of the focused app
+    first, then a label quoted in the description in the local OCR index,
+    otherwise the grid-based approach and LLM
     """
+    if ATSPI_ENABLED and screenshot_path is None:
+        with tracing.span('locate.atspi') as sp:
+            coordinates = atspi_backend.locate(element_description)
+            sp.set(hit=coordinates is not None)
+        if coordinates:
+            print(f"Found '{element_description}' in the accessibility tree: {coordinates}")
+            return coordinates
+
+    # Quoted labels on the live screen are resolved without the LLM when OCR finds them in one place
+    if OCR_ENABLED and screenshot_path is None:
+        with tracing.span('locate.ocr') as sp:
+            coordinates = ocr_index.locate(element_description)
+            sp.set(hit=coordinates is not None)
+        if coordinates:
+            print(f"Found '{element_description}' by OCR: {coordinates}")
+            return coordinates
+
+    with metrics.LOCATE_LLM_SECONDS.time():
+        return _locate_with_grid(screenshot_path, element_description, screen_width, screen_height, cancel_token)
+
+def _locate_with_grid(screenshot_path, element_description, screen_width, screen_height, cancel_token):
+    """Grid screenshot, LLM cell choice and the direct-coordinates fallback"""
+    import pyautogui
+
     # Get screen dimensions if not provided
     if screen_width is None or screen_height is None:
         screen_width, screen_height = pyautogui.size()
@@ -130,28 +166,33 @@ def get_ui_element_coordinates(screenshot_path=None, element_description=None, s
     screen_dimensions = (screen_width, screen_height)
 
     # Ensure we have a recent grid screenshot
-    grid_path, fullscreen_path = ensure_grid_screenshot_exists()
+    with tracing.span('locate.grid_screenshot'):
+        grid_path, fullscreen_path = ensure_grid_screenshot_exists()
 
     # Use provided screenshot path if given
     if screenshot_path is not None:
         fullscreen_path = screenshot_path
         # We need to regenerate the grid for this custom screenshot
         from services.screenshot_module import save_screenshot_with_grid
-        save_screenshot_with_grid()
+        with tracing.span('locate.grid_screenshot', custom=True):
+            save_screenshot_with_grid()
         grid_path = 'screenshots/grid.jpg'
 
     # Ask LLM to identify the correct grid cell
     print(f"Asking LLM to identify grid cell for '{element_description}'...")
-    llm_response = llm_choose_best_grid_cell(
-        element_description,
-        grid_path,
-        fullscreen_path,
-        screen_dimensions
-    )
-    print(f"LLM response: {llm_response}")
-
-    # Extract cell number from LLM response
-    cell_number = extract_cell_number_from_llm_response(llm_response)
+    with tracing.span('locate.choose_cell') as sp:
+        llm_response = llm_choose_best_grid_cell(
+            element_description,
+            grid_path,
+            fullscreen_path,
+            screen_dimensions,
+            cancel_token=cancel_token
+        )
+        print(f"LLM response: {llm_response}")
+
+        # Extract cell number from LLM response
+        cell_number = extract_cell_number_from_llm_response(llm_response)
+        sp.set(cell=cell_number)
 
     if cell_number:
         # Get coordinates of the cell center
@@ -162,9 +203,11 @@ def get_ui_element_coordinates(screenshot_path=None, element_description=None, s
 
     # If we couldn't get coordinates, fallback to direct coordinate detection
     print("Falling back to direct coordinate detection...")
-    return fallback_llm_coordinate_detection(fullscreen_path, element_description, screen_dimensions)
+    with tracing.span('locate.fallback'):
+        return fallback_llm_coordinate_detection(fullscreen_path, element_description, screen_dimensions,
+                                                 cancel_token=cancel_token)
 
-def fallback_llm_coordinate_detection(image_path, element_description, screen_dimensions):
+def fallback_llm_coordinate_detection(image_path, element_description, screen_dimensions, cancel_token=None):
     """Fallback method using only LLM to determine coordinates"""
     screen_width, screen_height = screen_dimensions
 
@@ -190,7 +233,7 @@ def fallback_llm_coordinate_detection(image_path, element_description, screen_di
     ]
 
     system_prompt = "locate_ui_element"
-    result = generate(messages, system_prompt)
+    result = generate(messages, system_prompt, cancel_token=cancel_token)
 
     # Extract coordinates
     coordinates_pattern = r'x:\s*(\d+(?:\.\d+)?),\s*y:\s*(\d+(?:\.\d+)?)'
@@ -210,34 +253,46 @@ def fallback_llm_coordinate_detection(image_path, element_description, screen_di
 
     return None
 
-def move_mouse_to_ui_element(element_description, screenshot_path=None):
+def move_mouse_to_ui_element(element_description, screenshot_path=None, cancel_token=None):
     """
     Moves the mouse cursor to the UI element described.
 
     Args:
         element_description: Natural language description of the UI element
         screenshot_path: Optional path to a screenshot file
+        cancel_token: Optional CancellationToken; the LLM calls stop waiting when it is cancelled
 
     Returns:
         tuple: (x, y) coordinates where the mouse was moved, or None if failed
     """
+    import pyautogui
+
     # Get screen dimensions
     screen_width, screen_height = pyautogui.size()
 
     # Get coordinates of the UI element using grid-based method
-    coordinates = get_ui_element_coordinates(
-        screenshot_path=screenshot_path,
-        element_description=element_description,
-        screen_width=screen_width,
-        screen_height=screen_height
-    )
+    with tracing.span('locate', description=element_description) as sp, metrics.LOCATE_SECONDS.time():
+        coordinates = get_ui_element_coordinates(
+            screenshot_path=screenshot_path,
+            element_description=element_description,
+            screen_width=screen_width,
+            screen_height=screen_height,
+            cancel_token=cancel_token
+        )
+        sp.set(coordinates=coordinates)
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
 
     if coordinates:
         x, y = coordinates
         print(f"Moving mouse to coordinates: x: {x}, y: {y}")
 
         # Move mouse to the coordinates
-        pyautogui.moveTo(x, y, duration=0.5)
+        backend = get_backend()
+        duration = backend.timing['locate_move_duration']
+        with tracing.span('move_tween', duration=duration):
+            backend.move_to(x, y, duration)
         return coordinates
     else:
         print("Failed to find the UI element.")
@@ -260,7 +315,8 @@ def move_mouse_to_grid_cell(cell_number):
         print(f"Moving mouse to grid cell #{cell_number} at coordinates: x: {x}, y: {y}")
 
         # Move mouse to the coordinates
-        pyautogui.moveTo(x, y, duration=0.5)
+        backend = get_backend()
+        backend.move_to(x, y, backend.timing['locate_move_duration'])
         return coordinates
     else:
         print(f"Failed to find grid cell #{cell_number}.")
@@ -0,0 +1,183 @@
+import base64
+import io
+import math
+
+from PIL import ImageDraw
+
+from services import tracing
+from services import image_pool
+from services.frame_diff import describe_regions
+from config import FOVEA_PIXEL_BUDGET, FOVEA_GLOBAL_SHARE, FOVEA_MAX_CROPS, DIFF_CROP_PIXELS
+
+# Foveated observation for the planner request.
+#
+# One downscaled view of the whole screen keeps the layout; small text is
+# unreadable at that scale, so native-resolution crops of the regions the
+# model most likely needs to read are added: the regions that changed since
+# the previous observation (services/frame_diff.py, at most DIFF_CROP_PIXELS
+# each, listed with their coordinates so the model sees what its last action
+# did), then up to FOVEA_MAX_CROPS of the area around the cursor and the
+# focused window. All images together stay within
+# FOVEA_PIXEL_BUDGET pixels, FOVEA_GLOBAL_SHARE of which go to the global
+# view. Crops come from the same frame as the global view, so everything the
+# model sees is from one moment.
+
+# Crops are never narrower or shorter than this (a changed checkbox alone says little)
+MIN_CROP_SIDE = 160
+# Aspect ratio limits for crops cut out of larger regions
+MAX_CROP_ASPECT = 3.0
+
+
+def _overlap(a, b):
+    """Intersection area of two (x, y, w, h) rectangles"""
+    width = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    height = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    return max(0, width) * max(0, height)
+
+
+def fit_crop(region, focus, budget, screen_size):
+    """
+    Native-resolution crop (x, y, w, h) showing `region` within `budget`
+    pixels: the whole region if it fits (grown to MIN_CROP_SIDE around its
+    center), otherwise the largest window of the region's aspect ratio
+    centered on `focus` (or the region center when focus lies outside it).
+    """
+    screen_width, screen_height = screen_size
+    x, y, w, h = region
+    w, h = max(1, w), max(1, h)
+    if w * h <= budget:
+        crop_w, crop_h = max(w, MIN_CROP_SIDE), max(h, MIN_CROP_SIDE)
+        center_x, center_y = x + w / 2, y + h / 2
+    else:
+        aspect = min(MAX_CROP_ASPECT, max(1 / MAX_CROP_ASPECT, w / h))
+        crop_h = int(math.sqrt(budget / aspect))
+        crop_w = int(crop_h * aspect)
+        crop_w, crop_h = min(crop_w, w), min(crop_h, h)
+        inside = focus is not None and x <= focus[0] < x + w and y <= focus[1] < y + h
+        center_x, center_y = focus if inside else (x + w / 2, y + h / 2)
+        # Keep the crop inside the region
+        center_x = min(max(center_x, x + crop_w / 2), x + w - crop_w / 2)
+        center_y = min(max(center_y, y + crop_h / 2), y + h - crop_h / 2)
+
+    crop_w, crop_h = min(int(crop_w), screen_width), min(int(crop_h), screen_height)
+    left = int(min(max(0, center_x - crop_w / 2), screen_width - crop_w))
+    top = int(min(max(0, center_y - crop_h / 2), screen_height - crop_h))
+    return left, top, crop_w, crop_h
+
+
+def select_crops(screen_size, cursor, focused=None, changed=None,
+                 budget=FOVEA_PIXEL_BUDGET * (1 - FOVEA_GLOBAL_SHARE), max_crops=FOVEA_MAX_CROPS,
+                 changed_crop_pixels=DIFF_CROP_PIXELS):
+    """
+    (label, (x, y, w, h)) crops in priority order: one per changed region
+    (x, y, w, h, changed_pixels), then up to `max_crops` of the cursor area
+    and the focused window. A candidate mostly covered by an already chosen
+    crop is skipped; the pixel budget left after the changed-region crops
+    is split evenly between the other crops that remain.
+    """
+    screen_width, screen_height = screen_size
+    changed = list(changed or [])
+
+    chosen = []
+    if changed:
+        per_change = min(changed_crop_pixels, budget / (len(changed) + max_crops))
+        for index, region in enumerate(changed, 1):
+            crop = fit_crop(region[:4], cursor, per_change, screen_size)
+            if any(_overlap(crop, other) > 0.5 * crop[2] * crop[3] for _, other in chosen):
+                continue
+            chosen.append((f'changed region {index}', crop))
+    budget = max(0, budget - sum(w * h for _, (x, y, w, h) in chosen))
+
+    candidates = []
+    if cursor is not None:
+        side = int(math.sqrt(budget / max(1, max_crops)))
+        candidates.append(('cursor area', (cursor[0] - side // 2, cursor[1] - side // 2, side, side)))
+    if focused is not None:
+        fx, fy, fw, fh = focused
+        # A maximized window is already what the global view shows
+        if fw * fh < 0.8 * screen_width * screen_height:
+            candidates.append(('focused window', focused))
+
+    # Clip candidates to the screen
+    clipped = []
+    for label, (x, y, w, h) in candidates:
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(screen_width, x + w), min(screen_height, y + h)
+        if x1 > x0 and y1 > y0:
+            clipped.append((label, (x0, y0, x1 - x0, y1 - y0)))
+
+    if budget < MIN_CROP_SIDE * MIN_CROP_SIDE:
+        return chosen
+    extra = []
+    for count in range(min(max_crops, len(clipped)), 0, -1):
+        per_crop = budget / count
+        extra = []
+        for label, region in clipped:
+            crop = fit_crop(region, cursor, per_crop, screen_size)
+            if any(_overlap(crop, other) > 0.5 * crop[2] * crop[3] for _, other in chosen + extra):
+                continue
+            extra.append((label, crop))
+            if len(extra) == count:
+                break
+        if len(extra) == count:
+            break
+    return chosen + extra
+
+
+def _encode(image, quality=85):
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _mark_cursor(image, cursor, offset=(0, 0), scale=1.0):
+    x = (cursor[0] - offset[0]) * scale
+    y = (cursor[1] - offset[1]) * scale
+    if 0 <= x < image.width and 0 <= y < image.height:
+        ImageDraw.Draw(image).ellipse((x - 5, y - 5, x + 5, y + 5), fill=(255, 0, 0))
+
+
+def build_observation(frame, cursor, focused=None, changed=None, budget=FOVEA_PIXEL_BUDGET,
+                      global_share=FOVEA_GLOBAL_SHARE, max_crops=FOVEA_MAX_CROPS):
+    """
+    Returns (message content parts, global view JPEG bytes). The parts are
+    text captions and base64 JPEG image_url entries: the global view first,
+    then a line listing the changed regions (when `changed` is not None)
+    and each crop with its screen coordinates.
+    """
+    width, height = frame.size
+    global_pixels = budget * global_share
+    scale = min(1.0, math.sqrt(global_pixels / (width * height)))
+    global_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+    with tracing.span('resize', width=global_size[0], height=global_size[1]):
+        global_view = image_pool.resize(frame, global_size)
+    _mark_cursor(global_view, cursor, scale=scale)
+
+    crops = select_crops((width, height), cursor, focused, changed,
+                         budget - global_size[0] * global_size[1], max_crops)
+
+    with tracing.span('fovea_encode', crops=len(crops)):
+        global_jpeg = _encode(global_view)
+        parts = [
+            {"type": "text", "text": f"Fullscreen screenshot (screen {width}x{height}, shown at "
+                                     f"{global_size[0]}x{global_size[1]}; red dot = cursor at {cursor[0]}, {cursor[1]}):"},
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64.b64encode(global_jpeg).decode('utf-8')}"}},
+        ]
+        if changed is not None:
+            parts.append({"type": "text", "text": describe_regions(changed, (width, height))})
+        parts.extend(crop_parts(frame, crops, cursor))
+    return parts, global_jpeg
+
+
+def crop_parts(frame, crops, cursor):
+    """Caption and base64 JPEG content parts for (label, (x, y, w, h)) crops of `frame`"""
+    parts = []
+    for label, (x, y, w, h) in crops:
+        crop = frame.crop((x, y, x + w, y + h))
+        _mark_cursor(crop, cursor, offset=(x, y))
+        encoded = base64.b64encode(_encode(crop)).decode('utf-8')
+        parts.append({"type": "text", "text": f"Detail at native resolution - {label}, screen area "
+                                              f"x {x}-{x + w}, y {y}-{y + h}:"})
+        parts.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded}"}})
+    return parts
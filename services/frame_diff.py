@@ -0,0 +1,112 @@
+import threading
+
+import numpy as np
+from PIL import Image
+
+from services import tracing
+from config import DIFF_TOP_K, DIFF_THRESHOLD
+
+# Changed regions between two screenshots (before and after an action).
+#
+# Frames are compared in grayscale on a grid of BLOCK x BLOCK pixel blocks
+# (after halving frames wider than 2000 px); a block is changed if any of
+# its pixels differs by more than `threshold`. Changed blocks closer than
+# `merge_blocks` blocks are joined into one region, so a redrawn dialog
+# comes out as one box rather than a box per line of text.
+
+BLOCK = 8
+
+_previous_frame = None
+_previous_lock = threading.Lock()
+
+
+def _gray(frame, factor):
+    image = Image.fromarray(frame) if isinstance(frame, np.ndarray) else frame
+    if factor > 1:
+        image = image.reduce(factor)
+    return np.asarray(image.convert('L'), dtype=np.int16)
+
+
+def changed_regions(before, after, k=DIFF_TOP_K, threshold=DIFF_THRESHOLD, min_pixels=12, merge_blocks=2):
+    """
+    Top `k` changed regions as [(x, y, w, h, changed_pixels)] in screen
+    pixels of `after`, largest change first. Empty if the frames have
+    different sizes or nothing changed.
+    """
+    import cv2
+
+    before_size = before.shape[1::-1] if isinstance(before, np.ndarray) else before.size
+    after_size = after.shape[1::-1] if isinstance(after, np.ndarray) else after.size
+    if before_size != after_size:
+        return []
+    factor = 2 if after_size[0] > 2000 else 1
+
+    with tracing.span('frame_diff', k=k):
+        changed = np.abs(_gray(after, factor) - _gray(before, factor)) > threshold
+        height, width = changed.shape
+        rows, cols = -(-height // BLOCK), -(-width // BLOCK)
+        padded = np.zeros((rows * BLOCK, cols * BLOCK), dtype=np.uint8)
+        padded[:height, :width] = changed
+        # Changed pixel count per block
+        counts = padded.reshape(rows, BLOCK, cols, BLOCK).sum(axis=(1, 3))
+        if not counts.any():
+            return []
+
+        mask = (counts > 0).astype(np.uint8)
+        if merge_blocks:
+            kernel = np.ones((2 * merge_blocks + 1, 2 * merge_blocks + 1), dtype=np.uint8)
+            joined = cv2.dilate(mask, kernel)
+        else:
+            joined = mask
+        count, labels = cv2.connectedComponents(joined, connectivity=8)
+
+        regions = []
+        for label in range(1, count):
+            # Dilation only joins blocks; the box covers the changed blocks themselves
+            component = (labels == label) & (mask > 0)
+            pixels = int(counts[component].sum())
+            if pixels < min_pixels:
+                continue
+            block_rows, block_cols = np.nonzero(component)
+            scale = BLOCK * factor
+            x0, y0 = int(block_cols.min()) * scale, int(block_rows.min()) * scale
+            x1 = min(after_size[0], (int(block_cols.max()) + 1) * scale)
+            y1 = min(after_size[1], (int(block_rows.max()) + 1) * scale)
+            regions.append((x0, y0, x1 - x0, y1 - y0, pixels * factor * factor))
+
+    regions.sort(key=lambda region: -region[4])
+    return regions[:k]
+
+
+def since_previous(frame, k=DIFF_TOP_K):
+    """
+    Changed regions of `frame` against the last observation sent to the
+    model (mark_sent), i.e. the one the last command batch was planned on;
+    None before the first one (nothing to compare against).
+    """
+    with _previous_lock:
+        previous = _previous_frame
+    if previous is None:
+        return None
+    return changed_regions(previous, frame, k)
+
+
+def mark_sent(frame):
+    """
+    Record `frame` as the observation the model sees. Captures that are
+    dropped (too old, or the step was interrupted) must not become the
+    baseline, or the effect of the last action would be diffed away.
+    """
+    global _previous_frame
+    with _previous_lock:
+        _previous_frame = frame
+
+
+def describe_regions(regions, screen_size):
+    """One line of text listing the changed regions for the planner"""
+    if not regions:
+        return "No visible change since the previous screenshot."
+    total = screen_size[0] * screen_size[1]
+    boxes = "; ".join(f"x {x}-{x + w}, y {y}-{y + h}" for x, y, w, h, _ in regions)
+    share = sum(w * h for x, y, w, h, _ in regions) / total
+    return f"Changed since the previous screenshot ({share:.0%} of the screen): {boxes}."
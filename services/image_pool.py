@@ -0,0 +1,218 @@
+import atexit
+import concurrent.futures
+import io
+import math
+import multiprocessing
+import os
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+from services import tracing
+from config import IMAGE_POOL_ENABLED, IMAGE_POOL_WORKERS, IMAGE_POOL_MIN_PIXELS
+
+# Process pool for screenshot resize, grid compositing and JPEG encoding.
+#
+# Large frames are copied once into a shared memory block that the workers
+# map; only the block name, shape and job arguments are pickled. A LANCZOS
+# resize is split into horizontal bands, one per worker, each reading its
+# rows plus the filter support around them so the bands join without seams.
+# Each band computes its filter weights from its own box, so at non-integer
+# scales a pixel can differ from a single in-process resize by one level
+# (exact at integer scales); the result is not bit-identical.
+# The grid screenshot is split by output: one worker encodes the plain
+# frame while another renders and encodes the grid. The main interpreter
+# only waits, so the voice input thread keeps the GIL.
+#
+# Spawned workers import the main script again as __mp_main__; the pool
+# initializer turns tracing off there so workers write no trace files.
+#
+# Frames below IMAGE_POOL_MIN_PIXELS, single-core machines and
+# IMAGE_POOL_ENABLED = False use the in-process path.
+
+# Lanczos filter support in output pixels (Pillow uses a = 3)
+LANCZOS_SUPPORT = 3
+
+# Worker side: the attached block, kept while the main process reuses it
+_worker_block = None
+
+
+def _attach(name):
+    """Worker side: map block `name`, dropping a previously mapped one"""
+    global _worker_block
+    if _worker_block is not None and _worker_block.name == name:
+        return _worker_block
+    if _worker_block is not None:
+        _worker_block.close()
+    # Workers share the main process's resource tracker; the main process unlinks the block
+    block = shared_memory.SharedMemory(name=name)
+    _worker_block = block
+    return block
+
+
+def _frame(descriptor):
+    name, shape = descriptor
+    return np.ndarray(shape, dtype=np.uint8, buffer=_attach(name).buf)
+
+
+def _jpeg(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def _init_worker():
+    tracing.disable()
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _resize_band(descriptor, size, rows):
+    """Worker job: output rows [r0, r1) of a LANCZOS resize of the shared frame to `size`, as raw RGB bytes"""
+    frame = _frame(descriptor)
+    src_h, src_w = frame.shape[:2]
+    dst_w, dst_h = size
+    r0, r1 = rows
+    scale = src_h / dst_h
+    y0, y1 = r0 * scale, r1 * scale
+    margin = LANCZOS_SUPPORT * max(scale, 1.0) + 2
+    top = max(0, int(y0 - margin))
+    bottom = min(src_h, int(math.ceil(y1 + margin)))
+    band = Image.fromarray(frame[top:bottom])
+    resized = band.resize((dst_w, r1 - r0), Image.Resampling.LANCZOS, box=(0, y0 - top, src_w, y1 - top))
+    return resized.tobytes()
+
+
+def _encode_frame(descriptor, quality):
+    """Worker job: JPEG bytes of the shared frame"""
+    return _jpeg(Image.fromarray(_frame(descriptor)), quality)
+
+
+def _render_grid(descriptor, cursor, num_cells, adaptive, quality):
+    """Worker job: render_grid on the shared frame; returns (grid JPEG bytes, grid dict without the image)"""
+    from services.screenshot_module import render_grid
+
+    grid = render_grid(_frame(descriptor), cursor, num_cells, adaptive)
+    annotated = grid.pop('annotated')
+    return _jpeg(Image.fromarray(annotated), quality), grid
+
+
+class ImagePool:
+    """
+    Worker processes plus the shared memory block frames are staged in.
+    Calls are serialized: one frame is in the block at a time.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker)
+        self.block = None
+        self._lock = threading.Lock()
+
+    def _stage(self, frame):
+        """Copy `frame` into the shared block (one full-frame copy per call, growing the block if needed); returns its descriptor"""
+        if isinstance(frame, Image.Image) and frame.mode != 'RGB':
+            frame = frame.convert('RGB')
+        pixels = np.asarray(frame)
+        if self.block is None or self.block.size < pixels.nbytes:
+            if self.block is not None:
+                self.block.close()
+                self.block.unlink()
+            self.block = shared_memory.SharedMemory(create=True, size=pixels.nbytes)
+        staged = np.ndarray(pixels.shape, dtype=np.uint8, buffer=self.block.buf)
+        staged[...] = pixels
+        return self.block.name, pixels.shape
+
+    def resize(self, frame, size):
+        """LANCZOS resize of an RGB frame (PIL image or array) to `size`, split into bands across the workers"""
+        width, height = size
+        bands = max(1, min(self.workers, height // 16))
+        edges = np.linspace(0, height, bands + 1).astype(int)
+        with self._lock, tracing.span('pool_resize', bands=bands):
+            descriptor = self._stage(frame)
+            futures = [self.executor.submit(_resize_band, descriptor, size, (int(edges[i]), int(edges[i + 1])))
+                       for i in range(bands)]
+            data = b''.join(future.result() for future in futures)
+        return Image.frombytes('RGB', size, data)
+
+    def grid_jpegs(self, frame, cursor, num_cells, adaptive, quality=75):
+        """
+        (fullscreen JPEG bytes, grid JPEG bytes, grid dict without 'annotated')
+        for save_screenshot_with_grid, the two images encoded in parallel.
+        """
+        with self._lock, tracing.span('pool_grid'):
+            descriptor = self._stage(frame)
+            fullscreen = self.executor.submit(_encode_frame, descriptor, quality)
+            grid = self.executor.submit(_render_grid, descriptor, tuple(cursor), num_cells, adaptive, quality)
+            grid_jpeg, grid_info = grid.result()
+            return fullscreen.result(), grid_jpeg, grid_info
+
+    def warm_up(self):
+        """Start every worker process now instead of on the first frame"""
+        for future in [self.executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_failed = False
+
+
+def default_workers():
+    """IMAGE_POOL_WORKERS, or one per core but one (at most 4) when it is 0"""
+    if IMAGE_POOL_WORKERS:
+        return IMAGE_POOL_WORKERS
+    return max(0, min(4, (os.cpu_count() or 1) - 1))
+
+
+def get_pool(frame_pixels=None):
+    """
+    The shared pool, or None when the frame (width * height) is too small
+    to be worth the round trip, the pool is disabled or it cannot start.
+    """
+    global _pool, _pool_failed
+    if not IMAGE_POOL_ENABLED or _pool_failed:
+        return None
+    if frame_pixels is not None and frame_pixels < IMAGE_POOL_MIN_PIXELS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            workers = default_workers()
+            if workers < 2:
+                _pool_failed = True
+                return None
+            try:
+                _pool = ImagePool(workers)
+                atexit.register(_pool.close)
+            except Exception as e:
+                print(f"Image worker pool unavailable, processing screenshots in-process: {e}")
+                _pool_failed = True
+                return None
+        return _pool
+
+
+def resize(frame, size):
+    """LANCZOS resize of a PIL image or RGB array, on the pool for large frames"""
+    image = frame if isinstance(frame, Image.Image) else None
+    width, height = image.size if image is not None else (frame.shape[1], frame.shape[0])
+    pool = get_pool(width * height)
+    if pool is not None:
+        try:
+            return pool.resize(frame, size)
+        except Exception as e:
+            print(f"Image worker pool failed, resizing in-process: {e}")
+    if image is None:
+        image = Image.fromarray(frame)
+    return image.resize(size, Image.Resampling.LANCZOS)
@@ -5,6 +5,9 @@ import time
 from PIL import Image
 import io
 
+from services import tracing
+from services import metrics
+
 # Cache for base64 encoded images to avoid repeated encoding
 _base64_cache = {}
 _cache_lock = threading.Lock()
@@ -34,7 +37,7 @@ def convert_to_base64(path):
     
     try:
         # Optimize image before encoding
-        with Image.open(path) as img:
+        with tracing.span('encode', path=path) as sp, metrics.ENCODE_SECONDS.time(), Image.open(path) as img:
             # Use an in-memory buffer instead of temporary files
             buffer = io.BytesIO()
             
@@ -53,6 +56,7 @@ def convert_to_base64(path):
             image_data = buffer.getvalue()
             base64_encoded = base64.b64encode(image_data)
             base64_string = base64_encoded.decode('utf-8')
+            sp.set(jpeg_bytes=len(image_data), base64_bytes=len(base64_string))
             
             # Update cache
             with _cache_lock:
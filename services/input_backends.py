@@ -0,0 +1,536 @@
+import sys
+import threading
+import time
+
+from services import display_state
+from config import INPUT_BACKEND, INPUT_PROFILE
+
+# Timing of synthetic input.
+#   pause                 sleep after every action (pyautogui.PAUSE)
+#   move_duration         tween of cursor moves issued by the model
+#   locate_move_duration  tween of the move to a located element or grid cell
+#   drag_duration         default duration of drag_to
+#   key_interval          pause between typed characters
+# "smooth" is the timing the agent always used; "fast" drops every delay
+# except a short drag, which applications need to see intermediate motion.
+TIMING_PROFILES = {
+    'smooth': {'pause': 0.1, 'move_duration': 0.1, 'locate_move_duration': 0.5,
+               'drag_duration': 0.5, 'key_interval': 0.0},
+    'fast': {'pause': 0.0, 'move_duration': 0.0, 'locate_move_duration': 0.0,
+             'drag_duration': 0.1, 'key_interval': 0.0},
+}
+
+# Motion events per second for tweened moves and drags
+MOTION_RATE = 100
+
+
+class InputBackend:
+    """
+    Injects mouse and keyboard input. Buttons are 'left', 'middle' and
+    'right'; keys use pyautogui names ('enter', 'ctrl', 'f5', 'a', ...).
+    scroll() takes wheel clicks, positive scrolls up. Backends import their
+    dependencies in __init__, so importing this module is cheap.
+    """
+    name = None
+
+    def __init__(self, profile=INPUT_PROFILE):
+        self.profile = profile if isinstance(profile, str) else 'custom'
+        self.timing = dict(TIMING_PROFILES[profile] if isinstance(profile, str) else profile)
+
+    def position(self):
+        return display_state.get_cursor_position()
+
+    def move_to(self, x, y, duration=None):
+        raise NotImplementedError
+
+    def mouse_down(self, button='left'):
+        raise NotImplementedError
+
+    def mouse_up(self, button='left'):
+        raise NotImplementedError
+
+    def click(self, button='left', clicks=1):
+        raise NotImplementedError
+
+    def drag_to(self, x, y, button='left', duration=None):
+        raise NotImplementedError
+
+    def scroll(self, clicks):
+        raise NotImplementedError
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def hotkey(self, *keys):
+        raise NotImplementedError
+
+    def type_text(self, text):
+        raise NotImplementedError
+
+    def describe(self):
+        return f"{self.name} ({self.profile})"
+
+
+class PyAutoGuiBackend(InputBackend):
+    """
+    pyautogui, with PAUSE and the tweens taken from the timing profile.
+
+    ASCII text is typed key by key; pyautogui cannot type other characters
+    on X11, so those go through the clipboard. The previous clipboard
+    content is restored shortly after the paste, and a paste that comes
+    before the restore keeps the original content for it instead of saving
+    the pasted text as "original".
+    """
+    name = 'pyautogui'
+
+    # Time the target application gets to read the clipboard before it is restored
+    CLIPBOARD_RESTORE_DELAY = 0.2
+
+    def __init__(self, profile=INPUT_PROFILE):
+        super().__init__(profile)
+        import pyautogui
+        self.pyautogui = pyautogui
+        pyautogui.PAUSE = self.timing['pause']
+        pyautogui.FAILSAFE = False
+        self._clipboard_lock = threading.Lock()
+        self._clipboard_original = None
+        self._clipboard_timer = None
+
+    def move_to(self, x, y, duration=None):
+        self.pyautogui.moveTo(x, y, duration=self.timing['move_duration'] if duration is None else duration)
+
+    def mouse_down(self, button='left'):
+        self.pyautogui.mouseDown(button=button)
+
+    def mouse_up(self, button='left'):
+        self.pyautogui.mouseUp(button=button)
+
+    def click(self, button='left', clicks=1):
+        self.pyautogui.click(button=button, clicks=clicks)
+
+    def drag_to(self, x, y, button='left', duration=None):
+        self.pyautogui.dragTo(x, y, button=button,
+                              duration=self.timing['drag_duration'] if duration is None else duration)
+
+    def scroll(self, clicks):
+        self.pyautogui.scroll(clicks)
+
+    def press(self, key):
+        self.pyautogui.press(key)
+
+    def hotkey(self, *keys):
+        self.pyautogui.hotkey(*keys)
+
+    def type_text(self, text):
+        if text.isascii() and all(c.isprintable() or c in '\n\t' for c in text):
+            self.pyautogui.write(text, interval=self.timing['key_interval'])
+        else:
+            self._paste(text)
+
+    def _paste(self, text):
+        import pyperclip
+        with self._clipboard_lock:
+            if self._clipboard_timer is not None:
+                # A restore is still pending: the clipboard holds our previous paste
+                self._clipboard_timer.cancel()
+            else:
+                self._clipboard_original = pyperclip.paste()
+            pyperclip.copy(text)
+            self.pyautogui.hotkey('ctrl', 'v')
+            self._clipboard_timer = threading.Timer(self.CLIPBOARD_RESTORE_DELAY, self._restore_clipboard)
+            self._clipboard_timer.daemon = True
+            self._clipboard_timer.start()
+
+    def _restore_clipboard(self):
+        import pyperclip
+        with self._clipboard_lock:
+            pyperclip.copy(self._clipboard_original)
+            self._clipboard_original = None
+            self._clipboard_timer = None
+
+
+# pyautogui key names that differ from X keysym names
+X_KEY_NAMES = {
+    'enter': 'Return', 'return': 'Return', '\n': 'Return', 'esc': 'Escape', 'escape': 'Escape',
+    'tab': 'Tab', '\t': 'Tab', 'backspace': 'BackSpace', 'delete': 'Delete', 'del': 'Delete',
+    'insert': 'Insert', 'space': 'space', ' ': 'space', 'home': 'Home', 'end': 'End',
+    'pageup': 'Prior', 'pgup': 'Prior', 'pagedown': 'Next', 'pgdn': 'Next',
+    'up': 'Up', 'down': 'Down', 'left': 'Left', 'right': 'Right',
+    'ctrl': 'Control_L', 'ctrlleft': 'Control_L', 'ctrlright': 'Control_R',
+    'shift': 'Shift_L', 'shiftleft': 'Shift_L', 'shiftright': 'Shift_R',
+    'alt': 'Alt_L', 'altleft': 'Alt_L', 'altright': 'Alt_R',
+    'win': 'Super_L', 'winleft': 'Super_L', 'winright': 'Super_R', 'super': 'Super_L',
+    'command': 'Super_L', 'capslock': 'Caps_Lock', 'numlock': 'Num_Lock', 'scrolllock': 'Scroll_Lock',
+    'printscreen': 'Print', 'prtsc': 'Print', 'pause': 'Pause', 'apps': 'Menu', 'menu': 'Menu',
+    'volumeup': 'XF86AudioRaiseVolume', 'volumedown': 'XF86AudioLowerVolume', 'volumemute': 'XF86AudioMute',
+}
+
+X_BUTTONS = {'left': 1, 'middle': 2, 'right': 3}
+
+
+class XTestBackend(InputBackend):
+    """
+    Events sent straight to the X server with the XTEST extension
+    (python-xlib): no per-call pause, one round trip per action.
+
+    Text is typed key by key without the clipboard. Characters missing from
+    the current keyboard layout (Cyrillic on a US layout, symbols) are typed
+    by mapping their keysyms onto spare keycodes, the way xdotool does.
+    Clients read a changed mapping only after they have handled its
+    MappingNotify, so the spare keycodes are remapped in batches, with
+    REMAP_SETTLE seconds before a batch (keys typed with the old mapping are
+    translated first) and after it (clients pick up the new one).
+    """
+    name = 'xtest'
+
+    # Time clients get to handle a keyboard mapping change on either side of it
+    REMAP_SETTLE = 0.05
+    # Spare keycodes remapped at once
+    MAX_SCRATCH_KEYCODES = 16
+
+    def __init__(self, profile=INPUT_PROFILE, display=None):
+        super().__init__(profile)
+        from Xlib import X, XK
+        from Xlib import display as xdisplay
+        from Xlib.ext import xtest
+        self.X, self.XK, self.xtest = X, XK, xtest
+        self.display = xdisplay.Display(display)
+        if not self.display.has_extension('XTEST'):
+            self.display.close()
+            raise RuntimeError("X server has no XTEST extension")
+        self._lock = threading.Lock()
+        self._scratch_keycodes = self._find_scratch_keycodes()
+        # Keysym currently mapped on each spare keycode (0 = none)
+        self._scratch_keysyms = [0] * len(self._scratch_keycodes)
+        # A remapped key was sent since the last settle wait
+        self._scratch_used = False
+        self._shift = self.display.keysym_to_keycode(XK.string_to_keysym('Shift_L'))
+
+    def position(self):
+        with self._lock:
+            pointer = self.display.screen().root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+    def _find_scratch_keycodes(self):
+        """The longest run of consecutive unmapped keycodes (at most MAX_SCRATCH_KEYCODES)"""
+        first = self.display.display.info.min_keycode
+        count = self.display.display.info.max_keycode - first + 1
+        mapping = self.display.get_keyboard_mapping(first, count)
+        best, run = [], []
+        for offset in range(count - 1, -1, -1):
+            if any(mapping[offset]):
+                run = []
+                continue
+            run.insert(0, first + offset)
+            if len(run) > len(best):
+                best = list(run)
+        return best[-self.MAX_SCRATCH_KEYCODES:]
+
+    def _pause(self):
+        if self.timing['pause']:
+            time.sleep(self.timing['pause'])
+
+    def _motion(self, x, y):
+        self.xtest.fake_input(self.display, self.X.MotionNotify, x=int(x), y=int(y))
+
+    def _glide(self, x, y, duration):
+        """Motion to (x, y) in MOTION_RATE steps per second; the lock must be held"""
+        if duration and duration > 0:
+            pointer = self.display.screen().root.query_pointer()
+            start_x, start_y = pointer.root_x, pointer.root_y
+            steps = max(1, int(duration * MOTION_RATE))
+            for step in range(1, steps):
+                self._motion(start_x + (x - start_x) * step / steps, start_y + (y - start_y) * step / steps)
+                self.display.sync()
+                time.sleep(duration / steps)
+        self._motion(x, y)
+        self.display.sync()
+
+    def move_to(self, x, y, duration=None):
+        with self._lock:
+            self._glide(x, y, self.timing['move_duration'] if duration is None else duration)
+        self._pause()
+
+    def _button(self, button, pressed):
+        event = self.X.ButtonPress if pressed else self.X.ButtonRelease
+        self.xtest.fake_input(self.display, event, X_BUTTONS[button])
+
+    def mouse_down(self, button='left'):
+        with self._lock:
+            self._button(button, True)
+            self.display.sync()
+        self._pause()
+
+    def mouse_up(self, button='left'):
+        with self._lock:
+            self._button(button, False)
+            self.display.sync()
+        self._pause()
+
+    def click(self, button='left', clicks=1):
+        with self._lock:
+            for _ in range(clicks):
+                self._button(button, True)
+                self._button(button, False)
+            self.display.sync()
+        self._pause()
+
+    def drag_to(self, x, y, button='left', duration=None):
+        with self._lock:
+            self._button(button, True)
+            self.display.sync()
+            self._glide(x, y, self.timing['drag_duration'] if duration is None else duration)
+            self._button(button, False)
+            self.display.sync()
+        self._pause()
+
+    def scroll(self, clicks):
+        # Wheel up and down are buttons 4 and 5
+        button = 4 if clicks > 0 else 5
+        with self._lock:
+            for _ in range(abs(int(clicks))):
+                self.xtest.fake_input(self.display, self.X.ButtonPress, button)
+                self.xtest.fake_input(self.display, self.X.ButtonRelease, button)
+            self.display.sync()
+        self._pause()
+
+    def _key_keysym(self, key):
+        name = X_KEY_NAMES.get(key.lower() if len(key) > 1 else key)
+        if name is not None:
+            return self.XK.string_to_keysym(name)
+        if len(key) == 1:
+            return self._char_keysym(key)
+        # Function keys are 'f5' in pyautogui and 'F5' in X
+        keysym = self.XK.string_to_keysym(key) or self.XK.string_to_keysym(key.capitalize())
+        if not keysym:
+            raise ValueError(f"Unknown key: {key}")
+        return keysym
+
+    @staticmethod
+    def _char_keysym(char):
+        code = ord(char)
+        # Latin-1 keysyms equal the code point, everything else uses the Unicode keysym range
+        if 0x20 <= code <= 0x7e or 0xa0 <= code <= 0xff:
+            return code
+        return 0x01000000 | code
+
+    def _layout_keycode(self, keysym):
+        """(keycode, needs shift) of a keysym in the keyboard layout, or None"""
+        best = None
+        for keycode, index in self.display.keysym_to_keycodes(keysym):
+            if index <= 1 and keycode not in self._scratch_keycodes and (best is None or index < best[1]):
+                best = (keycode, index)
+        return (best[0], best[1] == 1) if best is not None else None
+
+    def _settle(self):
+        """Let clients translate the remapped keys sent so far before the mapping changes"""
+        if self._scratch_used:
+            self.display.sync()
+            time.sleep(self.REMAP_SETTLE)
+            self._scratch_used = False
+
+    def _keycodes(self, keysyms):
+        """
+        {keysym: (keycode, needs shift)} for `keysyms`; the ones missing from
+        the layout are mapped onto spare keycodes in one change. The lock
+        must be held.
+        """
+        codes = {}
+        missing = []
+        for keysym in dict.fromkeys(keysyms):
+            found = self._layout_keycode(keysym)
+            if found is None and keysym in self._scratch_keysyms:
+                found = (self._scratch_keycodes[self._scratch_keysyms.index(keysym)], False)
+            if found is None:
+                missing.append(keysym)
+            else:
+                codes[keysym] = found
+        if not missing:
+            return codes
+        free = [slot for slot, mapped in enumerate(self._scratch_keysyms) if mapped not in codes]
+        if len(missing) > len(free):
+            raise ValueError(f"Keysyms {', '.join(f'{k:#x}' for k in missing)} are not on the keyboard "
+                             f"and there are {len(free)} spare keycodes")
+        self._settle()
+        for keysym, slot in zip(missing, free):
+            self._scratch_keysyms[slot] = keysym
+            codes[keysym] = (self._scratch_keycodes[slot], False)
+        self.display.change_keyboard_mapping(self._scratch_keycodes[0], [(k, k) for k in self._scratch_keysyms])
+        self.display.sync()
+        time.sleep(self.REMAP_SETTLE)
+        return codes
+
+    def _tap(self, keycode, shift):
+        if shift:
+            self.xtest.fake_input(self.display, self.X.KeyPress, self._shift)
+        self.xtest.fake_input(self.display, self.X.KeyPress, keycode)
+        self.xtest.fake_input(self.display, self.X.KeyRelease, keycode)
+        if shift:
+            self.xtest.fake_input(self.display, self.X.KeyRelease, self._shift)
+        if keycode in self._scratch_keycodes:
+            self._scratch_used = True
+
+    def _release_scratch(self):
+        if any(self._scratch_keysyms):
+            self._settle()
+            self._scratch_keysyms = [0] * len(self._scratch_keycodes)
+            self.display.change_keyboard_mapping(self._scratch_keycodes[0], [(0, 0)] * len(self._scratch_keycodes))
+
+    def press(self, key):
+        keysym = self._key_keysym(key)
+        with self._lock:
+            self._tap(*self._keycodes([keysym])[keysym])
+            self._release_scratch()
+            self.display.sync()
+        self._pause()
+
+    def hotkey(self, *keys):
+        keysyms = [self._key_keysym(key) for key in keys]
+        with self._lock:
+            codes = self._keycodes(keysyms)
+            keycodes = [codes[keysym][0] for keysym in keysyms]
+            # A key that sits on the shifted level ('+', '?') needs Shift held with the combination
+            if any(codes[keysym][1] for keysym in keysyms) and self._shift not in keycodes:
+                keycodes.insert(0, self._shift)
+            for keycode in keycodes:
+                self.xtest.fake_input(self.display, self.X.KeyPress, keycode)
+            for keycode in reversed(keycodes):
+                self.xtest.fake_input(self.display, self.X.KeyRelease, keycode)
+            if any(keycode in self._scratch_keycodes for keycode in keycodes):
+                self._scratch_used = True
+            self._release_scratch()
+            self.display.sync()
+        self._pause()
+
+    def _batches(self, keysyms):
+        """Split `keysyms` into runs whose keys missing from the layout fit on the spare keycodes"""
+        start = 0
+        while start < len(keysyms):
+            end, missing = start, set()
+            while end < len(keysyms):
+                keysym = keysyms[end]
+                if keysym not in missing and self._layout_keycode(keysym) is None:
+                    if len(missing) == len(self._scratch_keycodes):
+                        break
+                    missing.add(keysym)
+                end += 1
+            if end == start:
+                raise ValueError(f"Keysym {keysyms[start]:#x} is not on the keyboard and there is no spare keycode")
+            yield keysyms[start:end]
+            start = end
+
+    def type_text(self, text):
+        interval = self.timing['key_interval']
+        keysyms = [self.XK.string_to_keysym(X_KEY_NAMES[char]) if char in '\n\t' else self._char_keysym(char)
+                   for char in text]
+        with self._lock:
+            for batch in self._batches(keysyms):
+                codes = self._keycodes(batch)
+                for keysym in batch:
+                    self._tap(*codes[keysym])
+                    if interval:
+                        self.display.sync()
+                        time.sleep(interval)
+            self._release_scratch()
+            self.display.sync()
+        self._pause()
+
+
+class RecordingBackend(InputBackend):
+    """
+    Records actions instead of sending them, for tests and dry runs.
+
+    `actions` holds (action, args) tuples in call order; the cursor position
+    is tracked from the recorded moves and drags.
+    """
+    name = 'recording'
+
+    def __init__(self, profile=INPUT_PROFILE, start=(0, 0)):
+        super().__init__(profile)
+        self.actions = []
+        self._position = tuple(start)
+        self._lock = threading.Lock()
+
+    def _record(self, action, *args):
+        with self._lock:
+            self.actions.append((action, args))
+
+    def position(self):
+        return self._position
+
+    def move_to(self, x, y, duration=None):
+        self._position = (x, y)
+        self._record('move_to', x, y)
+
+    def mouse_down(self, button='left'):
+        self._record('mouse_down', button)
+
+    def mouse_up(self, button='left'):
+        self._record('mouse_up', button)
+
+    def click(self, button='left', clicks=1):
+        self._record('click', button, clicks)
+
+    def drag_to(self, x, y, button='left', duration=None):
+        self._position = (x, y)
+        self._record('drag_to', x, y, button)
+
+    def scroll(self, clicks):
+        self._record('scroll', clicks)
+
+    def press(self, key):
+        self._record('press', key)
+
+    def hotkey(self, *keys):
+        self._record('hotkey', *keys)
+
+    def type_text(self, text):
+        self._record('type_text', text)
+
+    def clear(self):
+        with self._lock:
+            self.actions = []
+
+
+BACKENDS = {
+    'pyautogui': PyAutoGuiBackend,
+    'xtest': XTestBackend,
+    'recording': RecordingBackend,
+}
+
+
+def create_backend(name=INPUT_BACKEND, profile=INPUT_PROFILE):
+    """
+    Backend by name; 'auto' takes XTest on Linux when the X server supports
+    it and pyautogui otherwise.
+    """
+    if name == 'auto':
+        if sys.platform.startswith('linux'):
+            try:
+                return XTestBackend(profile)
+            except Exception as e:
+                print(f"XTest input unavailable, using pyautogui: {e}")
+        return PyAutoGuiBackend(profile)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown input backend '{name}', expected one of: auto, {', '.join(BACKENDS)}")
+    return BACKENDS[name](profile)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The input backend in use, created from INPUT_BACKEND/INPUT_PROFILE on first use"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+
+def set_input_backend(backend):
+    """Send all input through `backend` (None goes back to the configured one)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -1,34 +1,22 @@
-import pyautogui
-import pyperclip
-import threading
-import time
+from services.input_backends import get_backend
 
 # Press keyboard key
 def press_key(key):
-    pyautogui.press(key)
+    get_backend().press(key)
     return True
 
 
 # Press key combination
 def press_hotkey(*keys):
-    pyautogui.hotkey(*keys)
+    get_backend().hotkey(*keys)
     return True
 
 
-# Type text
+# Type text (the backend decides how: key by key, or via the clipboard where it must)
 def type_text(text):
-    original_clipboard = pyperclip.paste()
     try:
-        pyperclip.copy(text)
-        pyautogui.hotkey('ctrl', 'v')  # Paste the text
+        get_backend().type_text(text)
         return True
     except Exception as e:
         print(f"Error typing text: {e}")
         return False
-    finally:
-        # Restore clipboard asynchronously
-        def restore_clipboard():
-            time.sleep(0.2)  # Small delay to ensure paste completes
-            pyperclip.copy(original_clipboard)
-        
-        threading.Thread(target=restore_clipboard, daemon=True).start()
\ No newline at end of file
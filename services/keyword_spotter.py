@@ -0,0 +1,274 @@
+"""
+Always-on keyword spotting for the control commands (stop / pause / continue).
+
+Whisper only sees an utterance after the VAD has closed it, and main.py
+only reads transcriptions between iterations, so "стоп" used to take an
+ASR pass plus the rest of the current step. The spotter instead matches
+log-mel features of the live stream against a few enrolled recordings of
+each command with streaming subsequence DTW and fires as soon as the end
+of a command has been heard.
+
+Templates live in KWS_TEMPLATE_DIR as <action>.npz, one array per take:
+
+    python -m services.keyword_spotter --enroll stop --word стоп --takes 3
+    python -m services.keyword_spotter --enroll pause --wav pause1.wav pause2.wav
+    python -m services.keyword_spotter --list
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from config import KWS_KEYWORDS, KWS_TEMPLATE_DIR, KWS_THRESHOLD
+
+SAMPLE_RATE = 16000
+
+
+def mel_filterbank(sample_rate=SAMPLE_RATE, n_fft=512, n_mels=26, fmin=80.0, fmax=4000.0):
+    """Triangular mel filters as an (n_mels, n_fft // 2 + 1) matrix"""
+    to_mel = lambda hz: 2595.0 * np.log10(1.0 + hz / 700.0)
+    to_hz = lambda mel: 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+    points = to_hz(np.linspace(to_mel(fmin), to_mel(fmax), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    filters = np.zeros((n_mels, bins.shape[0]), dtype=np.float32)
+    for m in range(n_mels):
+        left, center, right = points[m], points[m + 1], points[m + 2]
+        rising = (bins - left) / (center - left)
+        falling = (right - bins) / (right - center)
+        filters[m] = np.maximum(0.0, np.minimum(rising, falling))
+    return filters
+
+
+class FeatureExtractor:
+    """
+    Streaming log-mel features: 25 ms windows every 10 ms.
+
+    push() accepts blocks of any length and returns the features and mean
+    absolute levels of the frames completed by that block.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, win_ms=25, hop_ms=10, n_mels=26):
+        self.win = int(sample_rate * win_ms / 1000)
+        self.hop = int(sample_rate * hop_ms / 1000)
+        self.n_fft = 1 << (self.win - 1).bit_length()
+        self._window = np.hamming(self.win).astype(np.float32)
+        self._filters = mel_filterbank(sample_rate, self.n_fft, n_mels)
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def reset(self):
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def push(self, samples):
+        data = np.concatenate((self._pending, np.asarray(samples, dtype=np.float32)))
+        count = 0 if data.shape[0] < self.win else 1 + (data.shape[0] - self.win) // self.hop
+        self._pending = data[count * self.hop:]
+        if count == 0:
+            return np.zeros((0, self._filters.shape[0]), dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+        frames = np.lib.stride_tricks.as_strided(
+            data, shape=(count, self.win), strides=(data.strides[0] * self.hop, data.strides[0]))
+        levels = np.mean(np.abs(frames), axis=1)
+        power = np.abs(np.fft.rfft(frames * self._window, n=self.n_fft, axis=1)) ** 2
+        features = np.log(power @ self._filters.T + 1e-8).astype(np.float32)
+        return features, levels
+
+
+def utterance_features(audio, sample_rate=SAMPLE_RATE, trim_db=30.0):
+    """Log-mel features of a recorded keyword with leading and trailing silence trimmed"""
+    features, levels = FeatureExtractor(sample_rate).push(audio)
+    if features.shape[0] == 0:
+        return features
+    # Keep frames within trim_db of the loudest one
+    level_db = 20.0 * np.log10(levels + 1e-9)
+    voiced = np.flatnonzero(level_db > level_db.max() - trim_db)
+    return features[voiced[0]:voiced[-1] + 1]
+
+
+def _normalize(features):
+    """
+    Remove the per-frame mean (overall level) and scale to unit length, so the
+    dot product of two frames is the cosine similarity of their spectral shapes
+    """
+    centered = features - features.mean(axis=-1, keepdims=True)
+    return centered / np.maximum(np.linalg.norm(centered, axis=-1, keepdims=True), 1e-9)
+
+
+class _TemplateMatcher:
+    """
+    Streaming subsequence DTW of one template against the query stream.
+
+    Each query frame advances the path by 0, 1 or 2 template frames (so a
+    command may be spoken between half and twice the template speed, and
+    the recursion over a column is fully vectorized). A path may start at
+    any query frame; its score is the mean cosine distance along the path.
+    """
+
+    def __init__(self, action, template):
+        self.action = action
+        self.template = _normalize(template)
+        self.length = template.shape[0]
+        self.reset()
+
+    def reset(self):
+        self.cost = np.full(self.length, np.inf)
+        self.steps = np.zeros(self.length)
+
+    def step(self, frame, silent):
+        distance = np.ones(self.length) if silent else 1.0 - self.template @ frame
+
+        cost = np.full((3, self.length), np.inf)
+        steps = np.zeros((3, self.length))
+        cost[0], steps[0] = self.cost, self.steps
+        cost[1, 1:], steps[1, 1:] = self.cost[:-1], self.steps[:-1]
+        cost[2, 2:], steps[2, 2:] = self.cost[:-2], self.steps[:-2]
+
+        mean = (cost + distance) / (steps + 1)
+        best = np.argmin(mean, axis=0)
+        columns = np.arange(self.length)
+        self.cost = cost[best, columns] + distance
+        self.steps = steps[best, columns] + 1
+        # A new path can start at every frame
+        if distance[0] < self.cost[0] / self.steps[0]:
+            self.cost[0], self.steps[0] = distance[0], 1
+
+        return self.cost[-1] / self.steps[-1]
+
+
+class KeywordSpotter:
+    """
+    Matches the audio stream against enrolled templates.
+
+    templates: {action: [features, ...]} as produced by utterance_features().
+    feed() takes any block of samples at an absolute position and returns
+    (action, score, end_pos) detections. A score below `threshold` is only
+    reported once it has stopped improving for `confirm_ms` (so the best
+    matching action and alignment win), after which all matchers are reset
+    and nothing fires for `refractory_ms`.
+    """
+
+    def __init__(self, templates, sample_rate=SAMPLE_RATE, threshold=KWS_THRESHOLD,
+                 min_level=0.005, confirm_ms=50, refractory_ms=1000):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.min_level = min_level
+        self.confirm = int(sample_rate * confirm_ms / 1000)
+        self.refractory = int(sample_rate * refractory_ms / 1000)
+        self.extractor = FeatureExtractor(sample_rate)
+        self.matchers = [_TemplateMatcher(action, template)
+                         for action, takes in templates.items() for template in takes]
+        self.reset()
+
+    def reset(self):
+        self.extractor.reset()
+        self.next_frame_end = None
+        self.quiet_until = 0
+        self.candidate = None
+        for matcher in self.matchers:
+            matcher.reset()
+
+    def feed(self, samples, start_pos):
+        if self.next_frame_end is None:
+            self.next_frame_end = start_pos + self.extractor.win
+        features, levels = self.extractor.push(samples)
+        detections = []
+        for i in range(features.shape[0]):
+            frame_end = self.next_frame_end
+            self.next_frame_end += self.extractor.hop
+
+            frame = _normalize(features[i])
+            silent = levels[i] < self.min_level
+
+            best_action, best_score = None, np.inf
+            for matcher in self.matchers:
+                score = matcher.step(frame, silent)
+                if score < best_score:
+                    best_action, best_score = matcher.action, score
+
+            if frame_end < self.quiet_until:
+                continue
+            if best_score < self.threshold and (self.candidate is None or best_score < self.candidate[1]):
+                self.candidate = (best_action, float(best_score), frame_end)
+            elif self.candidate is not None and frame_end - self.candidate[2] >= self.confirm:
+                detections.append(self.candidate)
+                self.quiet_until = frame_end + self.refractory
+                self.candidate = None
+                for matcher in self.matchers:
+                    matcher.reset()
+        return detections
+
+
+def template_path(action, directory=KWS_TEMPLATE_DIR):
+    return os.path.join(directory, f"{action}.npz")
+
+
+def load_templates(directory=KWS_TEMPLATE_DIR):
+    """Returns {action: [features, ...]} for every enrolled action in KWS_KEYWORDS"""
+    templates = {}
+    for action in KWS_KEYWORDS:
+        path = template_path(action, directory)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                templates[action] = [data[key] for key in sorted(data.files)]
+    return templates
+
+
+def save_templates(action, takes, directory=KWS_TEMPLATE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = template_path(action, directory)
+    np.savez(path, **{f"take{i}": features for i, features in enumerate(takes)})
+    return path
+
+
+def record_take(seconds, sample_rate=SAMPLE_RATE):
+    import sounddevice as sd
+    audio = sd.rec(int(seconds * sample_rate), samplerate=sample_rate, channels=1, dtype='float32')
+    sd.wait()
+    return audio[:, 0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enroll keyword templates for the voice control commands")
+    parser.add_argument('--enroll', choices=sorted(KWS_KEYWORDS), help="Action to record templates for")
+    parser.add_argument('--word', default=None, help="Word to say (default: the first word for the action)")
+    parser.add_argument('--takes', type=int, default=3, help="Number of recordings from the microphone")
+    parser.add_argument('--seconds', type=float, default=1.5, help="Length of each recording")
+    parser.add_argument('--wav', nargs='*', default=None, help="Enroll from WAV files instead of the microphone")
+    parser.add_argument('--append', action='store_true', help="Add to existing templates instead of replacing them")
+    parser.add_argument('--dir', default=KWS_TEMPLATE_DIR, help="Template directory")
+    parser.add_argument('--list', action='store_true', help="Show enrolled templates")
+    args = parser.parse_args(argv)
+
+    if args.list or not args.enroll:
+        templates = load_templates(args.dir)
+        for action, words in KWS_KEYWORDS.items():
+            takes = templates.get(action, [])
+            lengths = ', '.join(f"{t.shape[0] * 10} ms" for t in takes) or 'not enrolled'
+            print(f"{action:<10} {'/'.join(words):<32} {lengths}")
+        return 0
+
+    takes = load_templates(args.dir).get(args.enroll, []) if args.append else []
+    if args.wav:
+        from services.audio_files import load_wav
+        for path in args.wav:
+            takes.append(utterance_features(load_wav(path, SAMPLE_RATE)))
+    else:
+        word = args.word or KWS_KEYWORDS[args.enroll][0]
+        for take in range(args.takes):
+            input(f"[{take + 1}/{args.takes}] Press Enter and say '{word}'")
+            time.sleep(0.1)
+            features = utterance_features(record_take(args.seconds))
+            print(f"  recorded {features.shape[0] * 10} ms of speech")
+            takes.append(features)
+
+    takes = [t for t in takes if t.shape[0] >= 10]
+    if not takes:
+        print("No usable recordings (each take needs at least 100 ms of speech)")
+        return 1
+    print(f"Saved {len(takes)} templates to {save_templates(args.enroll, takes, args.dir)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
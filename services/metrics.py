@@ -0,0 +1,256 @@
+import bisect
+import collections
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Process-wide metrics registry.
+#
+# Metrics are updated from any thread (each metric has its own lock) and
+# exported in the Prometheus text format by a small HTTP server started with
+# start_server(port). Histograms additionally keep a window of recent
+# observations for the p50/p95 readout in the status overlay.
+
+_registry = []
+_registry_lock = threading.Lock()
+_server = None
+
+
+def _register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter; also remembers recent increments for rate_per_minute()"""
+
+    def __init__(self, name, help, window=300.0):
+        self.name = name
+        self.help = help
+        self.window = window
+        self._value = 0
+        self._recent = collections.deque()
+        self._lock = threading.Lock()
+        _register(self)
+
+    def inc(self, amount=1):
+        now = time.time()
+        with self._lock:
+            self._value += amount
+            self._recent.append((now, amount))
+            while self._recent and now - self._recent[0][0] > self.window:
+                self._recent.popleft()
+
+    def value(self):
+        with self._lock:
+            return self._value
+
+    def rate_per_minute(self):
+        """Increments per minute over the last `window` seconds (or since the first one)"""
+        now = time.time()
+        with self._lock:
+            recent = [(t, a) for t, a in self._recent if now - t <= self.window]
+        if len(recent) < 2:
+            return 0.0
+        span = now - recent[0][0]
+        return sum(a for _, a in recent) * 60.0 / span if span > 0 else 0.0
+
+    def export(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter",
+                f"{self.name} {_format_value(self.value())}"]
+
+
+class Gauge:
+    """Current value, either set explicitly or read from `fn` at export time"""
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self._value = 0.0
+        self._lock = threading.Lock()
+        _register(self)
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def value(self):
+        if self.fn is not None:
+            return self.fn()
+        with self._lock:
+            return self._value
+
+    def export(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(float(self.value()))}"]
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram:
+    """Cumulative buckets, sum and count, plus a window of recent observations for quantiles"""
+
+    def __init__(self, name, help, buckets, window=500):
+        self.name = name
+        self.help = help
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._recent = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        _register(self)
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+            self._recent.append(value)
+
+    def time(self):
+        """Context manager observing the duration of the block in seconds"""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """q-quantile of the recent observations, None before the first one"""
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(q * len(recent)))]
+
+    def snapshot(self):
+        """count, sum, p50 and p95 as a dict (for results files)"""
+        with self._lock:
+            count, total = self._count, self._sum
+        return {'count': count, 'sum': total, 'p50': self.quantile(0.5), 'p95': self.quantile(0.95)}
+
+    def export(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + [float('inf')], counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{_format_value(float(bound))}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format_value(float(total))}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+BYTES_BUCKETS = [16e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6]
+RTF_BUCKETS = [0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 2.0, 5.0]
+
+LLM_SECONDS = Histogram('agent_llm_seconds', 'LLM completion latency', LATENCY_BUCKETS)
+LLM_ERRORS = Counter('agent_llm_errors_total', 'Failed LLM calls')
+LLM_REQUEST_BYTES = Histogram('agent_llm_request_bytes', 'Approximate LLM request size (text and base64 images)',
+                              BYTES_BUCKETS)
+LOCATE_SECONDS = Histogram('agent_locate_seconds', 'UI element locate latency (OCR or grid screenshot and LLM)',
+                           LATENCY_BUCKETS)
+LOCATE_LLM_SECONDS = Histogram('agent_locate_llm_seconds', 'UI element locate latency on the grid LLM path',
+                               LATENCY_BUCKETS)
+OCR_LOCATE_SECONDS = Histogram('agent_ocr_locate_seconds', 'OCR index refresh and label match latency',
+                               LATENCY_BUCKETS)
+OCR_HITS = Counter('agent_ocr_hits_total', 'Quoted labels located by OCR without an LLM call')
+OCR_MISSES = Counter('agent_ocr_misses_total', 'Quoted labels OCR could not resolve (grid LLM path used)')
+ATSPI_HITS = Counter('agent_atspi_hits_total', 'Elements located in the accessibility tree')
+ATSPI_MISSES = Counter('agent_atspi_misses_total', 'Element lookups the accessibility tree could not resolve')
+CAPTURE_SECONDS = Histogram('agent_capture_seconds', 'Screen capture time', LATENCY_BUCKETS)
+ENCODE_SECONDS = Histogram('agent_encode_seconds', 'Screenshot JPEG/base64 encode time', LATENCY_BUCKETS)
+VOICE_RTF = Histogram('agent_voice_rtf', 'Speech recognition real-time factor', RTF_BUCKETS)
+ITERATIONS = Counter('agent_iterations_total', 'Completed agent iterations')
+ITERATIONS_PER_MINUTE = Gauge('agent_iterations_per_minute', 'Iterations per minute over the last 5 minutes',
+                              fn=ITERATIONS.rate_per_minute)
+
+
+def export_text():
+    """All metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.export())
+    return "\n".join(lines) + "\n"
+
+
+def readout():
+    """Compact p50/p95 summary of the key numbers for the status overlay"""
+    def seconds(histogram, label):
+        p50, p95 = histogram.quantile(0.5), histogram.quantile(0.95)
+        if p50 is None:
+            return f"{label} -"
+        return f"{label} {p50:.2f}/{p95:.2f}s"
+
+    parts = [seconds(LLM_SECONDS, "LLM"), seconds(LOCATE_SECONDS, "locate")]
+    ocr_hits, ocr_misses = OCR_HITS.value(), OCR_MISSES.value()
+    if ocr_hits + ocr_misses:
+        parts.append(f"OCR {ocr_hits}/{ocr_hits + ocr_misses}")
+    atspi_hits, atspi_misses = ATSPI_HITS.value(), ATSPI_MISSES.value()
+    if atspi_hits + atspi_misses:
+        parts.append(f"a11y {atspi_hits}/{atspi_hits + atspi_misses}")
+    capture, encode = CAPTURE_SECONDS.quantile(0.5), ENCODE_SECONDS.quantile(0.5)
+    if capture is not None or encode is not None:
+        ms = lambda value: '-' if value is None else f"{value * 1000:.0f}"
+        parts.append(f"cap/enc {ms(capture)}/{ms(encode)}ms")
+    rtf = VOICE_RTF.quantile(0.5)
+    if rtf is not None:
+        parts.append(f"RTF {rtf:.2f}")
+    parts.append(f"{ITERATIONS.rate_per_minute():.1f} it/min")
+    return " · ".join(parts)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = export_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the agent's console
+        pass
+
+
+def start_server(port, host='127.0.0.1'):
+    """Serve /metrics on host:port from a daemon thread; returns the server"""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True, name='metrics-http').start()
+    return _server
+
+
+def stop_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
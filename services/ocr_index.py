@@ -0,0 +1,243 @@
+import difflib
+import re
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from services import tracing
+from services import metrics
+from services.frame_diff import changed_regions
+from config import OCR_LANGUAGES, OCR_UPSCALE, OCR_MIN_CONFIDENCE, OCR_MATCH_THRESHOLD
+
+# Local OCR index of the screen for locating text-labelled elements.
+#
+# Element descriptions often quote the visible label ("blue button with text
+# 'Download'"). The index holds the words tesseract reads on the current
+# frame with their boxes; a quoted label is fuzzy-matched against runs of
+# words on one line, and an unambiguous match gives the element position
+# without the grid LLM round trip. After the first full pass only the
+# regions that changed since the previous frame (services/frame_diff.py)
+# are read again, together with the words they cut through.
+#
+# Needs pytesseract and the tesseract binary; without them locate() always
+# returns None and the grid LLM path is used.
+
+# Changed area above this share of the screen is read again in one full pass
+FULL_REFRESH_SHARE = 0.5
+# Margin around a changed region that is read again, so words at its edge are read whole
+REFRESH_MARGIN = 12
+# Two matches closer in score than this, at different places, make a label ambiguous
+AMBIGUITY_MARGIN = 0.05
+
+# Quoted label patterns. Single quotes count only at word boundaries, so the
+# apostrophes in "John's" or 'Don't save' do not open or close a label.
+QUOTE_PATTERNS = [r"(?<!\w)'(.+?)'(?!\w)", r'"([^"]+)"', r'«([^»]+)»', r'“([^”]+)”', r'(?<!\w)‘(.+?)’(?!\w)']
+
+_unavailable = None
+
+
+def quoted_labels(description):
+    """Quoted labels in an element description, in order of appearance"""
+    found = []
+    for pattern in QUOTE_PATTERNS:
+        for match in re.finditer(pattern, description):
+            label = match.group(1).strip()
+            if label:
+                found.append((match.start(), label))
+    return [label for _, label in sorted(found)]
+
+
+def _normalize(text):
+    return ' '.join(re.sub(r'[^\w]+', ' ', text.casefold()).split())
+
+
+def _overlaps(box, region):
+    x, y, w, h = box
+    rx, ry, rw, rh = region
+    return x < rx + rw and rx < x + w and y < ry + rh and ry < y + h
+
+
+def _union(boxes):
+    x0 = min(b[0] for b in boxes)
+    y0 = min(b[1] for b in boxes)
+    x1 = max(b[0] + b[2] for b in boxes)
+    y1 = max(b[1] + b[3] for b in boxes)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+class OcrIndex:
+    """
+    Words of one frame as dicts {text, box (x, y, w, h), conf, line}; words
+    with the same `line` were read as one text line.
+    """
+
+    def __init__(self, languages=OCR_LANGUAGES, upscale=OCR_UPSCALE, min_confidence=OCR_MIN_CONFIDENCE):
+        import pytesseract
+        self.pytesseract = pytesseract
+        self.languages = languages
+        self.upscale = upscale
+        self.min_confidence = min_confidence
+        self.frame = None
+        self.words = []
+        self._next_line = 0
+        self._lock = threading.Lock()
+
+    def _read(self, frame, region):
+        """OCR of one frame region; returns its words in screen coordinates"""
+        x, y, w, h = region
+        image = frame.crop((x, y, x + w, y + h)).convert('L')
+        if self.upscale != 1:
+            image = image.resize((int(w * self.upscale), int(h * self.upscale)), Image.Resampling.BICUBIC)
+        # psm 11: sparse text, no assumption of a page layout
+        data = self.pytesseract.image_to_data(image, lang=self.languages, config='--psm 11',
+                                              output_type=self.pytesseract.Output.DICT)
+        words = []
+        lines = {}
+        for i, text in enumerate(data['text']):
+            text = text.strip()
+            conf = float(data['conf'][i])
+            if not text or conf < self.min_confidence:
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            if key not in lines:
+                lines[key] = self._next_line
+                self._next_line += 1
+            words.append({
+                'text': text,
+                'box': (x + int(data['left'][i] / self.upscale), y + int(data['top'][i] / self.upscale),
+                        max(1, int(data['width'][i] / self.upscale)), max(1, int(data['height'][i] / self.upscale))),
+                'conf': conf,
+                'line': lines[key],
+            })
+        return words
+
+    def refresh(self, frame):
+        """Bring the index up to date with `frame`; returns the number of regions read"""
+        with self._lock:
+            width, height = frame.size
+            if self.frame is None or self.frame.size != frame.size:
+                regions = None
+            else:
+                regions = changed_regions(self.frame, frame, k=16)
+                if sum(w * h for x, y, w, h, _ in regions) > FULL_REFRESH_SHARE * width * height:
+                    regions = None
+
+            with tracing.span('ocr_refresh', full=regions is None) as sp:
+                if regions is None:
+                    self.words = self._read(frame, (0, 0, width, height))
+                    count = 1
+                else:
+                    count = 0
+                    for x, y, w, h, _ in regions:
+                        area = (max(0, x - REFRESH_MARGIN), max(0, y - REFRESH_MARGIN),
+                                min(width, x + w + REFRESH_MARGIN) - max(0, x - REFRESH_MARGIN),
+                                min(height, y + h + REFRESH_MARGIN) - max(0, y - REFRESH_MARGIN))
+                        # Words the region cuts through are dropped and read again whole
+                        cut = [word for word in self.words if _overlaps(word['box'], area)]
+                        if cut:
+                            area = _union([area] + [word['box'] for word in cut])
+                        self.words = [word for word in self.words if not _overlaps(word['box'], area)]
+                        self.words.extend(self._read(frame, area))
+                        count += 1
+                sp.set(regions=count, words=len(self.words))
+            self.frame = frame
+            return count
+
+    def candidates(self, label):
+        """[(score, box, text)] for runs of words on one line resembling `label`, best first"""
+        target = _normalize(label)
+        if not target:
+            return []
+        size = len(target.split())
+        with self._lock:
+            lines = {}
+            for word in self.words:
+                lines.setdefault(word['line'], []).append(word)
+
+        results = []
+        for words in lines.values():
+            words.sort(key=lambda word: word['box'][0])
+            for start in range(len(words)):
+                for length in range(max(1, size - 1), size + 2):
+                    span = words[start:start + length]
+                    if len(span) < length:
+                        break
+                    text = _normalize(' '.join(word['text'] for word in span))
+                    score = difflib.SequenceMatcher(None, target, text).ratio()
+                    if score >= OCR_MATCH_THRESHOLD:
+                        results.append((score, _union([word['box'] for word in span]), text))
+        results.sort(key=lambda result: -result[0])
+        return results
+
+    def find(self, label):
+        """Box of the one place showing `label`, or None if there is none or several"""
+        results = self.candidates(label)
+        if not results:
+            return None
+        best_score, best_box, _ = results[0]
+        for score, box, _ in results[1:]:
+            if best_score - score > AMBIGUITY_MARGIN:
+                break
+            if not _overlaps(box, best_box):
+                return None
+        return best_box
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The shared index, or None when pytesseract or tesseract is missing"""
+    global _index, _unavailable
+    with _index_lock:
+        if _index is None and _unavailable is None:
+            try:
+                index = OcrIndex()
+                index.pytesseract.get_tesseract_version()
+                _index = index
+            except Exception as e:
+                _unavailable = e
+                print(f"OCR unavailable, elements are located by the grid LLM only: {e}")
+        return _index
+
+
+def locate(description, frame=None):
+    """
+    Screen coordinates of the center of the text quoted in `description`,
+    or None if it has no quoted label, OCR is unavailable, or the label is
+    not found in exactly one place.
+    """
+    labels = quoted_labels(description)
+    if not labels:
+        return None
+    index = get_index()
+    if index is None:
+        return None
+
+    start = time.perf_counter()
+    if frame is None:
+        import pyautogui
+        frame = pyautogui.screenshot()
+    elif isinstance(frame, np.ndarray):
+        frame = Image.fromarray(frame)
+    try:
+        index.refresh(frame)
+    except Exception as e:
+        print(f"OCR failed: {e}")
+        return None
+
+    with tracing.span('ocr_match', labels=len(labels)) as sp:
+        for label in labels:
+            box = index.find(label)
+            if box is not None:
+                x, y, w, h = box
+                sp.set(label=label, box=box)
+                metrics.OCR_HITS.inc()
+                metrics.OCR_LOCATE_SECONDS.observe(time.perf_counter() - start)
+                return x + w // 2, y + h // 2
+    metrics.OCR_MISSES.inc()
+    metrics.OCR_LOCATE_SECONDS.observe(time.perf_counter() - start)
+    return None
@@ -1,33 +1,100 @@
-from openai import OpenAI
 from config import OPENROUTER_KEY, MODEL
 
 import os
 import time
 import threading
+import concurrent.futures
+
+from services import tracing
+from services import metrics
+from services import cancellation
 
 # Cache for system prompts to avoid repeated file reads
 _prompt_cache = {}
 _prompt_cache_lock = threading.Lock()
 
-openrouter_client = OpenAI(
-    api_key=OPENROUTER_KEY,
-    base_url="https://openrouter.ai/api/v1",
-    timeout=30.0  # Increase timeout for more reliable responses
-)
+# The openai package takes most of a second to import, so the client is
+# created on the first real API call (stub backends never need it)
+openrouter_client = None
+_client_lock = threading.Lock()
+
 
-def generate(messages, prompt, replace_dict=None):
+def get_client():
     global openrouter_client
-    
-    # Use cached prompt if available
+    with _client_lock:
+        if openrouter_client is None:
+            from openai import OpenAI
+            openrouter_client = OpenAI(
+                api_key=OPENROUTER_KEY,
+                base_url="https://openrouter.ai/api/v1",
+                timeout=30.0  # Increase timeout for more reliable responses
+            )
+    return openrouter_client
+
+
+def warm_up():
+    """Create the client in a background thread, e.g. while the agent waits for the desktop"""
+    if _completion_backend is None and openrouter_client is None:
+        threading.Thread(target=get_client, daemon=True, name='llm-client-warmup').start()
+
+# API calls run here so the caller can stop waiting on cancellation;
+# an abandoned call finishes in the background and its result is dropped
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm')
+
+# Optional replacement for the chat completion call: backend(messages, prompt) -> text.
+# The offline benchmarks install a scripted model here.
+_completion_backend = None
+
+
+def set_completion_backend(backend):
+    """Route generate() to `backend` instead of OpenRouter (None restores the API)"""
+    global _completion_backend
+    _completion_backend = backend
+
+
+# Optional context manager held around every completion call, e.g. the
+# request budget the batch runner shares between its agent processes
+_request_limiter = None
+
+
+def set_request_limiter(limiter):
+    """Hold `limiter` for the duration of each completion call (None removes it)"""
+    global _request_limiter
+    _request_limiter = limiter
+
+
+def _limited(call, *args, **kwargs):
+    limiter = _request_limiter
+    if limiter is None:
+        return call(*args, **kwargs)
+    with tracing.span('llm_budget_wait'):
+        limiter.__enter__()
+    try:
+        return call(*args, **kwargs)
+    finally:
+        limiter.__exit__(None, None, None)
+
+
+def load_prompt(prompt):
+    """System prompt text from prompts/<prompt>.md, read once and cached"""
     prompt_path = f'./prompts/{prompt}.md'
     with _prompt_cache_lock:
-        if prompt_path in _prompt_cache:
-            system_message = _prompt_cache[prompt_path]
-        else:
-            # Read prompt from file and cache it
+        if prompt_path not in _prompt_cache:
             with open(prompt_path, encoding='utf8') as f:
-                system_message = f.read()
-            _prompt_cache[prompt_path] = system_message
+                _prompt_cache[prompt_path] = f.read()
+        return _prompt_cache[prompt_path]
+
+
+def preload_prompts():
+    """Read every prompt file into the cache (used by the daemon at startup)"""
+    names = [os.path.splitext(name)[0] for name in os.listdir('./prompts') if name.endswith('.md')]
+    for name in names:
+        load_prompt(name)
+    return names
+
+
+def generate(messages, prompt, replace_dict=None, cancel_token=None):
+    system_message = load_prompt(prompt)
     
     if replace_dict:
         for key in list(replace_dict.keys()):
@@ -43,19 +110,57 @@ def generate(messages, prompt, replace_dict=None):
     system_content = list(system_content) + list(messages)
     print('generating...')
     try:
-        start_time = time.time()
-
-        chat_completion = openrouter_client.chat.completions.create(
-            model=MODEL, 
-            messages=system_content
-        )
-        end_time = time.time()
-        print(f"LLM response time: {end_time - start_time:.2f}s")
+        with tracing.span('llm', prompt=prompt, model=MODEL) as sp:
+            request_bytes = _estimate_request_bytes(system_content)
+            metrics.LLM_REQUEST_BYTES.observe(request_bytes)
+            sp.set(request_bytes=request_bytes)
+            start_time = time.time()
+
+            if _completion_backend is not None:
+                future = _executor.submit(_limited, _completion_backend, system_content, prompt)
+                generated_text = cancellation.result(future, cancel_token)
+                metrics.LLM_SECONDS.observe(time.time() - start_time)
+                print(f"LLM response time: {time.time() - start_time:.2f}s")
+                return generated_text
+
+            future = _executor.submit(
+                _limited,
+                get_client().chat.completions.create,
+                model=MODEL, 
+                messages=system_content
+            )
+            chat_completion = cancellation.result(future, cancel_token)
+            end_time = time.time()
+            metrics.LLM_SECONDS.observe(end_time - start_time)
+            print(f"LLM response time: {end_time - start_time:.2f}s")
+
+            usage = getattr(chat_completion, 'usage', None)
+            if usage is not None:
+                sp.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
         
         generated_text = chat_completion.choices[0].message.content
         return generated_text
 
     except Exception as e:
+        metrics.LLM_ERRORS.inc()
         print(f"Error in API call: {e}")
         # Try to recover with a new client instance
         return "Error generating response. Please try again."
+
+
+def _estimate_request_bytes(messages):
+    """Approximate request size: the text and image payloads dominate it"""
+    total = 0
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            total += len(content)
+            continue
+        for part in content or []:
+            if not isinstance(part, dict):
+                continue
+            if part.get('type') == 'image_url':
+                total += len(part['image_url']['url'])
+            else:
+                total += len(str(part.get('text', '')))
+    return total
@@ -0,0 +1,59 @@
+import os
+import secrets
+import sys
+import tempfile
+import time
+
+# Per-user private directory for local IPC: sockets and random keys.
+#
+# On Linux this is $XDG_RUNTIME_DIR/desktop-agent, elsewhere (or without
+# XDG_RUNTIME_DIR) desktop-agent-<uid> in the temp directory; on Windows
+# %LOCALAPPDATA%\desktop-agent. The directory is created 0700 and refused
+# if it belongs to another user or is accessible to others, so a socket or
+# key file inside it is reachable by the current user only.
+
+
+def runtime_dir():
+    """Path of the private runtime directory, created if needed"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        path = os.path.join(base, 'desktop-agent')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    xdg = os.environ.get('XDG_RUNTIME_DIR')
+    if sys.platform.startswith('linux') and xdg and os.path.isdir(xdg):
+        path = os.path.join(xdg, 'desktop-agent')
+    else:
+        path = os.path.join(tempfile.gettempdir(), f'desktop-agent-{os.getuid()}')
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not os.path.isdir(path) or os.path.islink(path) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"{path} is not a private directory of the current user")
+    return path
+
+
+def secret(name, nbytes=32):
+    """
+    Random hex key stored in the runtime directory as `name` (mode 0600),
+    generated by the first caller; every process of the user reads the same key.
+    """
+    path = os.path.join(runtime_dir(), name)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process may be writing the key right now
+        for _ in range(50):
+            with open(path, encoding='ascii') as f:
+                key = f.read().strip()
+            if key:
+                return key
+            time.sleep(0.02)
+        raise RuntimeError(f"Key file {path} is empty")
+    key = secrets.token_hex(nbytes)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(key)
+    return key
@@ -1,17 +1,22 @@
 import os
 import time
 import numpy as np
-import pyautogui
 from PIL import Image
-import cv2
 import threading
 
 from services.cache_module import _screenshot_cache, _cache_lock
 from services.cursor_module import get_cursor_position, get_screen_dimensions
-from config import NUM_CELLS
+from services.input_backends import get_backend
+from services import tracing
+from services import metrics
+from services import adaptive_grid
+from services import image_pool
+from config import NUM_CELLS, GRID_ADAPTIVE, GRID_CELL_BUDGET
 
 # Capture screenshot of area around cursor
 def capture_cursor_area(area_size=128):
+    import pyautogui
+
     x, y = get_cursor_position()
     
     with _cache_lock:
@@ -69,18 +74,34 @@ def save_screenshots():
         print(f"Error saving screenshots: {e}")
 
 
-# Function to create a grid overlay on the screenshot
-def save_screenshot_with_grid(num_cells=NUM_CELLS):
-    try:
-        # Capture the screenshot
-        screenshot = np.array(pyautogui.screenshot())
-        screenshot_rgb = cv2.cvtColor(screenshot, cv2.COLOR_BGR2RGB)
-    except Exception as e:
-        print(f"Error capturing screenshot: {e}")
-        return
-    
+# Draw the numbered grid overlay on a screenshot array (no capture, no file IO)
+def render_grid(screenshot, cursor_position, num_cells=NUM_CELLS, adaptive=False):
+    """
+    Returns a dict with the annotated image, the cell list and the grid layout.
+    With adaptive=True the cells come from services/adaptive_grid.py with
+    `num_cells` as the budget, and rows/cols/cell size are None.
+    """
+    # OpenCV is only needed here; importing it lazily keeps agent startup fast
+    import cv2
+
     # Get screen dimensions
-    height, width = screenshot_rgb.shape[:2]
+    height, width = screenshot.shape[:2]
+
+    if adaptive:
+        cells = adaptive_grid.adaptive_cells(screenshot, num_cells)
+        grid_info = [{
+            'index': index,
+            'x': x,
+            'y': y,
+            'width': w,
+            'height': h,
+            'center_x': x + w // 2,
+            'center_y': y + h // 2
+        } for index, (x, y, w, h) in enumerate(cells, 1)]
+        annotated = np.array(screenshot).copy()
+        with tracing.span('grid_render', cells=len(grid_info)):
+            _draw_adaptive_grid(annotated, grid_info)
+        return _finish_grid(annotated, grid_info, cursor_position, height, None, None, None, None)
     
     # Calculate grid dimensions
     # We'll aim for approximately num_cells total cells
@@ -110,58 +131,82 @@ def save_screenshot_with_grid(num_cells=NUM_CELLS):
     font_scale = 0.3
     font_thickness = 1
     
-    for row in range(num_rows):
-        for col in range(num_cols):
-            # Calculate cell coordinates
-            x1 = col * cell_width
-            y1 = row * cell_height
-            x2 = x1 + cell_width
-            y2 = y1 + cell_height
+    with tracing.span('grid_render', rows=num_rows, cols=num_cols):
+        for row in range(num_rows):
+            for col in range(num_cols):
+                # Calculate cell coordinates
+                x1 = col * cell_width
+                y1 = row * cell_height
+                x2 = x1 + cell_width
+                y2 = y1 + cell_height
             
-            # Store cell information
-            grid_info.append({
-                'index': cell_index,
-                'x': x1,
-                'y': y1,
-                'width': cell_width,
-                'height': cell_height,
-                'center_x': x1 + cell_width // 2,
-                'center_y': y1 + cell_height // 2
-            })
+                # Store cell information
+                grid_info.append({
+                    'index': cell_index,
+                    'x': x1,
+                    'y': y1,
+                    'width': cell_width,
+                    'height': cell_height,
+                    'center_x': x1 + cell_width // 2,
+                    'center_y': y1 + cell_height // 2
+                })
             
-            # Draw cell boundary
-            cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 255, 255), 1)
+                # Draw cell boundary
+                cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 255, 255), 1)
             
-            # Add cell number
-            text = str(cell_index)
-            text_size = cv2.getTextSize(text, font, font_scale, font_thickness)[0]
-            text_x = x1 + (cell_width - text_size[0]) // 2
-            text_y = y1 + (cell_height + text_size[1]) // 2
+                # Add cell number
+                text = str(cell_index)
+                text_size = cv2.getTextSize(text, font, font_scale, font_thickness)[0]
+                text_x = x1 + (cell_width - text_size[0]) // 2
+                text_y = y1 + (cell_height + text_size[1]) // 2
             
-            # Draw text background for better visibility
-            '''
-            cv2.rectangle(
-                annotated,
-                (text_x - 2, text_y - text_size[1] - 2),
-                (text_x + text_size[0] + 2, text_y + 2),
-                (0, 0, 0), -1
-            )'''
+                # Draw text background for better visibility
+                '''
+                cv2.rectangle(
+                    annotated,
+                    (text_x - 2, text_y - text_size[1] - 2),
+                    (text_x + text_size[0] + 2, text_y + 2),
+                    (0, 0, 0), -1
+                )'''
             
-            # Draw text
-            cv2.putText(
-                annotated, text, (text_x, text_y),
-                font, font_scale, (255, 0, 0), font_thickness
-            )
+                # Draw text
+                cv2.putText(
+                    annotated, text, (text_x, text_y),
+                    font, font_scale, (255, 0, 0), font_thickness
+                )
             
-            cell_index += 1
-    
-    # Store grid information in cache
-    with _cache_lock:
-        _screenshot_cache['grid_cells'] = grid_info
-        _screenshot_cache['last_capture_time'] = time.time()
+                cell_index += 1
     
+    return _finish_grid(annotated, grid_info, cursor_position, height, num_rows, num_cols, cell_width, cell_height)
+
+
+def _draw_adaptive_grid(annotated, grid_info):
+    """Cell borders and white-on-black labels in the top-left corner, sized to the cell"""
+    import cv2
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    for cell in grid_info:
+        x1, y1 = cell['x'], cell['y']
+        x2, y2 = x1 + cell['width'] - 1, y1 + cell['height'] - 1
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 255, 255), 1)
+
+        text = str(cell['index'])
+        # Largest scale up to 0.5 whose label takes at most half the cell width
+        scale = 0.5
+        (text_w, text_h), baseline = cv2.getTextSize(text, font, scale, 1)
+        if text_w > cell['width'] // 2:
+            scale = max(0.3, scale * (cell['width'] // 2) / text_w)
+            (text_w, text_h), baseline = cv2.getTextSize(text, font, scale, 1)
+        cv2.rectangle(annotated, (x1 + 1, y1 + 1), (x1 + text_w + 3, y1 + text_h + baseline + 3), (0, 0, 0), -1)
+        cv2.putText(annotated, text, (x1 + 2, y1 + text_h + 2), font, scale, (255, 255, 255), 1, cv2.LINE_AA)
+
+
+def _finish_grid(annotated, grid_info, cursor_position, height, num_rows, num_cols, cell_width, cell_height):
+    """Marks the cursor and its cell; returns the render_grid result"""
+    import cv2
+
     # Mark cursor position
-    cursor_x, cursor_y = get_cursor_position()
+    cursor_x, cursor_y = cursor_position
     cv2.circle(annotated, (cursor_x, cursor_y), 10, (0, 0, 255), -1)
     
     # Find which cell contains the cursor
@@ -186,18 +231,69 @@ def save_screenshot_with_grid(num_cells=NUM_CELLS):
             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2
         )
     
-    # Convert the annotated screenshot to PIL Image and save/resize
-    annotated_pil = Image.fromarray(annotated)
-    fullscreen_pil = Image.fromarray(screenshot)
+    return {
+        'annotated': annotated,
+        'cells': grid_info,
+        'rows': num_rows,
+        'cols': num_cols,
+        'cell_width': cell_width,
+        'cell_height': cell_height,
+        'cursor_cell': cursor_cell,
+    }
+
+
+# Function to create a grid overlay on the screenshot
+def save_screenshot_with_grid(num_cells=None, adaptive=GRID_ADAPTIVE):
+    import pyautogui
+
+    if num_cells is None:
+        num_cells = GRID_CELL_BUDGET if adaptive else NUM_CELLS
+
+    try:
+        # Capture the screenshot
+        with tracing.span('capture', grid=True), metrics.CAPTURE_SECONDS.time():
+            screenshot = np.array(pyautogui.screenshot())
+    except Exception as e:
+        print(f"Error capturing screenshot: {e}")
+        return
+    
+    height, width = screenshot.shape[:2]
+    cursor_x, cursor_y = get_cursor_position()
+
+    # Large frames: grid rendering and both JPEG encodes run in the image worker pool
+    pool = image_pool.get_pool(width * height)
+    grid = None
+    if pool is not None:
+        try:
+            fullscreen_jpeg, grid_jpeg, grid = pool.grid_jpegs(screenshot, (cursor_x, cursor_y), num_cells, adaptive)
+        except Exception as e:
+            print(f"Image worker pool failed, rendering the grid in-process: {e}")
+    if grid is None:
+        grid = render_grid(screenshot, (cursor_x, cursor_y), num_cells, adaptive)
+    grid_info = grid['cells']
+    cursor_cell = grid['cursor_cell']
+    num_rows, num_cols = grid['rows'], grid['cols']
+    cell_width, cell_height = grid['cell_width'], grid['cell_height']
+    
+    # Store grid information in cache
+    with _cache_lock:
+        _screenshot_cache['grid_cells'] = grid_info
+        _screenshot_cache['last_capture_time'] = time.time()
     
     # Save original screenshots
-    fullscreen_pil.save('screenshots/fullscreen.jpg', 'JPEG')
-    annotated_pil.save('screenshots/grid.jpg', 'JPEG')
+    with tracing.span('save_jpeg', grid=True):
+        if 'annotated' in grid:
+            Image.fromarray(screenshot).save('screenshots/fullscreen.jpg', 'JPEG')
+            Image.fromarray(grid['annotated']).save('screenshots/grid.jpg', 'JPEG')
+        else:
+            with open('screenshots/fullscreen.jpg', 'wb') as f:
+                f.write(fullscreen_jpeg)
+            with open('screenshots/grid.jpg', 'wb') as f:
+                f.write(grid_jpeg)
     
     # Create and save a resized version for display
-    original_width, original_height = annotated_pil.size
     new_height = 512
-    new_width = int(original_width * (new_height / original_height))
+    new_width = int(width * (new_height / height))
     
     #resized_fullscreen = fullscreen_pil.resize((new_width, new_height), Image.Resampling.LANCZOS)
     #resized_fullscreen.save('screenshots/fullscreen_resized.jpg', 'JPEG')
@@ -208,8 +304,12 @@ def save_screenshot_with_grid(num_cells=NUM_CELLS):
     # Add grid info to text file for reference
     with open('screenshots/grid_info.txt', 'w') as f:
         f.write(f"Screen dimensions: {width}x{height}\n")
-        f.write(f"Grid: {num_rows} rows x {num_cols} columns\n")
-        f.write(f"Cell size: {cell_width}x{cell_height} pixels\n")
+        if adaptive:
+            sides = [min(cell['width'], cell['height']) for cell in grid_info]
+            f.write(f"Grid: adaptive, cells from {min(sides)} to {max(sides)} pixels\n")
+        else:
+            f.write(f"Grid: {num_rows} rows x {num_cols} columns\n")
+            f.write(f"Cell size: {cell_width}x{cell_height} pixels\n")
         f.write(f"Total cells: {len(grid_info)}\n")
         if cursor_cell:
             f.write(f"Cursor position: ({cursor_x}, {cursor_y}) in cell {cursor_cell['index']}\n")
@@ -219,24 +319,14 @@ def save_screenshot_with_grid(num_cells=NUM_CELLS):
 
 # Function to move cursor to a specified grid cell
 def move_cursor_to_cell(cell_index):
-    with _cache_lock:
-        grid_cells = _screenshot_cache.get('grid_cells', [])
-    
-    # Find the specified cell
-    target_cell = None
-    for cell in grid_cells:
-        if cell['index'] == cell_index:
-            target_cell = cell
-            break
+    target_cell = get_grid_cell(cell_index)
     
     if target_cell:
         # Move cursor to the center of the cell
         try:
-            pyautogui.moveTo(
-                target_cell['center_x'],
-                target_cell['center_y'],
-                duration=0.2  # Smooth movement
-            )
+            backend = get_backend()
+            backend.move_to(target_cell['center_x'], target_cell['center_y'],
+                            backend.timing['locate_move_duration'])
             return True
         except Exception as e:
             print(f"Error moving cursor: {e}")
@@ -253,4 +343,13 @@ def get_grid_cells():
     If the grid hasn't been generated yet, returns an empty list.
     """
     with _cache_lock:
-        return _screenshot_cache.get('grid_cells', [])
\ No newline at end of file
+        return _screenshot_cache.get('grid_cells', [])
+
+
+def get_grid_cell(cell_index):
+    """The cached cell with this index, or None; cells are numbered 1..N in list order"""
+    with _cache_lock:
+        grid_cells = _screenshot_cache.get('grid_cells', [])
+    if 1 <= cell_index <= len(grid_cells) and grid_cells[cell_index - 1]['index'] == cell_index:
+        return grid_cells[cell_index - 1]
+    return None
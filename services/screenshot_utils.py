@@ -1,32 +1,169 @@
-import pyautogui
 from PIL import Image, ImageDraw
 import numpy as np
+import base64
+import io
+import time
 
+from services import tracing
+from services import metrics
+from services import foveation
+from services import frame_diff
+from services import display_state
+from services import atspi_backend
+from services import image_pool
+from config import SETTLE_TIMEOUT, SETTLE_INTERVAL, SETTLE_TOLERANCE, FOVEATION_ENABLED, DIFF_TOP_K, DIFF_CROP_PIXELS
+from config import ATSPI_ENABLED, ATSPI_SUMMARY
+
+
+
+# Resize a full-resolution screenshot and mark the cursor on it
+def annotate_screenshot(screenshot, cursor_position, new_height=512):
+    """Return the downscaled PIL screenshot with a red dot at the cursor position"""
+    fullscreen_pil = Image.fromarray(screenshot) if isinstance(screenshot, np.ndarray) else screenshot
+    original_width, original_height = fullscreen_pil.size
+
+    new_width = int(original_width * (new_height / original_height))
+    with tracing.span('resize', width=new_width, height=new_height):
+        resized_fullscreen = image_pool.resize(screenshot, (new_width, new_height))
+
+    with tracing.span('annotate'):
+        cursor_x, cursor_y = cursor_position
+
+        # Calculate the resized cursor position
+        resized_cursor_x = int(cursor_x * (new_width / original_width))
+        resized_cursor_y = int(cursor_y * (new_height / original_height))
+
+        # Draw a red dot at the cursor position
+        draw = ImageDraw.Draw(resized_fullscreen)
+        draw.ellipse((resized_cursor_x - 5, resized_cursor_y - 5, resized_cursor_x + 5, resized_cursor_y + 5), fill=(255, 0, 0))
+
+    return resized_fullscreen
 
 
 # Enhanced function to save screenshot with elements
 def save_screenshot():
     """Save screenshot with detected UI elements using advanced detection techniques"""
+    import pyautogui
+
     # Take a new screenshot
-    screenshot = np.array(pyautogui.screenshot())
+    with tracing.span('capture') as sp, metrics.CAPTURE_SECONDS.time():
+        screenshot = np.array(pyautogui.screenshot())
+        sp.set(width=screenshot.shape[1], height=screenshot.shape[0])
 
-    fullscreen_pil = Image.fromarray(screenshot)
-    original_width, original_height = fullscreen_pil.size
+    # Get the current cursor position
+    resized_fullscreen = annotate_screenshot(screenshot, pyautogui.position())
 
-    new_height = 512
-    new_width = int(original_width * (new_height / original_height))
-    resized_fullscreen = fullscreen_pil.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    # Save the annotated screenshot
+    with tracing.span('save_jpeg'):
+        resized_fullscreen.save('screenshots/fullscreen.jpg', 'JPEG')
 
-    # Get the current cursor position
-    cursor_x, cursor_y = pyautogui.position()
 
-    # Calculate the resized cursor position
-    resized_cursor_x = int(cursor_x * (new_width / original_width))
-    resized_cursor_y = int(cursor_y * (new_height / original_height))
+# Frame of the latest capture_observation call
+_last_observation_frame = None
 
-    # Draw a red dot at the cursor position
-    draw = ImageDraw.Draw(resized_fullscreen)
-    draw.ellipse((resized_cursor_x - 5, resized_cursor_y - 5, resized_cursor_x + 5, resized_cursor_y + 5), fill=(255, 0, 0))
 
-    # Save the annotated screenshot
-    resized_fullscreen.save('screenshots/fullscreen.jpg', 'JPEG')
+def last_observation_frame():
+    """The full-resolution frame the latest observation was built from"""
+    return _last_observation_frame
+
+
+# Wait until the screen stops changing after an action
+def wait_for_settle(timeout=SETTLE_TIMEOUT, interval=SETTLE_INTERVAL, tolerance=SETTLE_TOLERANCE):
+    """
+    Grab the screen every `interval` seconds until two consecutive grabs have
+    thumbnails differing by less than `tolerance` (mean absolute difference,
+    0-255) or `timeout` passes. Returns the last full-resolution grab, so the
+    caller can use it as the observation instead of capturing again.
+    """
+    import pyautogui
+
+    deadline = time.time() + timeout
+    previous = None
+    with tracing.span('settle') as sp:
+        grabs = 0
+        while True:
+            screenshot = pyautogui.screenshot()
+            grabs += 1
+            thumbnail = np.asarray(screenshot.resize((96, 54), Image.Resampling.NEAREST), dtype=np.int16)
+            settled = previous is not None and np.abs(thumbnail - previous).mean() < tolerance
+            if settled or time.time() + interval > deadline:
+                sp.set(grabs=grabs, settled=settled)
+                return screenshot
+            previous = thumbnail
+            time.sleep(interval)
+
+
+# Capture, annotate, save and encode in one pass for the agent request
+def capture_observation(settle=False, foveated=FOVEATION_ENABLED):
+    """
+    Returns (message content parts, capture time). With settle=True the
+    capture waits for the screen to stop changing first and reuses the
+    settled frame. With foveated=True the parts hold the foveated view
+    (services/foveation.py), otherwise a single 512 px high screenshot.
+    Either way the regions that changed since the last observation sent to
+    the model (services/frame_diff.py) are listed and added as native-resolution crops,
+    followed by the focused window's interactive elements from AT-SPI.
+    The global view is also written to screenshots/fullscreen.jpg; its JPEG
+    bytes are encoded directly, without decoding the file again.
+    """
+    import pyautogui
+    global _last_observation_frame
+
+    if settle:
+        screenshot = wait_for_settle()
+    else:
+        with tracing.span('capture'), metrics.CAPTURE_SECONDS.time():
+            screenshot = pyautogui.screenshot()
+    captured_at = time.time()
+    cursor = tuple(pyautogui.position())
+    changed = frame_diff.since_previous(screenshot)
+    _last_observation_frame = screenshot
+
+    if foveated:
+        encode_start = time.perf_counter()
+        parts, image_data = foveation.build_observation(
+            screenshot, cursor,
+            focused=display_state.get_focused_window_rect(),
+            changed=changed)
+        with tracing.span('save_jpeg'), open('screenshots/fullscreen.jpg', 'wb') as f:
+            f.write(image_data)
+        metrics.ENCODE_SECONDS.observe(time.perf_counter() - encode_start)
+        return parts + accessibility_parts(), captured_at
+
+    resized_fullscreen = annotate_screenshot(screenshot, cursor)
+
+    encode_start = time.perf_counter()
+    with tracing.span('save_jpeg'):
+        buffer = io.BytesIO()
+        resized_fullscreen.save(buffer, 'JPEG', quality=85, optimize=True)
+        image_data = buffer.getvalue()
+        with open('screenshots/fullscreen.jpg', 'wb') as f:
+            f.write(image_data)
+
+    with tracing.span('encode', jpeg_bytes=len(image_data)):
+        base64_string = base64.b64encode(image_data).decode('utf-8')
+    parts = single_image_parts(base64_string)
+    if changed is not None:
+        parts.append({"type": "text", "text": frame_diff.describe_regions(changed, screenshot.size)})
+        crops = foveation.select_crops(screenshot.size, cursor, changed=changed, max_crops=0,
+                                       budget=DIFF_CROP_PIXELS * DIFF_TOP_K)
+        parts.extend(foveation.crop_parts(screenshot, crops, cursor))
+    metrics.ENCODE_SECONDS.observe(time.perf_counter() - encode_start)
+    return parts + accessibility_parts(), captured_at
+
+
+def accessibility_parts():
+    """Text part listing the focused window's interactive elements from AT-SPI, when enabled and available"""
+    if not (ATSPI_ENABLED and ATSPI_SUMMARY):
+        return []
+    with tracing.span('atspi_summary'):
+        text = atspi_backend.summary()
+    return [{"type": "text", "text": text}] if text else []
+
+
+def single_image_parts(base64_string):
+    """Message content parts for one base64 JPEG screenshot"""
+    return [
+        {"type": "text", "text": "Fullscreen screenshot:"},
+        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_string}"}},
+    ]
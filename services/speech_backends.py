@@ -0,0 +1,199 @@
+import math
+import os
+import types
+
+from config import VOICE_SHORT_UTTERANCE
+
+# Whisper model sizes accepted by both engines
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large"]
+
+WHISPER_DOWNLOAD_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "whisper")
+
+
+class SpeechBackend:
+    """
+    Speech-to-text engine used by VoiceInputProcessor.
+
+    transcribe() receives mono float32 audio at 16 kHz and returns the text
+    (possibly empty). Backends import their heavy dependencies in __init__,
+    so importing this module is cheap.
+    """
+    name = None
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def transcribe(self, audio, language):
+        raise NotImplementedError
+
+    def describe(self):
+        return f"{self.name}:{self.model_name}"
+
+
+class WhisperBackend(SpeechBackend):
+    """
+    openai-whisper on PyTorch (fp16 on CUDA, fp32 on CPU).
+
+    model.transcribe() always pads the input to a 30 s mel window, so a
+    2-3 s voice command costs a full 30 s encoder pass. Utterances up to
+    `short_max_seconds` therefore take a short path: the mel is computed for
+    the real audio plus `short_padding_seconds` of silence only, the encoder
+    runs over that many frames (positional embeddings trimmed to match) and
+    a single decode() pass produces the text.
+    """
+    name = "whisper"
+
+    def __init__(self, model_name, device=None, short_utterance=VOICE_SHORT_UTTERANCE,
+                 short_max_seconds=10.0, short_padding_seconds=1.0):
+        super().__init__(model_name)
+        import torch
+        whisper = _import_whisper()
+
+        self.whisper = whisper
+        self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
+        self.use_fp16 = self.device == "cuda"
+        self.model = whisper.load_model(model_name, device=self.device, download_root=WHISPER_DOWNLOAD_ROOT)
+        self.model.eval()
+
+        self.short_utterance = short_utterance
+        self.short_max_seconds = short_max_seconds
+        self.short_padding_seconds = short_padding_seconds
+        # With the full 3000-frame window the trimmed forward is identical to the original one
+        self.model.encoder.forward = types.MethodType(_trimmed_encoder_forward, self.model.encoder)
+
+    def transcribe(self, audio, language):
+        if self.short_utterance and len(audio) <= self.short_max_seconds * 16000:
+            try:
+                return self.transcribe_short(audio, language)
+            except Exception as e:
+                print(f"Короткий путь распознавания не сработал, использую полный: {e}")
+        return self.transcribe_full(audio, language)
+
+    def transcribe_full(self, audio, language):
+        # Smaller beam for the small models: noticeably faster, same quality on short commands
+        if self.model_name in ["tiny", "base"]:
+            result = self.model.transcribe(audio, language=language, fp16=self.use_fp16, beam_size=3)
+        else:
+            result = self.model.transcribe(audio, language=language, fp16=self.use_fp16)
+        return result["text"].strip()
+
+    def transcribe_short(self, audio, language):
+        import torch
+        whisper = self.whisper
+
+        padding = int(self.short_padding_seconds * 16000)
+        try:
+            mel = whisper.log_mel_spectrogram(audio, self.model.dims.n_mels, padding=padding, device=self.model.device)
+        except TypeError:
+            # Older whisper releases only support 80 mel bins and have no n_mels argument
+            mel = whisper.log_mel_spectrogram(audio, padding=padding, device=self.model.device)
+
+        # The second encoder convolution has stride 2: keep an even number of frames
+        frames = min(mel.shape[-1], 2 * self.model.dims.n_audio_ctx)
+        mel = mel[:, :frames - frames % 2]
+
+        options = whisper.DecodingOptions(
+            language=language,
+            fp16=self.use_fp16,
+            beam_size=3 if self.model_name in ["tiny", "base"] else 5,
+            without_timestamps=True,
+            sample_len=min(self.model.dims.n_text_ctx // 2, math.ceil(len(audio) / 16000 * 20) + 16)
+        )
+        with torch.no_grad():
+            result = whisper.decode(self.model, mel, options)
+
+        # Same silence guard as transcribe(): likely no speech and an unsure decode
+        if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+            return ""
+        return result.text.strip()
+
+    def describe(self):
+        return f"{self.name}:{self.model_name} ({self.device})"
+
+
+class CTranslate2Backend(SpeechBackend):
+    """
+    Whisper converted to CTranslate2 (faster-whisper) with int8 weights.
+
+    Runs several times faster than fp32 PyTorch on CPU with a much smaller
+    memory footprint, which makes base/small usable without a GPU.
+    """
+    name = "ct2"
+
+    def __init__(self, model_name, device=None, compute_type="int8", cpu_threads=0):
+        super().__init__(model_name)
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError("Модуль faster-whisper не найден. Установите его через: pip install faster-whisper") from e
+
+        self.device = device if device else "cpu"
+        self.compute_type = compute_type
+        self.model = WhisperModel(model_name, device=self.device, compute_type=compute_type,
+                                  cpu_threads=cpu_threads or min(8, os.cpu_count() or 1))
+
+    def transcribe(self, audio, language):
+        segments, _ = self.model.transcribe(
+            audio,
+            language=language,
+            beam_size=3 if self.model_name in ["tiny", "base"] else 5,
+            condition_on_previous_text=False
+        )
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+    def describe(self):
+        return f"{self.name}:{self.model_name} ({self.device}, {self.compute_type})"
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    CTranslate2Backend.name: CTranslate2Backend,
+}
+
+
+def parse_model_spec(spec):
+    """
+    Split a --voice-model value into (backend, model size).
+
+    "small" selects openai-whisper, "ct2:small" the int8 CTranslate2 engine.
+    """
+    backend, _, model_name = spec.rpartition(":")
+    backend = backend or WhisperBackend.name
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown speech backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+    if model_name not in MODEL_SIZES:
+        raise ValueError(f"Unknown model size '{model_name}', expected one of: {', '.join(MODEL_SIZES)}")
+    return backend, model_name
+
+
+def create_backend(spec, device=None, **options):
+    backend, model_name = parse_model_spec(spec)
+    return BACKENDS[backend](model_name, device=device, **options)
+
+
+def _trimmed_encoder_forward(encoder, x):
+    """AudioEncoder.forward without the fixed 30 s input assertion"""
+    import torch.nn.functional as F
+
+    x = F.gelu(encoder.conv1(x))
+    x = F.gelu(encoder.conv2(x))
+    x = x.permute(0, 2, 1)
+    x = (x + encoder.positional_embedding[:x.shape[1]]).to(x.dtype)
+    for block in encoder.blocks:
+        x = block(x)
+    return encoder.ln_post(x)
+
+
+def _import_whisper():
+    # Whisper is published under several import paths
+    try:
+        import openai.whisper as whisper
+    except ImportError:
+        try:
+            from openai import whisper
+        except ImportError:
+            try:
+                import whisper
+            except ImportError:
+                raise ImportError("Модуль Whisper не найден. Установите его через: pip install git+https://github.com/openai/whisper.git")
+    return whisper
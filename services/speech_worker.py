@@ -0,0 +1,231 @@
+"""
+Long-lived speech recognition process.
+
+Loading Whisper (and importing torch) takes seconds to tens of seconds, so
+with --voice-worker the agent talks to a separate process that keeps the
+models resident between agent runs:
+
+    python -m services.speech_worker --preload tiny
+    python -m services.speech_worker --stop
+
+The agent connects over multiprocessing.connection and starts the worker
+itself (detached, so it outlives the agent) if none is running. Messages are
+pickles, so the worker is only reachable by the current user: a Unix socket
+in the private runtime directory (services/runtime_dir.py), or localhost TCP
+on Windows; both ends also authenticate with a random per-user key kept in a
+0600 file there.
+Requests are tuples, answers are ('ok', value) or ('error', message):
+    ('load', spec, device)              -> backend description
+    ('transcribe', spec, audio, lang)   -> text
+    ('shutdown',)                       -> None
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from config import SPEECH_WORKER_HOST, SPEECH_WORKER_PORT
+from services.speech_backends import SpeechBackend, create_backend
+from services.runtime_dir import runtime_dir, secret
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_PATH = os.path.join(ROOT_DIR, 'speech_worker.log')
+
+
+def worker_address():
+    """(address, family) of the worker's listener"""
+    if os.name == 'nt':
+        return (SPEECH_WORKER_HOST, SPEECH_WORKER_PORT), 'AF_INET'
+    return os.path.join(runtime_dir(), 'speech-worker.sock'), 'AF_UNIX'
+
+
+def worker_authkey():
+    return secret('speech-worker.key').encode('ascii')
+
+
+def _connect():
+    address, family = worker_address()
+    return Client(address, family=family, authkey=worker_authkey())
+
+
+class RemoteSpeechBackend(SpeechBackend):
+    """SpeechBackend proxy for a model loaded in the speech worker process"""
+    name = "worker"
+
+    def __init__(self, model_name, device=None):
+        super().__init__(model_name)
+        self._lock = threading.Lock()
+        self._conn = _connect()
+        self._description = self._request('load', model_name, device)
+
+    def _request(self, *message):
+        with self._lock:
+            self._conn.send(message)
+            status, value = self._conn.recv()
+        if status != 'ok':
+            raise RuntimeError(f"Speech worker error: {value}")
+        return value
+
+    def transcribe(self, audio, language):
+        return self._request('transcribe', self.model_name, audio, language)
+
+    def describe(self):
+        return f"{self.name}[{self._description}]"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def spawn_worker():
+    """Start a detached worker that keeps running after the agent exits"""
+    options = {}
+    if os.name == 'nt':
+        options['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options['start_new_session'] = True
+    log = open(LOG_PATH, 'ab')
+    try:
+        return subprocess.Popen([sys.executable, '-m', 'services.speech_worker'], cwd=ROOT_DIR,
+                                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **options)
+    finally:
+        log.close()
+
+
+def connect_backend(spec, device=None, start_timeout=30.0):
+    """Connect to the speech worker (starting it if needed) and load `spec` there"""
+    try:
+        return RemoteSpeechBackend(spec, device=device)
+    except (ConnectionRefusedError, FileNotFoundError):
+        pass
+
+    print(f"Запуск процесса распознавания речи (журнал: {LOG_PATH})")
+    process = spawn_worker()
+    deadline = time.time() + start_timeout
+    while True:
+        try:
+            return RemoteSpeechBackend(spec, device=device)
+        except (ConnectionRefusedError, FileNotFoundError):
+            if process.poll() is not None:
+                raise RuntimeError(f"Speech worker exited with code {process.returncode}, see {LOG_PATH}")
+            if time.time() > deadline:
+                raise RuntimeError(f"Speech worker did not start within {start_timeout:.0f} s")
+            time.sleep(0.2)
+
+
+class SpeechWorker:
+    def __init__(self):
+        self.address, self.family = worker_address()
+        self.authkey = worker_authkey()
+        self.listener = None
+        self.stopped = threading.Event()
+        # spec -> (backend, lock); a model is used by one request at a time
+        self.backends = {}
+        self.backends_lock = threading.Lock()
+
+    def get_backend(self, spec, device=None):
+        with self.backends_lock:
+            if spec not in self.backends:
+                start = time.time()
+                backend = create_backend(spec, device=device)
+                self.backends[spec] = (backend, threading.Lock())
+                print(f"Loaded {backend.describe()} in {time.time() - start:.1f} s", flush=True)
+            return self.backends[spec]
+
+    def handle(self, message):
+        kind = message[0]
+        if kind == 'load':
+            _, spec, device = message
+            backend, _ = self.get_backend(spec, device)
+            return backend.describe()
+        if kind == 'transcribe':
+            _, spec, audio, language = message
+            backend, lock = self.get_backend(spec)
+            with lock:
+                return backend.transcribe(audio, language)
+        if kind == 'shutdown':
+            return None
+        raise ValueError(f"Unknown request '{kind}'")
+
+    def serve_connection(self, conn):
+        with conn:
+            while not self.stopped.is_set():
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ('ok', self.handle(message))
+                except Exception as e:
+                    reply = ('error', f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return
+                if message[0] == 'shutdown':
+                    self.stopped.set()
+
+    def accept_loop(self):
+        while not self.stopped.is_set():
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                return
+            except Exception as e:
+                print(f"Rejected connection: {e}", flush=True)
+                continue
+            threading.Thread(target=self.serve_connection, args=(conn,), daemon=True).start()
+
+    def serve_forever(self):
+        if self.family == 'AF_UNIX' and os.path.exists(self.address):
+            # A socket left by a worker that did not shut down cleanly
+            try:
+                _connect().close()
+                print("Speech worker is already running", flush=True)
+                return
+            except ConnectionRefusedError:
+                os.unlink(self.address)
+        self.listener = Listener(self.address, family=self.family, authkey=self.authkey)
+        print(f"Speech worker listening on {self.address}", flush=True)
+        # A blocking accept() is not interrupted by closing the socket on Linux,
+        # so it runs in a daemon thread and the main thread waits for shutdown
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+        try:
+            while not self.stopped.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.listener.close()
+        print("Speech worker stopped", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent speech recognition worker")
+    parser.add_argument('--preload', default='', help="Comma separated --voice-model values to load at start")
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--stop', action='store_true', help="Stop a running worker")
+    args = parser.parse_args(argv)
+
+    if args.stop:
+        try:
+            conn = _connect()
+        except (ConnectionRefusedError, FileNotFoundError):
+            print("Speech worker is not running")
+            return 1
+        with conn:
+            conn.send(('shutdown',))
+            conn.recv()
+        return 0
+
+    worker = SpeechWorker()
+    for spec in filter(None, (s.strip() for s in args.preload.split(','))):
+        worker.get_backend(spec, args.device)
+    worker.serve_forever()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Import-time breakdown of agent startup (python main.py --profile-startup).
+
+The startup path is replayed in a fresh interpreter under `-X importtime`,
+stage by stage (the main module, then voice input, the daemon and the LLM
+client when the given options would use them), and the report shows the
+wall time of every stage, the slowest imports and the import time per
+top-level package.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _stage_voice():
+    import services.voice_input
+
+
+def _stage_daemon():
+    import services.agent_daemon
+
+
+def _stage_llm_client():
+    from services.openrouter_api import get_client
+    get_client()
+
+
+STAGES = {
+    'voice': ('voice input', _stage_voice),
+    'daemon': ('daemon API', _stage_daemon),
+    'llm': ('LLM client', _stage_llm_client),
+}
+
+
+def run_stages(stages):
+    """Child side: time each stage and print the timings as JSON on stdout"""
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    os.chdir(ROOT_DIR)
+    timings = []
+    start = time.perf_counter()
+    import main
+    timings.append(('import main', (time.perf_counter() - start) * 1000.0, None))
+    for key in stages:
+        label, fn = STAGES[key]
+        stage_start = time.perf_counter()
+        try:
+            fn()
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        timings.append((label, (time.perf_counter() - stage_start) * 1000.0, error))
+    print(json.dumps({'stages': timings, 'modules': sorted(sys.modules)}))
+
+
+def parse_importtime(text):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    records = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        records.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def profile(stages, top=20):
+    """Runs the stages under -X importtime; returns (stage timings, import records, loaded modules)"""
+    command = [sys.executable, '-X', 'importtime', '-m', 'services.startup_profile', '--child', ','.join(stages)]
+    completed = subprocess.run(command, cwd=ROOT_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup profile failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result['stages'], parse_importtime(completed.stderr), result['modules']
+
+
+def print_report(stage_timings, records, top=20):
+    print(f"{'stage':<16} {'ms':>9}")
+    for label, ms, error in stage_timings:
+        print(f"{label:<16} {ms:>9.1f}" + (f"  ({error})" if error else ""))
+    print(f"{'total':<16} {sum(ms for _, ms, _ in stage_timings):>9.1f}")
+
+    print("\nSlowest top-level imports:")
+    print(f"{'module':<48} {'self ms':>9} {'total ms':>9}")
+    outermost = [r for r in records if r[3] == 0]
+    for name, self_us, cumulative_us, _ in sorted(outermost, key=lambda r: -r[2])[:top]:
+        print(f"{name:<48} {self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}")
+
+    packages = defaultdict(int)
+    for name, self_us, _, _ in records:
+        packages[name.split('.')[0]] += self_us
+    print("\nImport time by package:")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<48} {self_us / 1000:>9.1f}")
+
+
+def stages_for(use_voice, daemon):
+    """The stages a run with these options goes through before its first step"""
+    stages = []
+    if use_voice:
+        stages.append('voice')
+    if daemon:
+        stages.append('daemon')
+    stages.append('llm')
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time breakdown of agent startup")
+    parser.add_argument('--no-voice', action='store_true')
+    parser.add_argument('--daemon', action='store_true')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        run_stages([stage for stage in args.child.split(',') if stage])
+        return 0
+
+    stage_timings, records, _ = profile(stages_for(not args.no_voice, args.daemon))
+    print_report(stage_timings, records, args.top)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
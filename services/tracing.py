@@ -0,0 +1,212 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+from config import TRACE_ENABLED, TRACE_DIR
+
+# Global tracing state. When tracing is disabled span() hands out a shared
+# no-op object, so instrumented code pays one global lookup per span.
+_enabled = False
+_lock = threading.Lock()
+_epoch = time.perf_counter()
+_pid = os.getpid()
+_events = []
+_thread_names = {}
+_listeners = []
+_jsonl_file = None
+_chrome_path = None
+_flushes = 0
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """A timed section of work with arbitrary attributes (bytes, tokens, cell ids...)"""
+    __slots__ = ('name', 'attrs', 'start')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        _record(self.name, self.start, end, self.attrs)
+        return False
+
+    def end(self):
+        self.__exit__(None, None, None)
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name, **attrs):
+    """Return a context manager timing the enclosed block as a span called `name`"""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+
+def start_span(name, **attrs):
+    """Start a span finished explicitly with .end(), for sections that don't fit a with-block"""
+    return span(name, **attrs).__enter__()
+
+
+def sleep(seconds, reason=None, token=None):
+    """
+    time.sleep() that shows up in the trace as a 'sleep' span; with a
+    CancellationToken the sleep ends early by raising CancelledError
+    """
+    with span('sleep', seconds=seconds, reason=reason):
+        if token is None:
+            time.sleep(seconds)
+        else:
+            token.sleep(seconds)
+
+
+def add_listener(listener):
+    """Register a callable receiving every finished span as a dict"""
+    with _lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def _record(name, start, end, attrs):
+    thread = threading.current_thread()
+    tid = thread.ident or 0
+    ts_us = (start - _epoch) * 1e6
+    dur_us = (end - start) * 1e6
+    record = {
+        'name': name,
+        'ts_us': round(ts_us, 1),
+        'dur_us': round(dur_us, 1),
+        'thread': thread.name,
+        'attrs': attrs,
+    }
+    with _lock:
+        if tid not in _thread_names:
+            _thread_names[tid] = thread.name
+        _events.append({
+            'name': name,
+            'ph': 'X',
+            'ts': ts_us,
+            'dur': dur_us,
+            'pid': _pid,
+            'tid': tid,
+            'args': attrs,
+        })
+        if _jsonl_file is not None:
+            _jsonl_file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(record)
+        except Exception as e:
+            print(f"Error in trace listener: {e}")
+
+
+def enable(directory=TRACE_DIR, write_files=True):
+    """
+    Turn tracing on.
+
+    Finished spans are streamed to <directory>/trace-<timestamp>.jsonl as they
+    complete; the Chrome trace (<directory>/trace-<timestamp>.json, loadable in
+    chrome://tracing or Perfetto) is written by flush(), later flushes to
+    trace-<timestamp>-2.json and so on.
+    """
+    global _enabled, _jsonl_file, _chrome_path
+    with _lock:
+        if _enabled:
+            return _chrome_path
+        if write_files:
+            os.makedirs(directory, exist_ok=True)
+            stamp = time.strftime('%Y%m%d-%H%M%S')
+            base = os.path.join(directory, f'trace-{stamp}-{_pid}')
+            _jsonl_file = open(base + '.jsonl', 'w', encoding='utf8', buffering=1)
+            _chrome_path = base + '.json'
+        _enabled = True
+    if _chrome_path:
+        print(f"Tracing enabled: {_chrome_path}")
+    return _chrome_path
+
+
+def get_events():
+    """Return a copy of the Chrome trace events recorded since the last flush"""
+    with _lock:
+        return list(_events)
+
+
+def flush():
+    """
+    Write the spans recorded since the previous flush to a new Chrome trace
+    file and drop them from memory, so a long-running process (the daemon
+    flushes after every task) keeps only the current part. Returns its path.
+    """
+    global _events, _flushes
+    with _lock:
+        if not _chrome_path or (_flushes and not _events):
+            return None
+        events, _events = _events, []
+        _flushes += 1
+        path = _chrome_path if _flushes == 1 else f"{_chrome_path[:-len('.json')]}-{_flushes}.json"
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': _pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in _thread_names.items()
+        ]
+    # Written outside the lock: spans finishing meanwhile go to the next part
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+    return path
+
+
+def disable():
+    """Flush the trace files and stop recording spans"""
+    global _enabled, _jsonl_file
+    path = flush()
+    with _lock:
+        _enabled = False
+        if _jsonl_file is not None:
+            _jsonl_file.close()
+            _jsonl_file = None
+    return path
+
+
+# Processes started by multiprocessing (image pool workers, batch agents)
+# record spans only when they call enable() themselves
+if TRACE_ENABLED and multiprocessing.current_process().name == 'MainProcess':
+    enable()
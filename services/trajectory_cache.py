@@ -0,0 +1,212 @@
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from services import tracing
+from config import TRAJECTORY_CACHE_PATH, TRAJECTORY_MATCH_DISTANCE, TRAJECTORY_MAX_PER_TASK, TRAJECTORY_STORE_TEXT
+
+# Trajectory cache: command sequences of finished runs, replayed for repeated tasks.
+#
+# A run is recorded step by step: the fingerprint of the screen the step was
+# planned on (checkpoint) and the commands of that step that ran and had an
+# effect. When the model ends the run with "listen" (task done), the steps
+# are stored under the normalized task text, together with the fingerprints
+# of the start and the final screen. A later run of the same task from a
+# similar start screen replays the steps locally while every checkpoint
+# still matches the screen, and hands over to the LLM at the first one that
+# does not. A replay counts as done only if it ends on a screen matching
+# the recorded final one; otherwise the model checks the result.
+#
+# Runs that typed text are not stored unless TRAJECTORY_STORE_TEXT is set:
+# the cache file would keep the typed strings in plaintext.
+#
+# Fingerprints are 256-bit difference hashes (16x16 grayscale gradients):
+# a clock or a blinking caret flips a bit or two, a different window or
+# dialog flips dozens. Two screens match within TRAJECTORY_MATCH_DISTANCE bits.
+
+HASH_SIDE = 16
+
+_store_lock = threading.Lock()
+
+
+def normalize_task(task):
+    """Lowercase, punctuation-free, single-spaced task text"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', task.lower()).split())
+
+
+def fingerprint(frame):
+    """256-bit difference hash of a screenshot as a hex string"""
+    image = Image.fromarray(frame) if isinstance(frame, np.ndarray) else frame
+    pixels = np.asarray(image.convert('L').resize((HASH_SIDE + 1, HASH_SIDE), Image.Resampling.BILINEAR),
+                        dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return '%064x' % int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def distance(a, b):
+    """Number of differing bits between two fingerprints"""
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def _load(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Trajectory cache unreadable, starting empty: {e}")
+        return {}
+
+
+def _save(path, store):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(store, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+def lookup(task, start_frame, path=TRAJECTORY_CACHE_PATH, max_distance=TRAJECTORY_MATCH_DISTANCE):
+    """
+    The stored trajectory for `task` whose start screen is closest to
+    `start_frame` (within `max_distance` bits), or None.
+    """
+    start_hash = fingerprint(start_frame)
+    with _store_lock:
+        candidates = _load(path).get(normalize_task(task), [])
+    best = None
+    for trajectory in candidates:
+        d = distance(start_hash, trajectory['start'])
+        if d <= max_distance and (best is None or d < best[0]):
+            best = (d, trajectory)
+    return best[1] if best else None
+
+
+def store(task, trajectory, path=TRAJECTORY_CACHE_PATH, max_distance=TRAJECTORY_MATCH_DISTANCE,
+          max_per_task=TRAJECTORY_MAX_PER_TASK):
+    """Save `trajectory`, replacing the stored one for a similar start screen"""
+    key = normalize_task(task)
+    with _store_lock:
+        data = _load(path)
+        kept = [t for t in data.get(key, []) if distance(t['start'], trajectory['start']) > max_distance]
+        data[key] = (kept + [trajectory])[-max_per_task:]
+        _save(path, data)
+
+
+def mark_replayed(task, trajectory, path=TRAJECTORY_CACHE_PATH):
+    """Count a full replay of a stored trajectory"""
+    key = normalize_task(task)
+    with _store_lock:
+        data = _load(path)
+        for stored in data.get(key, []):
+            if stored['created'] == trajectory['created'] and stored['start'] == trajectory['start']:
+                stored['replays'] = stored.get('replays', 0) + 1
+                stored['last_replayed'] = time.time()
+                _save(path, data)
+                return
+
+
+def _replayable(command, result):
+    """The command to store for a result, or None if it did not run or had no effect"""
+    if not result.get('success') or result.get('verified') is False:
+        return None
+    if command['command'] == 'move_cursor_to_element':
+        # Replay the position the element was found at instead of locating it again
+        if not result.get('position'):
+            return None
+        x, y = result['position']
+        return {'command': 'move_cursor_absolute', 'params': {'x': int(x), 'y': int(y)}}
+    return command
+
+
+class TrajectoryRecorder:
+    """Collects the steps of one run; save() stores them once the task is done"""
+
+    def __init__(self, task, start_frame):
+        self.task = task
+        self.start = fingerprint(start_frame)
+        self.steps = []
+        # A run that depended on user input is not replayed blindly
+        self.interactive = False
+        # A run that typed text is stored only with TRAJECTORY_STORE_TEXT
+        self.typed_text = False
+
+    def add_step(self, frame, commands, results):
+        recorded = []
+        for command, result in zip(commands, results):
+            if command['command'] == 'enter_text':
+                self.typed_text = True
+            replayable = _replayable(command, result)
+            if replayable is not None:
+                recorded.append(replayable)
+        if recorded:
+            self.steps.append({'checkpoint': fingerprint(frame), 'commands': recorded})
+
+    def finished(self):
+        """True once the last step ended the task with "listen" """
+        return bool(self.steps) and self.steps[-1]['commands'][-1]['command'] == 'listen'
+
+    def save(self, final_frame, path=TRAJECTORY_CACHE_PATH, store_text=TRAJECTORY_STORE_TEXT):
+        """Store the finished run with `final_frame`, the screen it ended on; False if it is not stored"""
+        if self.interactive or not self.finished():
+            return False
+        if self.typed_text and not store_text:
+            print("Trajectory not stored: the run typed text (TRAJECTORY_STORE_TEXT is off)")
+            return False
+        store(self.task, {'start': self.start, 'final': fingerprint(final_frame), 'steps': self.steps,
+                          'created': time.time(), 'replays': 0}, path)
+        return True
+
+
+def replay(trajectory, grab, execute, recorder=None, max_distance=TRAJECTORY_MATCH_DISTANCE):
+    """
+    Replays the steps of `trajectory` while the screen matches their
+    checkpoints. `grab()` returns the settled current screen, `execute(commands)`
+    runs commands and returns their results. Replayed steps are added to
+    `recorder`. Returns (steps replayed, whether the whole trajectory ran
+    and ended on the recorded final screen).
+    """
+    steps = trajectory['steps']
+    for index, step in enumerate(steps):
+        frame = grab()
+        d = distance(fingerprint(frame), step['checkpoint'])
+        if d > max_distance:
+            print(f"Trajectory replay: screen differs from the recorded run at step {index + 1} "
+                  f"({d} bits), handing over to the model")
+            return index, False
+        commands = step['commands']
+        if index == len(steps) - 1:
+            # "listen" ends the task; it runs only once the final screen is checked
+            commands = [c for c in commands if c['command'] != 'listen']
+        with tracing.span('replay_step', step=index, commands=len(commands)):
+            results = execute(commands) if commands else []
+        if recorder is not None:
+            recorder.add_step(frame, commands, results)
+        if len(results) < len(commands) or not all(
+                r.get('success') and r.get('verified') is not False for r in results):
+            print(f"Trajectory replay: step {index + 1} did not go as recorded, handing over to the model")
+            return index + 1, False
+    final = trajectory.get('final')
+    d = distance(fingerprint(grab()), final) if final else None
+    if d is None or d > max_distance:
+        print(f"Trajectory replay: the final screen differs from the recorded run"
+              f"{f' ({d} bits)' if d is not None else ''}, handing over to the model")
+        return len(steps), False
+    execute([c for c in steps[-1]['commands'] if c['command'] == 'listen'])
+    return len(steps), True
+
+def describe(trajectory, replayed):
+    """Text for the model about the steps already done by replay"""
+    lines = [f"The first {replayed} step(s) of this task were replayed from a previous successful run:"]
+    for step in trajectory['steps'][:replayed]:
+        lines.append('- ' + ', '.join(json.dumps(c, ensure_ascii=False) for c in step['commands']))
+    lines.append("The screen no longer matches that run; check the current screenshot and continue the task "
+                 "from it.")
+    return '\n'.join(lines)
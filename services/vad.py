@@ -0,0 +1,123 @@
+import numpy as np
+
+
+class StreamingVAD:
+    """
+    Frame-level voice activity detector with an adaptive noise floor.
+
+    A frame (20 ms by default) counts as speech-like when all of these hold:
+      * its energy is `snr_db` above the tracked noise floor,
+      * its spectrum is not flat (spectral flatness below `max_flatness`;
+        fans, hum and hiss are broadband, voiced speech is harmonic),
+      * its mean absolute level is above `min_level`.
+    `onset_ms` of consecutive speech-like frames open a segment, which stays
+    open through pauses shorter than `hangover_ms`. Closed segments start
+    `preroll_ms` before the detected onset so the first syllable is kept,
+    segments with less than `min_speech_ms` of speech-like frames are
+    dropped and segments are cut at `max_segment_ms`.
+
+    feed() takes whole frames and returns a list of events:
+      ('onset', onset_pos, detected_pos)
+      ('segment', start_pos, end_pos)
+      ('discard', start_pos, end_pos)
+    with positions in absolute samples.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=20, snr_db=9.0, max_flatness=0.45,
+                 min_level=0.005, onset_ms=60, hangover_ms=300, preroll_ms=300,
+                 min_speech_ms=200, max_segment_ms=3000, low_hz=100, high_hz=4000):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.frame_ms = frame_ms
+        self.snr_db = snr_db
+        self.max_flatness = max_flatness
+        self.min_level = min_level
+        self.onset_frames = max(1, int(round(onset_ms / frame_ms)))
+        self.hangover_frames = max(1, int(round(hangover_ms / frame_ms)))
+        self.preroll_samples = int(sample_rate * preroll_ms / 1000)
+        self.min_speech_frames = max(1, int(round(min_speech_ms / frame_ms)))
+        self.max_segment_samples = int(sample_rate * max_segment_ms / 1000)
+
+        self._window = np.hanning(self.frame_length).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame_length, 1.0 / sample_rate)
+        self._band = (freqs >= low_hz) & (freqs <= high_hz)
+
+        # Noise floor in dB: follows quieter frames quickly and louder ones slowly,
+        # so it settles on the background level and is not dragged up by speech.
+        self.noise_floor_db = None
+        self.floor_attack = 0.2
+        self.floor_release = 0.01
+
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.run_length = 0
+        self.run_start = 0
+        self.silence_frames = 0
+        self.speech_frames = 0
+        self.onset_pos = 0
+        self.segment_start = 0
+
+    def frame_features(self, frames):
+        """Energy (dB), spectral flatness and mean |x| for a (n, frame_length) array"""
+        energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2
+        power = power[:, self._band] + 1e-12
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        level = np.mean(np.abs(frames), axis=1)
+        return energy_db, flatness, level
+
+    def feed(self, samples, start_pos):
+        """Process len(samples) // frame_length whole frames starting at absolute position start_pos"""
+        count = samples.shape[0] // self.frame_length
+        if count == 0:
+            return []
+        frames = samples[:count * self.frame_length].reshape(count, self.frame_length)
+        energy_db, flatness, level = self.frame_features(frames)
+
+        if self.noise_floor_db is None:
+            self.noise_floor_db = float(np.min(energy_db))
+
+        events = []
+        for i in range(count):
+            frame_pos = start_pos + i * self.frame_length
+            speech_like = (energy_db[i] > self.noise_floor_db + self.snr_db and
+                           flatness[i] < self.max_flatness and
+                           level[i] > self.min_level)
+
+            if not speech_like:
+                rate = self.floor_attack if energy_db[i] < self.noise_floor_db else self.floor_release
+                self.noise_floor_db += rate * (energy_db[i] - self.noise_floor_db)
+
+            frame_end = frame_pos + self.frame_length
+            if not self.in_speech:
+                if speech_like:
+                    if self.run_length == 0:
+                        self.run_start = frame_pos
+                    self.run_length += 1
+                    if self.run_length >= self.onset_frames:
+                        self.in_speech = True
+                        self.onset_pos = self.run_start
+                        self.segment_start = max(0, self.run_start - self.preroll_samples)
+                        self.speech_frames = self.run_length
+                        self.silence_frames = 0
+                        events.append(('onset', self.onset_pos, frame_end))
+                else:
+                    self.run_length = 0
+                continue
+
+            if speech_like:
+                self.speech_frames += 1
+                self.silence_frames = 0
+            else:
+                self.silence_frames += 1
+
+            too_long = frame_end - self.segment_start >= self.max_segment_samples
+            if self.silence_frames >= self.hangover_frames or too_long:
+                kind = 'segment' if self.speech_frames >= self.min_speech_frames else 'discard'
+                events.append((kind, self.segment_start, frame_end))
+                self.in_speech = False
+                self.run_length = 0
+
+        return events
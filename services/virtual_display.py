@@ -0,0 +1,92 @@
+import os
+import select
+import shutil
+import subprocess
+import time
+
+
+class VirtualDisplay:
+    """
+    A private Xvfb server.
+
+    The display number is picked by Xvfb itself (-displayfd), so several
+    instances can run side by side. Use as a context manager or call
+    start()/stop(); env() returns an environment for child processes that
+    should draw to / capture from this display.
+    """
+
+    def __init__(self, width=1280, height=720, depth=24, start_timeout=10.0):
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.start_timeout = start_timeout
+        self.process = None
+        self.display = None
+
+    def start(self):
+        if self.process is not None:
+            return self.display
+
+        xvfb = shutil.which('Xvfb')
+        if xvfb is None:
+            raise RuntimeError("Xvfb not found. Install it (e.g. apt install xvfb) to use virtual displays.")
+
+        read_fd, write_fd = os.pipe()
+        self.process = subprocess.Popen(
+            [xvfb, '-displayfd', str(write_fd), '-screen', '0',
+             f'{self.width}x{self.height}x{self.depth}', '-nolisten', 'tcp', '-ac'],
+            pass_fds=(write_fd,),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        os.close(write_fd)
+
+        # Xvfb writes the display number followed by a newline once it accepts connections
+        deadline = time.time() + self.start_timeout
+        number = b''
+        try:
+            while not number.endswith(b'\n'):
+                remaining = deadline - time.time()
+                if remaining <= 0 or self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("Xvfb failed to start")
+                # Wait for output with the remaining timeout; a plain read would block on a hung Xvfb
+                readable, _, _ = select.select([read_fd], [], [], min(remaining, 0.1))
+                if not readable:
+                    continue
+                chunk = os.read(read_fd, 64)
+                if not chunk:
+                    self.stop()
+                    raise RuntimeError("Xvfb failed to start")
+                number += chunk
+        finally:
+            os.close(read_fd)
+
+        self.display = f':{number.decode().strip()}'
+        return self.display
+
+    def env(self, base=None):
+        """Copy of `base` (default: os.environ) pointing DISPLAY at this server"""
+        env = dict(os.environ if base is None else base)
+        env['DISPLAY'] = self.display
+        return env
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+        self.display = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
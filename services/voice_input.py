@@ -3,49 +3,47 @@ import queue
 import time
 import numpy as np
 import sounddevice as sd
-import os
-import torch
 import concurrent.futures
 
-# Импортируем Whisper (с учётом альтернативных путей)
-try:
-    import openai.whisper as whisper
-except ImportError:
-    try:
-        from openai import whisper
-    except ImportError:
-        try:
-            import whisper
-        except ImportError:
-            print("ERROR: Не удалось импортировать whisper. Установите его через: pip install git+https://github.com/openai/whisper.git")
-            whisper = None
+from services.audio_buffer import AudioRingBuffer
+from services.vad import StreamingVAD
+from services.speech_backends import create_backend
+from services.keyword_spotter import KeywordSpotter, load_templates
+from services import metrics
+
 
 class VoiceInputProcessor:
-    def __init__(self, model_name="tiny", language="ru", sample_rate=16000, device=None, vad_threshold=0.05, callback=None):
+    def __init__(self, model_name="tiny", language="ru", sample_rate=16000, device=None, vad_threshold=0.01, callback=None,
+                 worker=False, keyword_callback=None):
         """
         Инициализация процессора голосового ввода.
         
         Args:
-            model_name: Размер модели Whisper ("tiny", "base", "small", "medium", "large")
+            model_name: Модель распознавания: размер Whisper ("tiny", "base", "small", "medium", "large")
+                или "ct2:<размер>" для int8-движка CTranslate2 (см. services/speech_backends.py)
             language: Языковой код для распознавания речи
             sample_rate: Частота дискретизации аудио в Гц
-            device: Устройство PyTorch (None для автоопределения)
-            vad_threshold: Порог для обнаружения голосовой активности (выше = менее чувствительно)
+            device: Устройство для модели (None для автоопределения)
+            vad_threshold: Минимальный средний уровень кадра речи (выше = менее чувствительно);
+                основной критерий - превышение адаптивного уровня шума, см. services/vad.py
             callback: Функция обратного вызова для мгновенной передачи распознанного текста
+            worker: Распознавать в постоянном процессе services/speech_worker.py,
+                который держит модель загруженной между запусками агента
+            keyword_callback: Функция (action, score), вызываемая детектором ключевых слов
+                (стоп/пауза/продолжай) сразу после команды, без ожидания распознавания
         """
-        if whisper is None:
-            raise ImportError("Модуль Whisper не найден. Голосовой ввод отключён.")
-            
         self.model_name = model_name
         self.language = language
         self.sample_rate = sample_rate
-        self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
-        self.use_fp16 = self.device == "cuda"
+        self.device = device
+        self.worker = worker
         
-        print(f"Загрузка модели Whisper {model_name} на {self.device}...")
-        self.model = whisper.load_model(model_name, device=self.device, download_root=os.path.join(os.path.expanduser("~"), ".cache", "whisper"))
-        self.model.eval()
-        print("Модель Whisper успешно загружена")
+        # Модель загружается в фоне: агент стартует сразу, голос включается по готовности
+        self.backend = None
+        self.load_error = None
+        self.model_ready = threading.Event()
+        self.load_thread = threading.Thread(target=self._load_backend, daemon=True)
+        self.load_thread.start()
         
         self.audio_queue = queue.Queue()
         self.text_queue = queue.Queue()
@@ -57,11 +55,43 @@ class VoiceInputProcessor:
         self.silence_duration = 0.3        # Уменьшено для более быстрого завершения записи после паузы
         self.max_record_duration = 3.0     # Ограничиваем максимальную длительность для быстрой обработки
         self.min_speech_duration = 0.2     # Минимальная длительность, чтобы считаться речью
+        self.preroll_duration = 0.3        # Сколько аудио до начала речи сохранять, чтобы не обрезать первый слог
         
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
         self.futures = []
-        self.audio_buffer = []
-        self.last_speech_time = 0
+        # Кольцевой буфер фиксированного размера: колбэк аудиопотока ничего не выделяет,
+        # а сегменты речи передаются в очередь как представления (views) без копирования.
+        # Запас по ёмкости нужен, чтобы поток обработки успел скопировать сегмент до перезаписи.
+        # Блоки по 50 мс: колбэк дешёвый, а детекторы получают звук без лишней задержки
+        self.block_size = int(sample_rate * 0.05)
+        self.buffer_duration = 30.0
+        self.ring = AudioRingBuffer(int(sample_rate * self.buffer_duration), max_block=sample_rate)
+        self.audio_event = threading.Event()
+        self.vad_thread = None
+        self.vad_pos = 0
+        self.vad = StreamingVAD(
+            sample_rate=sample_rate,
+            min_level=vad_threshold,
+            hangover_ms=self.silence_duration * 1000,
+            preroll_ms=self.preroll_duration * 1000,
+            min_speech_ms=self.min_speech_duration * 1000,
+            max_segment_ms=self.max_record_duration * 1000
+        )
+        
+        # Детектор ключевых слов работает в своём потоке по тому же кольцевому буферу
+        self.keyword_callback = keyword_callback
+        self.spotter = None
+        self.kws_event = threading.Event()
+        self.kws_thread = None
+        self.kws_pos = 0
+        if keyword_callback:
+            templates = load_templates()
+            if templates:
+                self.spotter = KeywordSpotter(templates, sample_rate=sample_rate)
+                print(f"Детектор ключевых слов: {', '.join(templates)}")
+            else:
+                print("Шаблоны ключевых слов не записаны: python -m services.keyword_spotter --enroll stop")
+        
         self.recording_start_time = 0
         self.is_recording = False
         
@@ -70,81 +100,149 @@ class VoiceInputProcessor:
         # Добавляем индикатор состояния распознавания для пользователя
         self.processing_indicator = False
     
+    def _load_backend(self):
+        """Загрузка модели распознавания в фоновом потоке"""
+        source = "в процессе распознавания" if self.worker else "в фоне"
+        print(f"Загрузка модели распознавания {self.model_name} {source}...")
+        start_time = time.time()
+        try:
+            if self.worker:
+                from services.speech_worker import connect_backend
+                self.backend = connect_backend(self.model_name, device=self.device)
+            else:
+                self.backend = create_backend(self.model_name, device=self.device)
+        except Exception as e:
+            self.load_error = e
+            print(f"Не удалось загрузить модель распознавания: {e}")
+            return
+        self.model_ready.set()
+        print(f"Модель распознавания загружена за {time.time() - start_time:.1f} с: {self.backend.describe()}")
+    
+    def is_ready(self):
+        """Загружена ли модель распознавания"""
+        return self.model_ready.is_set()
+    
+    def wait_ready(self, timeout=None):
+        """Дождаться загрузки модели; возвращает True, если она готова"""
+        return self.model_ready.wait(timeout)
+    
     def audio_callback(self, indata, frames, time_info, status):
         """Callback для sounddevice для захвата аудио данных"""
         if status:
             print(f"Audio callback status: {status}")
         
-        audio_data = indata.copy()
-        if audio_data.shape[1] > 1:
-            audio_data = np.mean(audio_data, axis=1)
-        else:
-            audio_data = audio_data.flatten()
-        
-        self.audio_buffer.extend(audio_data.tolist())
-        
-        energy = np.mean(np.abs(audio_data))
-        current_time = time.time()
-        
-        if energy > self.vad_threshold:
-            if not self.is_recording:
-                self.is_recording = True
-                self.recording_start_time = current_time
-                print("Речь обнаружена, запись началась...")
-            self.last_speech_time = current_time
-        
-        if self.is_recording:
-            recording_duration = current_time - self.recording_start_time
-            silence_duration = current_time - self.last_speech_time
+        # Колбэк только копирует блок в кольцевой буфер; детектор речи работает в своём потоке
+        self.ring.write_frames(indata)
+        self.audio_event.set()
+        self.kws_event.set()
+    
+    def _vad_loop(self):
+        """Поток детектора речи: разбирает новые кадры из кольцевого буфера"""
+        frame_length = self.vad.frame_length
+        while self.is_running:
+            self.audio_event.wait(timeout=0.1)
+            self.audio_event.clear()
             
-            # Проверяем, нужно ли завершить запись
-            if (silence_duration >= self.silence_duration or 
-                recording_duration >= self.max_record_duration):
-                if recording_duration >= self.min_speech_duration:
-                    audio_array = np.array(self.audio_buffer, dtype=np.float32)
-                    self.audio_queue.put(audio_array)
-                    self.processing_indicator = True  # Включаем индикатор обработки
-                    print(f"Добавлено {recording_duration:.2f} с аудио в очередь на обработку")
-                else:
-                    print(f"Запись отброшена - слишком короткая ({recording_duration:.2f}с)")
-                self.audio_buffer = []
+            if not self.ring.is_valid(self.vad_pos):
+                # Детектор отстал больше чем на длину буфера - начинаем заново с текущей позиции
+                print("Детектор речи не успевает за аудиопотоком, сбрасываю состояние")
+                self.vad_pos = self.ring.write_pos
+                self.vad.reset()
                 self.is_recording = False
+                continue
+            
+            available = (self.ring.write_pos - self.vad_pos) // frame_length * frame_length
+            if available <= 0:
+                continue
+            
+            samples = self.ring.view(self.vad_pos, self.vad_pos + available)
+            events = self.vad.feed(samples, self.vad_pos)
+            self.vad_pos += available
+            for event in events:
+                self._handle_vad_event(*event)
+    
+    def _kws_loop(self):
+        """Поток детектора ключевых слов"""
+        while self.is_running:
+            self.kws_event.wait(timeout=0.1)
+            self.kws_event.clear()
+            
+            if not self.ring.is_valid(self.kws_pos):
+                self.kws_pos = self.ring.write_pos
+                self.spotter.reset()
+                continue
+            
+            end = self.ring.write_pos
+            if end <= self.kws_pos:
+                continue
+            detections = self.spotter.feed(self.ring.view(self.kws_pos, end), self.kws_pos)
+            self.kws_pos = end
+            for action, score, _ in detections:
+                print(f"Ключевое слово: {action} (расстояние {score:.2f})")
+                try:
+                    self.keyword_callback(action, score)
+                except Exception as e:
+                    print(f"Ошибка обработки ключевого слова: {e}")
+    
+    def _handle_vad_event(self, kind, start, end):
+        if kind == 'onset':
+            self.is_recording = True
+            self.recording_start_time = time.time()
+            print("Речь обнаружена, запись началась...")
+            return
+        
+        self.is_recording = False
+        duration = (end - start) / self.sample_rate
+        if kind == 'segment':
+            # Передаём представление буфера; копию делает поток обработки
+            segment = self.ring.view(start, end)
+            self.audio_queue.put((start, segment))
+            self.processing_indicator = True  # Включаем индикатор обработки
+            print(f"Добавлено {duration:.2f} с аудио в очередь на обработку")
+        else:
+            print(f"Запись отброшена - слишком мало речи ({duration:.2f}с)")
     
     def _transcribe_audio(self, audio_data):
         """Распознавание аудио данных в отдельном потоке"""
         print("Начало распознавания...")
         start_time = time.time()
         
-        # Ускорение распознавания для маленьких моделей
-        if self.model_name in ["tiny", "base"]:
-            # Уменьшаем complexity для более быстрого распознавания
-            result = self.model.transcribe(
-                audio_data, 
-                language=self.language, 
-                fp16=self.use_fp16,
-                beam_size=3        # Уменьшаем размер луча для быстроты
-            )
-        else:
-            result = self.model.transcribe(audio_data, language=self.language, fp16=self.use_fp16)
+        transcription = self.backend.transcribe(audio_data, self.language)
             
         end_time = time.time()
-        transcription = result["text"].strip()
-        print(f"Распознавание завершено за {end_time - start_time:.2f} секунд: '{transcription}'")
+        rtf = (end_time - start_time) / (len(audio_data) / self.sample_rate)
+        metrics.VOICE_RTF.observe(rtf)
+        print(f"Распознавание завершено за {end_time - start_time:.2f} секунд (RTF {rtf:.2f}): '{transcription}'")
         self.processing_indicator = False  # Выключаем индикатор обработки
         return transcription if transcription else None
     
     def process_audio_queue(self):
-        """Обработка аудио очереди с использованием Whisper"""
+        """Обработка аудио очереди выбранным движком распознавания"""
         while self.is_running:
             try:
                 # Установим меньший таймаут для более быстрого реагирования на завершение
-                audio_data = self.audio_queue.get(timeout=0.2)
+                segment_start, segment = self.audio_queue.get(timeout=0.2)
                 queue_size = self.audio_queue.qsize()
                 if queue_size > 0:
                     print(f"В очереди еще {queue_size} аудиофрагментов")
+                
+                # Копируем сегмент из кольцевого буфера и проверяем, что его не успели перезаписать
+                audio_data = np.array(segment, dtype=np.float32)
+                if not self.ring.is_valid(segment_start):
+                    print("Аудиофрагмент перезаписан до обработки, пропускаю")
+                    self.processing_indicator = False
+                    self.audio_queue.task_done()
+                    continue
+                
+                if not self.model_ready.is_set():
+                    print("Модель распознавания ещё загружается, фрагмент пропущен")
+                    self.processing_indicator = False
+                    self.audio_queue.task_done()
+                    continue
                     
-                if np.max(np.abs(audio_data)) > 0:
-                    audio_data = audio_data / np.max(np.abs(audio_data))
+                peak = np.max(np.abs(audio_data)) if audio_data.size else 0
+                if peak > 0:
+                    audio_data /= peak
                 
                 # Отменяем все незавершенные задачи распознавания при добавлении новой
                 # чтобы не создавать большую очередь обработки
@@ -202,11 +300,23 @@ class VoiceInputProcessor:
         self.thread.daemon = True
         self.thread.start()
         
+        self.vad_pos = self.ring.write_pos
+        self.vad.reset()
+        self.vad_thread = threading.Thread(target=self._vad_loop, daemon=True)
+        self.vad_thread.start()
+        
+        if self.spotter:
+            self.kws_pos = self.ring.write_pos
+            self.spotter.reset()
+            self.kws_thread = threading.Thread(target=self._kws_loop, daemon=True)
+            self.kws_thread.start()
+        
         self.stream = sd.InputStream(
             callback=self.audio_callback,
             channels=1,
             samplerate=self.sample_rate,
-            blocksize=int(self.sample_rate * 0.2)  # Уменьшаем блоки до 200 мс для более быстрой реакции
+            dtype='float32',
+            blocksize=self.block_size
         )
         self.stream.start()
         print("Процессор голосового ввода запущен")
@@ -226,6 +336,15 @@ class VoiceInputProcessor:
                 future.cancel()
         if self.thread:
             self.thread.join(timeout=2.0)
+        if self.vad_thread:
+            self.audio_event.set()
+            self.vad_thread.join(timeout=2.0)
+        if self.kws_thread:
+            self.kws_event.set()
+            self.kws_thread.join(timeout=2.0)
+        # Процесс распознавания продолжает работать и держит модель для следующего запуска
+        if self.worker and self.backend is not None:
+            self.backend.close()
         print("Процессор голосового ввода остановлен")
     
     def get_transcription(self, block=False, timeout=None):